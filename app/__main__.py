@@ -0,0 +1,5 @@
+from app.core.server import main
+
+# python -m app: production server (settings in app/core/server.py, read from the environment)
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,43 @@
 import os
+import threading
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError,jwt
 from app.auth.models import Roles, User
 # from app.auth.utils import decode_token
 from typing import Annotated, List, Union
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from app.core.deps import get_db
+from app.core import statements
+from app.core.logging import logger
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")  # or your actual token route
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "B7F4698891BCE837E13525741839D")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# While the database is unreachable, a user looked up successfully within this many seconds is
+# still recognised from its token by the catalog read routes (get_catalog_user), so cached
+# catalog reads keep being served. Every other route needs the database (0 = off)
+AUTH_STALE_IF_ERROR_SECONDS = float(os.getenv("AUTH_STALE_IF_ERROR_SECONDS", 300))
+AUTH_RECENT_USERS = 10000
+
+_recent_users = {}  # email -> (user dict, monotonic time of the lookup)
+_recent_users_lock = threading.Lock()
 
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _authenticate(token, db, stale_if_error=False)
+
+
+# Only for read-only catalog routes served from a cache: never for writes, carts, orders or admin
+def get_catalog_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    return _authenticate(token, db, stale_if_error=True)
+
+
+def _authenticate(token: str, db: Session, stale_if_error: bool):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -30,11 +52,24 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == email).first()
+    try:
+        user = statements.user_by_email(db, email)
+    except OperationalError:
+        recent = _recent_users.get(email) if stale_if_error else None
+        if recent is None or time.monotonic() - recent[1] >= AUTH_STALE_IF_ERROR_SECONDS:
+            raise
+        logger.warning(f"Database unavailable, using the user recorded {time.monotonic() - recent[1]:.0f}s ago for '{email}'")
+        return recent[0]
     if user is None:
         raise credentials_exception
 
-    return {"id": user.id, "email": user.email, "role": user.role}
+    current = {"id": user.id, "email": user.email, "role": user.role}
+    if AUTH_STALE_IF_ERROR_SECONDS > 0:
+        with _recent_users_lock:
+            if len(_recent_users) >= AUTH_RECENT_USERS and email not in _recent_users:
+                del _recent_users[next(iter(_recent_users))]  # oldest first-seen
+            _recent_users[email] = (current, time.monotonic())
+    return current
 
 def require_role(required_roles: Union[Roles, List[Roles]]):
     # Convert single role to list for uniform handling
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
 from app.core.database import Base
 from sqlalchemy.orm import relationship
 import enum
@@ -24,7 +24,7 @@ class PasswordResetToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     token = Column(String, unique=True, nullable=False)
-    expiration_time = Column(String, nullable=False) 
+    expiration_time = Column(DateTime, nullable=False, index=True)  # UTC
     used = Column(Boolean, default=False)
 
     user = relationship("User", back_populates="reset_tokens")
\ No newline at end of file
@@ -9,8 +9,11 @@ from app.auth.email import send_email
 from app.core.deps import get_db
 from app.core.logging import logger
 from app.auth.schemas import ForgotPassword, ResetPassword
-from datetime import datetime, timedelta
+from datetime import timedelta
+from app.core.database import utcnow
 from app.core.error_logger import create_error_response
+from app.core.rate_limit import rate_limit
+from app.core import statements
 
 
 
@@ -18,9 +21,9 @@ from app.core.error_logger import create_error_response
 router = APIRouter(prefix = '/auth' , tags = ["Authentication"])
 
 # Signup endpoint
-@router.post("/signup" , status_code = 201)
+@router.post("/signup" , status_code = 201, dependencies=[Depends(rate_limit("auth.signup"))])
 async def create_user(request: schemas.UserCreate , db:Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == request.email).first()
+    existing_user = statements.user_by_email(db, request.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered or user already exists")
     
@@ -40,9 +43,9 @@ async def create_user(request: schemas.UserCreate , db:Session = Depends(get_db)
 
 
 # Login endpoint
-@router.post("/login" , status_code=200 , response_model=schemas.Token)
+@router.post("/login" , status_code=200 , response_model=schemas.Token, dependencies=[Depends(rate_limit("auth.login"))])
 async def login_user(request: schemas.UserLogin,db:Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == request.email).first()
+    user = statements.user_by_email(db, request.email)
     if not user or not verify_password(request.hashed_password, user.hashed_password):
             logger.warning(f"Invalid login credentials for email: {request.email}")
             raise HTTPException(status_code=400, detail="Invalid email or password")
@@ -77,23 +80,23 @@ async def logout_user(db:Session=Depends(get_db),
 
 
 # --- Forgot Password ---
-@router.post("/forgot-password")
+@router.post("/forgot-password", dependencies=[Depends(rate_limit("auth.forgot_password"))])
 async def forgot_password(data: ForgotPassword, db: Session = Depends(get_db)):
     logger.info(f"Password reset requested for email: {data.email}")
     
     try:
-       user = db.query(models.User).filter(models.User.email == data.email).first()
+       user = statements.user_by_email(db, data.email)
        if not user:
           logger.warning(f"Password reset failed: User not found with email {data.email}")
           return create_error_response(detail="User not found", status_code=404)
 
        token = create_reset_token(user.email)
-       expiration = datetime.now()+ timedelta(hours=1)
+       expiration = utcnow() + timedelta(hours=1)
 
        reset_token = models.PasswordResetToken(
            user_id=user.id,
            token=token,
-           expiration_time=expiration.isoformat(),
+           expiration_time=expiration,
            used=False
        )
 
@@ -117,7 +120,7 @@ async def forgot_password(data: ForgotPassword, db: Session = Depends(get_db)):
 
 
 
-@router.post("/reset-password")
+@router.post("/reset-password", dependencies=[Depends(rate_limit("auth.reset_password"))])
 async def reset_password(request: ResetPassword, db: Session = Depends(get_db)):
     # Get email from token
     email = verify_reset_token(request.token)
@@ -125,7 +128,7 @@ async def reset_password(request: ResetPassword, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
     # Find user by decoded email
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = statements.user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
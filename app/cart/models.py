@@ -1,6 +1,6 @@
 from sqlalchemy.orm import relationship
-from sqlalchemy import Column, ForeignKey, Integer
-from app.core.database import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Integer
+from app.core.database import Base, utcnow
 
 
 class Cart (Base):
@@ -10,6 +10,7 @@ class Cart (Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)  # stale cart purge
 
     user = relationship("User", back_populates = "cart_items")
     product = relationship("Product" , back_populates = "cart_items")
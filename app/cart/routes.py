@@ -3,9 +3,11 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.auth.models import Roles
 from app.core.error_logger import create_error_response
+from app.core.idempotency import IdempotencyGuard, idempotent
 from app.core.logging import logger
+from app.core.retry import raise_if_retryable, transactional_retry
+from app.core import statements
 from app.cart import models, schemas
-from app.products.models import Product
 from app.core.deps import get_db
 from app.auth.dependencies import get_current_user, require_role
 
@@ -13,18 +15,23 @@ router = APIRouter(prefix="/cart", tags=["Cart"])
 
 # Add to Cart
 @router.post("", response_model=schemas.CartItemOut)
+@transactional_retry()
 async def add_to_cart(
     item: schemas.CartAdd,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(require_role(Roles.user))
+    current_user: dict = Depends(require_role(Roles.user)),
+    guard: IdempotencyGuard = Depends(idempotent("cart.add"))
 ):
+    if guard.replay is not None:
+        return guard.replay
+
     user_id = current_user.get("id")
     if not user_id:
         logger.warning("Add to cart failed: Invalid token or user not found.")
         raise HTTPException(status_code=401, detail="Invalid token or user not found")
 
     try:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = statements.product_by_id(db, item.product_id)
         if not product:
             logger.warning(f"Product not found: Product ID {item.product_id}")
             return create_error_response("Product not found", status_code=status.HTTP_404_NOT_FOUND)
@@ -33,10 +40,7 @@ async def add_to_cart(
             logger.warning(f"Product stock is{product.stock} not available, by user ID {user_id}")
             return create_error_response("Current product is out of stock" ,status_code=status.HTTP_400_BAD_REQUEST)
 
-        cart_item = db.query(models.Cart).filter(
-            models.Cart.user_id == user_id,
-            models.Cart.product_id == item.product_id
-        ).first()
+        cart_item = statements.cart_item(db, user_id, item.product_id)
 
         if cart_item:
             cart_item.quantity += item.quantity
@@ -50,11 +54,12 @@ async def add_to_cart(
             db.add(cart_item)
             logger.info(f"New cart item added: Product ID {item.product_id} x{item.quantity} for user ID {user_id}")
 
-        db.commit()
+        db.flush()
         db.refresh(cart_item)
-        return cart_item
+        return guard.save(schemas.CartItemOut.model_validate(cart_item))
 
-    except Exception:
+    except Exception as e:
+        raise_if_retryable(e)
         logger.exception(f"Failed to add to cart for user ID {user_id}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
     
@@ -70,7 +75,7 @@ async def view_cart(
     logger.info(f"Fetching cart for user ID: {user_id}")
 
     try:
-        cart_items = db.query(models.Cart).filter(models.Cart.user_id == user_id).all()
+        cart_items = statements.cart_items(db, user_id)
 
         if not cart_items:
             logger.warning(f"Cart is empty for user ID: {user_id}")
@@ -90,6 +95,7 @@ async def view_cart(
 
 # Remove from Cart
 @router.delete("/{product_id}")
+@transactional_retry()
 async def remove_from_cart(
     product_id: int,
     db: Session = Depends(get_db),
@@ -99,10 +105,7 @@ async def remove_from_cart(
     logger.info(f"Attempting to remove product ID {product_id} from cart for user ID {user_id}")
 
     try:
-        cart_item = db.query(models.Cart).filter(
-            models.Cart.user_id == user_id,
-            models.Cart.product_id == product_id
-        ).first()
+        cart_item = statements.cart_item(db, user_id, product_id)
 
         if not cart_item:
             logger.warning(f"Cart item not found: Product ID {product_id} for user ID {user_id}")
@@ -114,13 +117,15 @@ async def remove_from_cart(
         logger.info(f"Successfully removed product ID {product_id} from cart for user ID {user_id}")
         return {"message": "Item removed from cart"}
 
-    except Exception:
+    except Exception as e:
+        raise_if_retryable(e)
         logger.exception(f"Error while removing product ID {product_id} from cart for user ID {user_id}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
 # Update Quantity
 @router.put("/{product_id}", response_model=schemas.CartItemOut)
+@transactional_retry()
 async def update_cart(
     product_id: int,
     item: schemas.CartUpdate,
@@ -131,10 +136,7 @@ async def update_cart(
     logger.info(f"Attempting to update product ID {product_id} in cart for user ID {user_id}")
 
     try:
-        cart_item = db.query(models.Cart).filter(
-            models.Cart.user_id == user_id,
-            models.Cart.product_id == product_id
-        ).first()
+        cart_item = statements.cart_item(db, user_id, product_id)
 
         if not cart_item:
             logger.warning(f"Cart item not found: Product ID {product_id} for user ID {user_id}")
@@ -151,6 +153,7 @@ async def update_cart(
         logger.info(f"Updated quantity to {item.quantity} for product ID {product_id} in cart of user ID {user_id}")
         return cart_item
 
-    except Exception:
+    except Exception as e:
+        raise_if_retryable(e)
         logger.exception(f"Error while updating product ID {product_id} in cart for user ID {user_id}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
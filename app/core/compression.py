@@ -0,0 +1,182 @@
+import gzip
+import os
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional
+    zstandard = None
+
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Smaller bodies go out as they are: the saving does not pay for the CPU and header overhead
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+# Server preference, best first; encodings whose module is not installed are skipped
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", 5))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+# Media types worth compressing (prefix match); text/event-stream is never compressed, see below
+COMPRESSION_TYPES = tuple(
+    media_type.strip()
+    for media_type in os.getenv(
+        "COMPRESSION_TYPES", "application/json,application/x-ndjson,text/csv,text/plain,text/html"
+    ).split(",")
+    if media_type.strip()
+)
+# Pre-compressed catalog bodies kept per worker, keyed by ETag and encoding (bytes of compressed data)
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", 32 * 1024 * 1024))
+
+# Buffered compression would hold back every event until the stream ends
+NEVER_COMPRESSED = ("text/event-stream",)
+
+
+class _BrotliStream:
+    # Gives brotli.Compressor the compressobj interface of zlib and zstandard
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.finish()
+
+
+class Codec:
+    def __init__(self, name: str, compress: Callable[[bytes], bytes], stream: Callable[[], object]):
+        self.name = name
+        self.compress = compress  # whole body in one call
+        self.stream = stream  # new object with compress(chunk) / flush(), for streamed responses
+
+
+def _codecs() -> Dict[str, Codec]:
+    available = {
+        # mtime=0: the same body always compresses to the same bytes
+        "gzip": Codec(
+            "gzip",
+            lambda data: gzip.compress(data, COMPRESSION_GZIP_LEVEL, mtime=0),
+            lambda: zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31),
+        ),
+    }
+    if brotli is not None:
+        available["br"] = Codec(
+            "br",
+            lambda data: brotli.compress(data, quality=COMPRESSION_BROTLI_LEVEL),
+            lambda: _BrotliStream(COMPRESSION_BROTLI_LEVEL),
+        )
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL)
+        available["zstd"] = Codec(
+            "zstd",
+            compressor.compress,
+            lambda: zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj(),
+        )
+    preference = [name.strip() for name in COMPRESSION_ENCODINGS.split(",")]
+    return {name: available[name] for name in preference if name in available}
+
+
+codecs = _codecs()
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    # The server's preferred encoding among those the client accepts with q > 0; None for identity
+    if not COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    default = weights.get("*", 0.0)
+    for name in codecs:
+        if weights.get(name, default) > 0:
+            return name
+    return None
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    if not media_type:
+        return False
+    media_type = media_type.split(";", 1)[0].strip().lower()
+    if media_type.startswith(NEVER_COMPRESSED):
+        return False
+    return media_type.startswith(COMPRESSION_TYPES)
+
+
+class CompressedCache:
+    # LRU of compressed bodies. The key must identify the rendered body: catalog ETags are
+    # derived from the (id, version) of every row in the response, so a stock or price change
+    # produces a new key and the old entry simply ages out. The ETags are weak, which allows
+    # the same validator on the identity and compressed representations.
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, encoding: Optional[str], media_type: str) -> Optional[Response]:
+        if encoding is None or self.max_bytes <= 0:
+            return None
+        body = self.entries.get((key, encoding))
+        if body is None:
+            return None
+        self.entries.move_to_end((key, encoding))
+        self.hits += 1
+        return _encoded_response(body, encoding, media_type)
+
+    def compress(self, key: str, encoding: Optional[str], response: Response) -> Response:
+        # Compresses a rendered response once and keeps the result; small bodies are left alone
+        if encoding is None or len(response.body) < COMPRESSION_MIN_BYTES:
+            return response
+        body = codecs[encoding].compress(response.body)
+        self.misses += 1
+        if self.max_bytes > 0 and len(body) <= self.max_bytes:
+            previous = self.entries.pop((key, encoding), None)
+            self.size += len(body) - (len(previous) if previous is not None else 0)
+            self.entries[(key, encoding)] = body
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+        return _encoded_response(body, encoding, response.media_type, response.status_code)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def _encoded_response(body: bytes, encoding: str, media_type: str, status_code: int = 200) -> Response:
+    # Content-Encoding tells CompressionMiddleware to pass the body through untouched
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
+
+
+catalog_cache = CompressedCache(COMPRESSION_CACHE_BYTES)
@@ -1,4 +1,5 @@
 
+from datetime import datetime, timezone
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -15,6 +16,12 @@ DATABASE_URL
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+# Naive UTC timestamp for DateTime columns (HTTP dates and range scans need a fixed zone)
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 try:
     with engine.connect() as connection:
         print("Database connection successful!")
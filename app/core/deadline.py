@@ -0,0 +1,14 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# time.monotonic() by which the current request must be answered; set by the admission middleware
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    # Seconds left for the current request, None outside a request
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
@@ -16,7 +16,10 @@ def create_error_response(message: str, status_code: int):
 
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     logger.error(f"HTTPException: {exc.detail}")
-    return create_error_response(exc.detail, exc.status_code)
+    response = create_error_response(exc.detail, exc.status_code)
+    if exc.headers:
+        response.headers.update(exc.headers)
+    return response
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error(f"Validation Error: {exc.errors()}")
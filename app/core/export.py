@@ -0,0 +1,82 @@
+import csv
+import enum
+import io
+import os
+import zlib
+from datetime import date, datetime
+from typing import Iterator, Sequence
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.core.responses import render_json
+
+# Rows fetched per server-side cursor round trip, and encoded per response chunk
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 5000))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", 6))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _encode(rows: Sequence, keys: Sequence[str], fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode("utf-8")
+    return b"".join(render_json(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+def iter_export(statement: Select, fmt: str, compress: bool = False, name: str = "export") -> Iterator[bytes]:
+    # Runs in Starlette's threadpool while the response streams, so it opens its own session
+    # (the request's get_db session is already closed by then).
+    keys = [column.key for column in statement.selected_columns]
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    db = SessionLocal()
+    rows = 0
+    try:
+        chunk = _encode([keys], keys, fmt) if fmt == "csv" else b""
+        # yield_per turns on stream_results: a server-side cursor on PostgreSQL, so memory
+        # stays at one batch whatever the table size
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        for batch in result.partitions():
+            chunk += _encode(batch, keys, fmt)
+            rows += len(batch)
+            yield compressor.compress(chunk) if compressor else chunk
+            chunk = b""
+        if chunk:
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.flush()
+        logger.info(f"Export {name} finished: {rows} row(s) as {fmt}{' (gzip)' if compress else ''}")
+    except GeneratorExit:
+        logger.warning(f"Export {name} aborted by the client after {rows} row(s)")
+        raise
+    finally:
+        db.close()
+
+
+def export_response(request: Request, statement: Select, fmt: str, name: str) -> StreamingResponse:
+    # gzip is negotiated with Accept-Encoding so HTTP clients decompress transparently
+    compress = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="{name}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        iter_export(statement, fmt, compress, name),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers,
+    )
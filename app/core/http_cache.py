@@ -0,0 +1,63 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+
+# Cache-Control per catalog route; the endpoints are authenticated, so the defaults keep
+# responses out of shared caches and make clients revalidate with If-None-Match.
+CACHE_POLICIES = {
+    "products.list": os.getenv("CACHE_CONTROL_PRODUCTS_LIST", "private, no-cache"),
+    "products.search": os.getenv("CACHE_CONTROL_PRODUCTS_SEARCH", "private, no-cache"),
+    "products.detail": os.getenv("CACHE_CONTROL_PRODUCTS_DETAIL", "private, no-cache"),
+    "products.related": os.getenv("CACHE_CONTROL_PRODUCTS_RELATED", "private, no-cache"),
+}
+
+
+def weak_etag(*parts: Any) -> str:
+    # Built from row ids/versions, never from the rendered body
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: W/"x" and "x" match
+        opaque = etag.removeprefix("W/")
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*" or candidate.removeprefix("W/") == opaque:
+                return True
+        return False
+
+    # If-Modified-Since is only consulted when no If-None-Match was sent
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def set_cache_headers(response: Response, policy: str, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_POLICIES[policy]
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def not_modified_response(policy: str, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return set_cache_headers(Response(status_code=304), policy, etag, last_modified)
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import timedelta
+from typing import Optional, Union
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.auth.dependencies import get_current_user
+from app.core.database import utcnow
+from app.core.deps import get_db
+from app.core.logging import logger
+from app.core.models import IdempotencyKey
+from app.core.responses import FastJSONResponse
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+# How long a claimed key stays locked before another request may assume its owner died
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 30))
+# How long a duplicate waits for the first request to finish before getting a 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 5))
+POLL_INTERVAL_SECONDS = 0.1
+
+
+class IdempotencyGuard:
+    # Without a key every method is a pass-through, so routes use the same code path either way
+
+    def __init__(self, db: Session, scope: str, user_id: int, key: Optional[str], fingerprint: str):
+        self.db = db
+        self.scope = scope
+        self.user_id = user_id
+        self.key = key
+        self.fingerprint = fingerprint
+        self.replay: Optional[Response] = None
+        self.owned = False
+        self.saved = False
+
+    def _filter(self):
+        return and_(
+            IdempotencyKey.user_id == self.user_id,
+            IdempotencyKey.scope == self.scope,
+            IdempotencyKey.key == self.key,
+        )
+
+    def _try_acquire(self) -> bool:
+        now = utcnow()
+        lock = {
+            "request_hash": self.fingerprint,
+            "status_code": None,
+            "response_body": None,
+            "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+        }
+        # Take over a record past its TTL, or one whose first request died without finishing
+        taken = self.db.execute(
+            update(IdempotencyKey)
+            .where(
+                self._filter(),
+                or_(
+                    IdempotencyKey.expires_at < now,
+                    and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until < now),
+                ),
+            )
+            .values(**lock)
+        ).rowcount
+        if not taken:
+            try:
+                self.db.add(IdempotencyKey(user_id=self.user_id, scope=self.scope, key=self.key, **lock))
+                self.db.flush()
+            except IntegrityError:
+                self.db.rollback()
+                return False
+        self.db.commit()
+        self.owned = True
+        return True
+
+    async def claim(self) -> None:
+        if not self.key:
+            return
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while not self._try_acquire():
+            record = self.db.query(IdempotencyKey).filter(self._filter()).first()
+            self.db.rollback()
+            if record is None:
+                continue
+            if record.request_hash != self.fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if record.status_code is not None:
+                logger.info(f"Idempotent replay: scope={self.scope}, user ID {self.user_id}")
+                self.replay = Response(
+                    content=record.response_body,
+                    status_code=record.status_code,
+                    media_type="application/json",
+                    headers={"Idempotent-Replayed": "true"},
+                )
+                return
+            if time.monotonic() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed",
+                    headers={"Retry-After": "1"},
+                )
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    def save(self, content: Union[BaseModel, Response]) -> Response:
+        # Commits the route's pending work together with the stored response
+        response = content if isinstance(content, Response) else FastJSONResponse(content=content.model_dump(mode="json"))
+        if self.owned:
+            self.db.execute(
+                update(IdempotencyKey)
+                .where(self._filter())
+                .values(status_code=response.status_code, response_body=response.body.decode(), locked_until=None)
+            )
+        self.db.commit()
+        self.saved = True
+        return response
+
+    def release(self) -> None:
+        # Unsaved outcomes (errors, exceptions) are not replayed; free the key for a retry
+        if not self.owned or self.saved:
+            return
+        try:
+            self.db.rollback()
+            self.db.query(IdempotencyKey).filter(self._filter(), IdempotencyKey.status_code.is_(None)).delete()
+            self.db.commit()
+        except Exception:
+            logger.exception(f"Failed to release idempotency key for scope={self.scope}, user ID {self.user_id}")
+
+
+# Dependency factory: claims the request's Idempotency-Key for the current user before the route runs
+def idempotent(scope: str):
+    async def dependency(
+        request: Request,
+        db: Session = Depends(get_db),
+        current_user: dict = Depends(get_current_user),
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    ):
+        fingerprint = hashlib.sha256(request.url.path.encode() + b"\n" + await request.body()).hexdigest()
+        guard = IdempotencyGuard(db, scope, current_user["id"], idempotency_key, fingerprint)
+        await guard.claim()
+        try:
+            yield guard
+        finally:
+            guard.release()
+    return dependency
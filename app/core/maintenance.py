@@ -0,0 +1,83 @@
+import os
+from datetime import timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.auth.models import PasswordResetToken
+from app.cart.models import Cart
+from app.core import scheduler
+from app.core.database import utcnow
+from app.core.models import IdempotencyKey
+from app.core.scheduler import MAINTENANCE_BATCH_ROWS
+
+PURGE_RESET_TOKENS_SECONDS = float(os.getenv("PURGE_RESET_TOKENS_SECONDS", 3600))
+PURGE_STALE_CARTS_SECONDS = float(os.getenv("PURGE_STALE_CARTS_SECONDS", 6 * 3600))
+PURGE_IDEMPOTENCY_KEYS_SECONDS = float(os.getenv("PURGE_IDEMPOTENCY_KEYS_SECONDS", 3600))
+# A cart none of whose lines changed for this long is abandoned
+CART_STALE_DAYS = int(os.getenv("CART_STALE_DAYS", 30))
+
+
+@scheduler.job("purge_reset_tokens", PURGE_RESET_TOKENS_SECONDS)
+def purge_reset_tokens(db: Session, run: scheduler.JobRun) -> int:
+    # Oldest first off the expiration_time index, one small batch per transaction
+    expired = (
+        select(PasswordResetToken.id)
+        .where(PasswordResetToken.expiration_time < utcnow())
+        .order_by(PasswordResetToken.expiration_time)
+        .limit(MAINTENANCE_BATCH_ROWS)
+    )
+    purged = 0
+    while True:
+        ids = db.scalars(expired).all()
+        if ids:
+            purged += db.execute(delete(PasswordResetToken).where(PasswordResetToken.id.in_(ids))).rowcount
+            db.commit()
+        if len(ids) < MAINTENANCE_BATCH_ROWS or not run.next_batch():
+            return purged
+
+
+@scheduler.job("purge_idempotency_keys", PURGE_IDEMPOTENCY_KEYS_SECONDS)
+def purge_idempotency_keys(db: Session, run: scheduler.JobRun) -> int:
+    # Past their TTL a replay is no longer promised; a retry takes the key over anyway
+    expired = (
+        select(IdempotencyKey.id)
+        .where(IdempotencyKey.expires_at < utcnow())
+        .order_by(IdempotencyKey.expires_at)
+        .limit(MAINTENANCE_BATCH_ROWS)
+    )
+    purged = 0
+    while True:
+        ids = db.scalars(expired).all()
+        if ids:
+            purged += db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids), IdempotencyKey.expires_at < utcnow())
+            ).rowcount
+            db.commit()
+        if len(ids) < MAINTENANCE_BATCH_ROWS or not run.next_batch():
+            return purged
+
+
+@scheduler.job("purge_stale_carts", PURGE_STALE_CARTS_SECONDS)
+def purge_stale_carts(db: Session, run: scheduler.JobRun) -> int:
+    # Whole carts only: a user with one recently changed line keeps the older lines too.
+    # Users are walked in id order (keyset), so carts that are kept are not read again.
+    cutoff = utcnow() - timedelta(days=CART_STALE_DAYS)
+    active = select(Cart.user_id).where(Cart.updated_at >= cutoff)
+    purged, after = 0, 0
+    while True:
+        users = db.scalars(
+            select(Cart.user_id)
+            .where(Cart.updated_at < cutoff, Cart.user_id > after)
+            .distinct()
+            .order_by(Cart.user_id)
+            .limit(MAINTENANCE_BATCH_ROWS)
+        ).all()
+        if users:
+            after = users[-1]
+            purged += db.execute(
+                delete(Cart).where(Cart.user_id.in_(users), Cart.user_id.not_in(active))
+            ).rowcount
+            db.commit()
+        if len(users) < MAINTENANCE_BATCH_ROWS or not run.next_batch():
+            return purged
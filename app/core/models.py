@@ -0,0 +1,45 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text, UniqueConstraint
+from app.core.database import Base
+
+
+# Stored outcome of a mutating request sent with an Idempotency-Key header
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "scope", "key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    scope = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer)  # NULL while the first request is still running
+    response_body = Column(Text)
+    locked_until = Column(DateTime)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Rate limit counter for RATE_LIMIT_STORE=database; times are epoch seconds so the algorithms stay dialect-neutral
+class RateLimitCounter(Base):
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String, primary_key=True)
+    value = Column(Float, nullable=False)
+    previous = Column(Float, nullable=False, default=0)
+    stamp = Column(Float, nullable=False)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+# One row per periodic job (app.core.scheduler): when it is next due, which worker holds the
+# lease while it runs, and the outcome of the last run
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+
+    name = Column(String, primary_key=True)
+    next_run_at = Column(DateTime, nullable=False)
+    lease_owner = Column(String)
+    lease_until = Column(DateTime)
+    runs = Column(Integer, nullable=False, default=0)
+    last_started_at = Column(DateTime)
+    last_duration = Column(Float)  # seconds
+    last_rows = Column(Integer)
+    last_error = Column(Text)
@@ -0,0 +1,129 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from app.core.logging import logger
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("logs", "profiles"))
+# Stack sampling interval; 5 ms is coarse enough to stay far below 1% CPU for the sampled request
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", 0.005))
+# Deepest stack kept per sample; frames below it (towards the root) are dropped
+PROFILE_MAX_DEPTH = 128
+
+# Last profiles written by this process, newest last
+recent_profiles: Deque[dict] = deque(maxlen=50)
+
+
+def frame_label(frame) -> str:
+    # Same frame format as py-spy, so the output loads in flamegraph.pl, speedscope and inferno
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class StackSampler:
+    # Wall-clock sampler: a daemon thread reads the stacks of every thread each interval. Async
+    # routes run on the event loop thread and sync routes (def handlers, catalog loads) in the
+    # threadpool, so each stack is rooted at its thread's name. Work of other requests served
+    # concurrently shows up too. Threads parked in a threading wait (idle pool workers) are left out.
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or _idle(frame):
+                    continue
+                stack: List[str] = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread {thread_id}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+def _idle(frame) -> bool:
+    return frame.f_code.co_name == "wait" and os.path.basename(frame.f_code.co_filename) == "threading.py"
+
+
+class RequestProfiler:
+    # "sample": stack sampler only (collapsed stacks). "cprofile": cProfile for exact call counts
+    # (pstats) plus the sampler for a flame graph. cProfile slows the request several fold, and
+    # only sees the event loop thread: work a route hands to the threadpool is in the samples only.
+
+    _deterministic_lock = threading.Lock()  # one cProfile per process: it replaces sys.setprofile
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.profile: Optional[cProfile.Profile] = None
+        self.sampler = StackSampler()
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        if self.mode == "cprofile" and self._deterministic_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.sampler.start()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        self.elapsed = time.perf_counter() - self.started
+        self.sampler.stop()
+        if self.profile is not None:
+            self.profile.disable()
+            self._deterministic_lock.release()
+
+    def write(self, method: str, route: str, status_code: int, trigger: str) -> dict:
+        # Blocking file I/O: call from a worker thread
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", route.strip("/")) or "root"
+        elapsed_ms = round(self.elapsed * 1000, 1)
+        base = os.path.join(PROFILE_DIR, f"{stamp}-{method}-{slug}-{int(elapsed_ms)}ms")
+
+        files = []
+        with open(base + ".folded", "w") as out:
+            for stack, count in self.sampler.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+        files.append(base + ".folded")
+        if self.profile is not None:
+            self.profile.dump_stats(base + ".pstats")
+            files.append(base + ".pstats")
+
+        entry = {
+            "method": method,
+            "route": route,
+            "status_code": status_code,
+            "elapsed_ms": elapsed_ms,
+            "mode": "cprofile" if self.profile is not None else "sample",
+            "trigger": trigger,
+            "samples": self.sampler.samples,
+            "files": files,
+            "created_at": stamp,
+        }
+        recent_profiles.append(entry)
+        logger.info(f"Profiled {method} {route} ({trigger}) in {elapsed_ms} ms -> {', '.join(files)}")
+        return entry
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, engine
+from app.core.logging import logger
+
+# "local": one process. "postgres": LISTEN/NOTIFY, so every worker process sees every change.
+PUBSUB_BROKER = os.getenv("PUBSUB_BROKER", "local")
+# Worker processes serving the app, as exported by `python -m app` (app/core/server.py).
+# Not known under a bare `uvicorn --workers N`: counted as one.
+WORKER_PROCESSES = int(os.getenv("WEB_WORKERS", 1)) or 1
+# Whether a message published in one worker reaches the listeners of every worker
+REACHES_ALL_WORKERS = PUBSUB_BROKER == "postgres" or WORKER_PROCESSES == 1
+NOTIFY_CHANNEL = "app_pubsub"
+# Postgres caps a NOTIFY payload at 8000 bytes
+NOTIFY_BATCH = 50
+
+Message = Tuple[str, dict]
+
+
+class Subscription:
+    # Keeps only the latest message per topic, so a slow reader gets one update per topic instead of a backlog
+
+    def __init__(self, hub: "PubSubHub", topics: Iterable[str]):
+        self.hub = hub
+        self.topics = set(topics)
+        self.pending: Dict[str, dict] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, topic: str, message: dict) -> None:
+        self.pending[topic] = message
+        self._ready.set()
+
+    async def get(self, timeout: float) -> Dict[str, dict]:
+        # Everything published since the last call, latest per topic; {} on timeout
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._ready.clear()
+        batch, self.pending = self.pending, {}
+        return batch
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class PubSubHub:
+    # Fan-out to the subscribers of this process. Delivery always runs on the event loop;
+    # deliver_threadsafe() is for commits made in worker threads.
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        # In-process consumers (caches, indexes) that need every message, not just the latest
+        self.listeners: Dict[str, List[Callable[[dict], None]]] = defaultdict(list)
+        # Same, for every topic starting with a prefix (e.g. all "product:<id>" topics)
+        self.prefix_listeners: List[Tuple[str, Callable[[str, dict], None]]] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, topics)
+        for topic in subscription.topics:
+            self.subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    def listen(self, topic: str, callback: Callable[[dict], None]) -> None:
+        self.listeners[topic].append(callback)
+
+    def listen_prefix(self, prefix: str, callback: Callable[[str, dict], None]) -> None:
+        self.prefix_listeners.append((prefix, callback))
+
+    def deliver(self, messages: List[Message]) -> None:
+        for topic, message in messages:
+            for callback in self.listeners.get(topic, ()):
+                try:
+                    callback(message)
+                except Exception:
+                    logger.exception(f"Pub/sub listener for '{topic}' failed")
+            for prefix, callback in self.prefix_listeners:
+                if topic.startswith(prefix):
+                    try:
+                        callback(topic, message)
+                    except Exception:
+                        logger.exception(f"Pub/sub listener for '{prefix}*' failed")
+            for subscription in self.subscribers.get(topic, ()):
+                subscription.offer(topic, message)
+
+    def deliver_threadsafe(self, messages: List[Message]) -> None:
+        if self.loop is None or self.loop.is_closed():
+            return  # not serving (scripts, benchmarks): nobody can be subscribed
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.deliver(messages)
+        else:
+            self.loop.call_soon_threadsafe(self.deliver, messages)
+
+
+class Broker(ABC):
+    # Moves committed messages from the publishing session to the hub of every process
+
+    @abstractmethod
+    def before_commit(self, session: Session, messages: List[Message]) -> None:
+        ...
+
+    @abstractmethod
+    def after_commit(self, messages: List[Message]) -> None:
+        ...
+
+    async def start(self, hub: PubSubHub) -> None:
+        hub.loop = asyncio.get_running_loop()
+
+    async def stop(self) -> None:
+        pass
+
+
+class LocalBroker(Broker):
+    def __init__(self, hub: PubSubHub):
+        self.hub = hub
+
+    def before_commit(self, session, messages):
+        pass
+
+    def after_commit(self, messages):
+        self.hub.deliver_threadsafe(messages)
+
+
+class PostgresBroker(Broker):
+    # NOTIFY is sent inside the publishing transaction, so it is delivered only if that commits.
+    # Each process LISTENs on a dedicated connection watched by the event loop (no thread).
+
+    def __init__(self, hub: PubSubHub):
+        self.hub = hub
+        self.connection = None
+
+    def before_commit(self, session, messages):
+        for start in range(0, len(messages), NOTIFY_BATCH):
+            payload = json.dumps(messages[start:start + NOTIFY_BATCH], separators=(",", ":"), default=str)
+            session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+
+    def after_commit(self, messages):
+        pass
+
+    async def start(self, hub):
+        await super().start(hub)
+        raw = engine.raw_connection()
+        raw.detach()  # kept for the life of the process, outside the pool
+        self.connection = raw.dbapi_connection
+        self.connection.autocommit = True
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        hub.loop.add_reader(self.connection.fileno(), self._on_notify)
+        logger.info("Pub/sub listening on Postgres channel " + NOTIFY_CHANNEL)
+
+    def _on_notify(self) -> None:
+        try:
+            self.connection.poll()
+        except Exception:
+            logger.exception("Pub/sub listener connection failed")
+            self.hub.loop.remove_reader(self.connection.fileno())
+            return
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            self.hub.deliver([(topic, message) for topic, message in json.loads(notify.payload)])
+
+    async def stop(self):
+        if self.connection is not None:
+            self.hub.loop.remove_reader(self.connection.fileno())
+            self.connection.close()
+            self.connection = None
+
+
+hub = PubSubHub()
+broker: Broker = PostgresBroker(hub) if PUBSUB_BROKER == "postgres" else LocalBroker(hub)
+
+
+def publish(db: Session, topic: str, message: dict) -> None:
+    # Queued on the session and sent only when its transaction commits
+    db.info.setdefault("pubsub", []).append((topic, message))
+
+
+# The commit hooks also fire when a savepoint is released; only the outermost commit publishes
+
+@event.listens_for(SessionLocal, "before_commit")
+def _before_commit(session):
+    if session.in_nested_transaction():
+        return
+    # The commit's own flush runs after this hook; flush first so its changes are published too
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    messages = session.info.get("pubsub")
+    if messages:
+        broker.before_commit(session, messages)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    if session.in_nested_transaction():
+        return
+    messages = session.info.pop("pubsub", None)
+    if messages:
+        broker.after_commit(messages)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _after_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("pubsub", None)
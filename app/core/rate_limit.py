@@ -0,0 +1,229 @@
+import math
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.exc import IntegrityError
+
+from app.auth.dependencies import get_current_user
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.core.models import RateLimitCounter
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# "memory": per process. "database": counters in the rate_limit_counters table, shared by all workers.
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# Use the first X-Forwarded-For address as the client IP (only behind a proxy that sets it)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", 100_000))
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Counter state as stored: (value, previous, stamp)
+State = Tuple[float, float, float]
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+# (state or None, now) -> (new state, decision, seconds the state must be kept)
+Algorithm = Callable[[Optional[State], float], Tuple[State, Decision, float]]
+
+
+def token_bucket(rate: float, burst: int, cost: int = 1) -> Algorithm:
+    # State: (tokens, unused, last refill). Refills `rate` tokens per second up to `burst`.
+    def step(state, now):
+        tokens, _, stamp = state if state is not None else (float(burst), 0.0, now)
+        tokens = min(float(burst), tokens + (now - stamp) * rate)
+        if tokens >= cost:
+            return (tokens - cost, 0.0, now), Decision(True, int(tokens - cost), 0.0), burst / rate
+        return (tokens, 0.0, now), Decision(False, 0, (cost - tokens) / rate), burst / rate
+    return step
+
+
+def sliding_window(limit: int, period: float, cost: int = 1) -> Algorithm:
+    # State: (count in the current window, count in the previous window, current window start).
+    # The previous window is weighted by how much of it still overlaps the sliding window.
+    def step(state, now):
+        window = math.floor(now / period) * period
+        count, previous, start = state if state is not None else (0.0, 0.0, window)
+        if start != window:
+            previous = count if window - start == period else 0.0
+            count, start = 0.0, window
+        overlap = 1 - (now - window) / period
+        estimate = previous * overlap + count
+        if estimate + cost <= limit:
+            return (count + cost, previous, start), Decision(True, int(limit - estimate - cost), 0.0), 2 * period
+        if count + cost > limit or not previous:
+            retry_after = window + period - now
+        else:
+            retry_after = (estimate + cost - limit) / previous * period
+        return (count, previous, start), Decision(False, 0, retry_after), 2 * period
+    return step
+
+
+class CounterStore(ABC):
+    # A shared implementation (e.g. a Redis script) must run `algorithm` atomically per key
+
+    @abstractmethod
+    def hit(self, key: str, algorithm: Algorithm) -> Decision:
+        ...
+
+
+class MemoryCounterStore(CounterStore):
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self.counters: Dict[str, Tuple[State, float]] = {}
+        self.lock = threading.Lock()
+
+    def hit(self, key, algorithm):
+        now = time.time()
+        with self.lock:
+            entry = self.counters.get(key)
+            state = entry[0] if entry is not None and entry[1] > now else None
+            state, decision, ttl = algorithm(state, now)
+            self.counters[key] = (state, now + ttl)
+            if len(self.counters) > self.max_keys:
+                self._prune(now)
+        return decision
+
+    def _prune(self, now: float) -> None:
+        self.counters = {key: entry for key, entry in self.counters.items() if entry[1] > now}
+        if len(self.counters) > self.max_keys:
+            logger.warning(f"Rate limit store holds {len(self.counters)} live keys (max {self.max_keys})")
+
+
+class DatabaseCounterStore(CounterStore):
+    # Local stand-in for a shared store: one short transaction per hit, the row lock makes it atomic
+
+    def hit(self, key, algorithm):
+        now = time.time()
+        db = SessionLocal()
+        try:
+            for _ in range(2):
+                row = db.query(RateLimitCounter).filter(RateLimitCounter.key == key).with_for_update().first()
+                state = (row.value, row.previous, row.stamp) if row is not None and row.expires_at > now else None
+                (value, previous, stamp), decision, ttl = algorithm(state, now)
+                if row is None:
+                    db.add(RateLimitCounter(key=key, value=value, previous=previous, stamp=stamp, expires_at=now + ttl))
+                else:
+                    row.value, row.previous, row.stamp, row.expires_at = value, previous, stamp, now + ttl
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()  # another worker created the key first: redo against its row
+                    continue
+                if random.random() < 0.001:
+                    db.query(RateLimitCounter).filter(RateLimitCounter.expires_at < now).delete()
+                    db.commit()
+                return decision
+            return decision
+        finally:
+            db.close()
+
+
+class RateLimitPolicy:
+    def __init__(self, name: str, rate: str, key: str = "ip", algorithm: str = "sliding_window", burst: Optional[int] = None):
+        # rate: "<count>/<second|minute|hour|day>"; key: "ip" or "user"; burst: token bucket size
+        count, _, period = rate.partition("/")
+        self.name = name
+        self.limit = int(count)
+        self.period = PERIODS[period]
+        self.key = key
+        self.algorithm = algorithm
+        self.burst = burst or self.limit
+
+    def step(self) -> Algorithm:
+        if self.algorithm == "token_bucket":
+            return token_bucket(self.limit / self.period, self.burst)
+        return sliding_window(self.limit, self.period)
+
+
+# Declarative per-route policies, applied with `dependencies=[Depends(rate_limit("<name>"))]`.
+# RATE_LIMITS="auth.login=20/minute,products.search=120/minute" overrides the rates.
+POLICIES: Dict[str, RateLimitPolicy] = {
+    policy.name: policy
+    for policy in [
+        RateLimitPolicy("auth.login", "10/minute", key="ip"),
+        RateLimitPolicy("auth.signup", "5/hour", key="ip"),
+        RateLimitPolicy("auth.forgot_password", "3/hour", key="ip"),
+        RateLimitPolicy("auth.reset_password", "10/hour", key="ip"),
+        RateLimitPolicy("products.search", "60/minute", key="user", algorithm="token_bucket", burst=20),
+        RateLimitPolicy("checkout", "10/minute", key="user", algorithm="token_bucket", burst=5),
+    ]
+}
+for _override in filter(None, os.getenv("RATE_LIMITS", "").split(",")):
+    _name, _, _rate = _override.partition("=")
+    _policy = POLICIES.get(_name.strip())
+    if _policy is None:
+        raise ValueError(f"RATE_LIMITS: unknown policy '{_name.strip()}' (known: {', '.join(sorted(POLICIES))})")
+    try:
+        POLICIES[_policy.name] = RateLimitPolicy(_policy.name, _rate.strip(), _policy.key, _policy.algorithm, _policy.burst)
+    except (KeyError, ValueError):
+        raise ValueError(
+            f"RATE_LIMITS: invalid rate '{_rate.strip()}' for '{_policy.name}' (expected <count>/<{'|'.join(PERIODS)}>)"
+        ) from None
+
+store: CounterStore = DatabaseCounterStore() if RATE_LIMIT_STORE == "database" else MemoryCounterStore()
+
+# Allowed / limited hits per policy since the process started
+rate_limit_stats: Dict[str, Counter] = defaultdict(Counter)
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce(policy: RateLimitPolicy, identity: str) -> Decision:
+    decision = store.hit(f"{policy.name}:{identity}", policy.step())
+    if decision.allowed:
+        rate_limit_stats[policy.name]["allowed"] += 1
+        return decision
+    rate_limit_stats[policy.name]["limited"] += 1
+    logger.warning(f"Rate limit '{policy.name}' exceeded by {identity}")
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please slow down",
+        headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+    )
+
+
+def rate_limit(name: str):
+    # Dependency factory; "user" policies reuse the request's get_current_user result
+    policy = POLICIES[name]
+
+    if policy.key == "user":
+        async def check_user(user: dict = Depends(get_current_user)):
+            if RATE_LIMIT_ENABLED:
+                enforce(policy, f"user:{user['id']}")
+        return check_user
+
+    async def check_ip(request: Request):
+        if RATE_LIMIT_ENABLED:
+            enforce(policy, f"ip:{client_ip(request)}")
+    return check_ip
+
+
+def policy_stats() -> List[dict]:
+    return [
+        {
+            "name": policy.name,
+            "rate": f"{policy.limit}/{policy.period}s",
+            "key": policy.key,
+            "algorithm": policy.algorithm,
+            **rate_limit_stats[policy.name],
+        }
+        for policy in POLICIES.values()
+    ]
@@ -0,0 +1,55 @@
+import enum
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Iterable, List, Optional, Sequence
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+# "json" keeps output byte-identical to FastAPI's JSONResponse. "orjson" is faster but
+# writes floats outside [1e-4, 1e16) without the exponent sign/zero padding ("1e-5" vs "1e-05").
+JSON_RENDERER = os.getenv("JSON_RENDERER", "json")
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Same settings as starlette's JSONResponse.render, built once instead of per call
+_encoder = json.JSONEncoder(
+    ensure_ascii=False,
+    allow_nan=False,
+    indent=None,
+    separators=(",", ":"),
+    default=_default,
+)
+
+
+def render_json(content: Any) -> bytes:
+    if JSON_RENDERER == "orjson" and orjson is not None:
+        return orjson.dumps(content)
+    return _encoder.encode(content).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    # Renders plain rows (see rows_to_dicts) without response_model validation or jsonable_encoder
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+
+def rows_to_dicts(rows: Iterable[Any], keys: Optional[Sequence[str]] = None) -> List[dict]:
+    # Column tuples from db.query(*columns) keep the column order, which must follow the schema field order.
+    # With keys, extra trailing columns (e.g. version, updated_at) are left out of the dicts.
+    if keys is None:
+        return [row._asdict() for row in rows]
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import os
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.deadline import remaining
+from app.core.logging import logger
+
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 5))
+# Total time a request may spend retrying before giving up with a 503
+RETRY_BUDGET_SECONDS = float(os.getenv("RETRY_BUDGET_SECONDS", 2))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", 0.02))
+
+# serialization_failure, deadlock_detected, lock_not_available
+RETRYABLE_SQLSTATES = {"40001", "40P01", "55P03"}
+
+# Per-name counters: attempts, retries, recovered (succeeded after a retry), exhausted
+retry_stats: Dict[str, Counter] = defaultdict(Counter)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if not isinstance(exc, DBAPIError):
+        return False
+    if exc.connection_invalidated:
+        return True
+    orig = exc.orig
+    if getattr(orig, "pgcode", None) in RETRYABLE_SQLSTATES or getattr(orig, "sqlstate", None) in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite reports lock contention as an OperationalError
+    return isinstance(exc, OperationalError) and "database is locked" in str(orig)
+
+
+def raise_if_retryable(exc: BaseException) -> None:
+    # For route-level `except Exception` blocks: let transient DB errors reach transactional_retry
+    if is_retryable(exc):
+        raise exc
+
+
+def _delay(exc: BaseException, attempt: int, started: float, budget: float, max_attempts: int) -> Optional[float]:
+    # Full-jitter exponential backoff; None when the error is not retryable or the budget is spent
+    if not is_retryable(exc) or attempt >= max_attempts:
+        return None
+    delay = random.uniform(0, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    if time.monotonic() - started + delay > budget:
+        return None
+    # No point retrying past the request's deadline; the client has given up by then
+    left = remaining()
+    if left is not None and delay >= left:
+        return None
+    return delay
+
+
+def _record(name: str, attempt: int, exhausted: bool = False) -> None:
+    stats = retry_stats[name]
+    stats["calls"] += 1
+    stats["attempts"] += attempt
+    stats["retries"] += attempt - 1
+    if exhausted:
+        stats["exhausted"] += 1
+    elif attempt > 1:
+        stats["recovered"] += 1
+
+
+def _exhausted(name: str, exc: BaseException) -> HTTPException:
+    logger.error(f"Giving up on {name} after retries: {exc.__class__.__name__}")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The service is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+def transactional_retry(
+    name: Optional[str] = None,
+    budget_seconds: float = RETRY_BUDGET_SECONDS,
+    max_attempts: int = RETRY_MAX_ATTEMPTS,
+):
+    # Re-runs a route body when it fails with a deadlock / serialization error. The route's
+    # `db` session is rolled back between attempts; dependencies are not re-run.
+    def decorator(func):
+        label = name or func.__name__
+
+        def retry_or_raise(exc, attempt, started, db):
+            delay = _delay(exc, attempt, started, budget_seconds, max_attempts)
+            if delay is None:
+                _record(label, attempt, exhausted=is_retryable(exc))
+                if is_retryable(exc):
+                    raise _exhausted(label, exc) from exc
+                raise exc
+            logger.warning(f"Retrying {label} after {exc.__class__.__name__} (attempt {attempt})")
+            if db is not None:
+                db.rollback()
+            return delay
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.monotonic()
+                attempt = 0
+                while True:
+                    attempt += 1
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as exc:
+                        await asyncio.sleep(retry_or_raise(exc, attempt, started, kwargs.get("db")))
+                        continue
+                    _record(label, attempt)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as exc:
+                    time.sleep(retry_or_raise(exc, attempt, started, kwargs.get("db")))
+                    continue
+                _record(label, attempt)
+                return result
+        return wrapper
+    return decorator
+
+
+class _Attempt:
+    def __init__(self, retrying: "Retrying", number: int):
+        self.retrying = retrying
+        self.number = number
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.retrying.done = True
+            _record(self.retrying.name, self.number)
+            return False
+        delay = _delay(exc, self.number, self.retrying.started, self.retrying.budget_seconds, self.retrying.max_attempts)
+        if delay is None:
+            _record(self.retrying.name, self.number, exhausted=is_retryable(exc))
+            return False
+        logger.warning(f"Retrying {self.retrying.name} after {exc.__class__.__name__} (attempt {self.number})")
+        self.retrying.db.rollback()
+        time.sleep(delay)
+        return True
+
+
+class Retrying:
+    # Context-manager form for blocking code (worker threads, jobs):
+    #
+    #     for attempt in Retrying(db, "sync"):
+    #         with attempt:
+    #             ...
+    #             db.commit()
+    #
+    # The last error is re-raised once attempts or budget run out.
+
+    def __init__(
+        self,
+        db: Session,
+        name: str,
+        budget_seconds: float = RETRY_BUDGET_SECONDS,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+    ):
+        self.db = db
+        self.name = name
+        self.budget_seconds = budget_seconds
+        self.max_attempts = max_attempts
+        self.started = time.monotonic()
+        self.done = False
+
+    def __iter__(self) -> Iterator[_Attempt]:
+        number = 0
+        while not self.done:
+            number += 1
+            yield _Attempt(self, number)
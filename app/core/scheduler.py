@@ -0,0 +1,166 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import timedelta
+from typing import Callable, Dict
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, utcnow
+from app.core.logging import logger
+from app.core.models import ScheduledJob
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+# How often each worker looks for due jobs
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", 30))
+# A worker that dies mid-run holds the job for at most this long; renewed after every batch
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", 300))
+# Maintenance jobs delete this many rows per transaction, then sleep: short locks, little I/O burst
+MAINTENANCE_BATCH_ROWS = int(os.getenv("MAINTENANCE_BATCH_ROWS", 500))
+MAINTENANCE_PAUSE_SECONDS = float(os.getenv("MAINTENANCE_PAUSE_SECONDS", 0.2))
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobRun:
+    # Handed to a running job: throttles between batches and keeps the lease alive
+
+    def __init__(self, db: Session, name: str, stopping: asyncio.Event):
+        self.db = db
+        self.name = name
+        self.stopping = stopping
+
+    def next_batch(self) -> bool:
+        # Called after each committed batch; False when the job should stop now
+        # (shutting down, or the lease was lost and another worker may have taken over)
+        if self.stopping.is_set():
+            return False
+        renewed = self.db.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == self.name, ScheduledJob.lease_owner == OWNER)
+            .values(lease_until=utcnow() + timedelta(seconds=SCHEDULER_LEASE_SECONDS))
+        ).rowcount
+        self.db.commit()
+        if not renewed:
+            logger.warning(f"Scheduled job {self.name} lost its lease, stopping")
+            return False
+        time.sleep(MAINTENANCE_PAUSE_SECONDS)
+        return True
+
+
+class Job:
+    def __init__(self, name: str, interval: float, run: Callable[[Session, JobRun], int]):
+        self.name = name
+        self.interval = interval  # seconds between the end of one run and the start of the next
+        self.run = run  # returns the number of rows affected
+
+
+jobs: Dict[str, Job] = {}
+
+
+def job(name: str, interval: float):
+    def register(run: Callable[[Session, JobRun], int]):
+        if interval > 0:
+            jobs[name] = Job(name, interval, run)
+        return run
+    return register
+
+
+def _register_rows() -> None:
+    db = SessionLocal()
+    try:
+        known = {name for (name,) in db.query(ScheduledJob.name)}
+        for name in jobs.keys() - known:
+            try:
+                db.add(ScheduledJob(name=name, next_run_at=utcnow()))
+                db.commit()
+            except IntegrityError:  # added by another worker starting at the same time
+                db.rollback()
+    finally:
+        db.close()
+
+
+def _claim(db: Session, job: Job) -> bool:
+    # Compare-and-set on the job row: exactly one worker wins a due job, on any database
+    now = utcnow()
+    claimed = db.execute(
+        update(ScheduledJob)
+        .where(
+            ScheduledJob.name == job.name,
+            ScheduledJob.next_run_at <= now,
+            or_(ScheduledJob.lease_until.is_(None), ScheduledJob.lease_until < now),
+        )
+        .values(lease_owner=OWNER, lease_until=now + timedelta(seconds=SCHEDULER_LEASE_SECONDS), last_started_at=now)
+    ).rowcount
+    db.commit()
+    return bool(claimed)
+
+
+def run_due(job: Job, stopping: asyncio.Event) -> None:
+    db = SessionLocal()
+    try:
+        if not _claim(db, job):
+            return
+        started = time.perf_counter()
+        rows, error = 0, None
+        try:
+            rows = job.run(db, JobRun(db, job.name, stopping))
+        except Exception as exc:
+            db.rollback()
+            error = repr(exc)
+            logger.exception(f"Scheduled job {job.name} failed")
+        duration = time.perf_counter() - started
+        db.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == job.name, ScheduledJob.lease_owner == OWNER)
+            .values(
+                next_run_at=utcnow() + timedelta(seconds=job.interval),
+                lease_owner=None,
+                lease_until=None,
+                runs=ScheduledJob.runs + 1,
+                last_duration=duration,
+                last_rows=rows,
+                last_error=error,
+            )
+        )
+        db.commit()
+        logger.info(f"Scheduled job {job.name} finished in {duration:.2f}s: {rows} row(s)")
+    except Exception:
+        logger.exception(f"Scheduler could not run job {job.name}")
+    finally:
+        db.close()
+
+
+def job_report(db: Session) -> list:
+    rows = db.query(ScheduledJob).filter(ScheduledJob.name.in_(jobs.keys())).order_by(ScheduledJob.name).all()
+    return [
+        {
+            "name": row.name,
+            "interval_seconds": jobs[row.name].interval,
+            "next_run_at": row.next_run_at,
+            "running_on": row.lease_owner,
+            "runs": row.runs,
+            "last_started_at": row.last_started_at,
+            "last_duration_seconds": row.last_duration,
+            "last_rows": row.last_rows,
+            "last_error": row.last_error,
+        }
+        for row in rows
+    ]
+
+
+async def run_scheduler(stopping: asyncio.Event) -> None:
+    # Every worker runs this loop; the job rows decide which one runs a due job
+    await asyncio.to_thread(_register_rows)
+    while not stopping.is_set():
+        for scheduled in list(jobs.values()):
+            if stopping.is_set():
+                break
+            await asyncio.to_thread(run_due, scheduled, stopping)
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=SCHEDULER_TICK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
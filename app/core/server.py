@@ -0,0 +1,106 @@
+import importlib.util
+import os
+import random
+from functools import partial
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.core.logging import logger, setup_logging
+
+
+def _cpu_count() -> int:
+    # CPUs this process may run on (container CPU sets), not the host's
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", 8000))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 0)) or _cpu_count()
+# "auto" picks uvloop / httptools when installed, else asyncio / h11
+WEB_LOOP = os.getenv("WEB_LOOP", "auto")
+WEB_HTTP = os.getenv("WEB_HTTP", "auto")
+# Longer than a load balancer's usual 60 s idle timeout, so the proxy closes idle connections
+# first and never sends a request on a connection the server is closing
+WEB_KEEPALIVE_SECONDS = int(os.getenv("WEB_KEEPALIVE_SECONDS", 65))
+# Pending connections the kernel queues per listening socket (capped by net.core.somaxconn)
+WEB_BACKLOG = int(os.getenv("WEB_BACKLOG", 2048))
+# On SIGTERM: stop accepting, let in-flight requests (checkouts included) finish for up to this
+# long, then run the lifespan shutdown (order intake commits its current batch)
+WEB_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("WEB_GRACEFUL_TIMEOUT_SECONDS", 30))
+# Recycle a worker after this many requests (0 = never), plus a random jitter per worker so
+# the workers do not all restart at once
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", 0))
+WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", 0))
+# AccessLoggerMiddleware already logs every request
+WEB_ACCESS_LOG = os.getenv("WEB_ACCESS_LOG", "false").lower() == "true"
+
+APP = "app.main:app"
+
+
+def _resolve(setting: str, fast: str, fallback: str) -> str:
+    if setting != "auto":
+        return setting
+    if importlib.util.find_spec(fast) is not None:
+        return fast
+    logger.warning(f"{fast} is not installed, falling back to {fallback}")
+    return fallback
+
+
+def build_config(**overrides) -> uvicorn.Config:
+    settings = dict(
+        host=WEB_HOST,
+        port=WEB_PORT,
+        workers=WEB_WORKERS,
+        loop=_resolve(WEB_LOOP, "uvloop", "asyncio"),
+        http=_resolve(WEB_HTTP, "httptools", "h11"),
+        timeout_keep_alive=WEB_KEEPALIVE_SECONDS,
+        backlog=WEB_BACKLOG,
+        timeout_graceful_shutdown=WEB_GRACEFUL_TIMEOUT_SECONDS,
+        limit_max_requests=WEB_MAX_REQUESTS or None,
+        access_log=WEB_ACCESS_LOG,
+        lifespan="on",
+    )
+    settings.update(overrides)
+    return uvicorn.Config(APP, **settings)
+
+
+def run_worker(config: uvicorn.Config, max_requests_jitter: int, sockets: Optional[List] = None) -> None:
+    # Runs in each worker process, on its own copy of the config
+    if config.limit_max_requests:
+        config.limit_max_requests += random.randint(0, max_requests_jitter)
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def main() -> None:
+    setup_logging()
+    config = build_config()
+    # Resolved, so the app modules of every worker see how many processes share the app
+    os.environ["WEB_WORKERS"] = str(config.workers)
+    if config.workers > 1 and os.getenv("PUBSUB_BROKER", "local") != "postgres":
+        logger.warning(
+            f"{config.workers} workers with PUBSUB_BROKER=local: product changes reach only the worker that made "
+            f"them, so the other workers' catalog caches and live streams lag. Set PUBSUB_BROKER=postgres"
+        )
+    logger.info(
+        f"Starting {APP} on {config.host}:{config.port}: {config.workers} worker(s), loop={config.loop}, "
+        f"http={config.http}, keep-alive={config.timeout_keep_alive}s, backlog={config.backlog}, "
+        f"graceful timeout={config.timeout_graceful_shutdown}s, max requests={config.limit_max_requests or 'off'}"
+    )
+    if config.workers == 1 and not config.limit_max_requests:
+        run_worker(config, 0)
+        return
+    # Imported once here so create_all runs before the workers start: on a fresh database they
+    # would race to create the tables
+    import app.main  # noqa: F401
+
+    # The supervisor restarts a worker that exits, which is what recycles it after WEB_MAX_REQUESTS
+    sock = config.bind_socket()
+    try:
+        Multiprocess(config, target=partial(run_worker, config, WEB_MAX_REQUESTS_JITTER), sockets=[sock]).run()
+    except KeyboardInterrupt:
+        pass
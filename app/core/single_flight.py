@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from app.core.logging import logger
+
+
+class _Entry:
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+
+class SingleFlightCache:
+    # Read-through cache for blocking loaders (database reads), run in a worker thread.
+    # - single flight: concurrent callers with the same key share one in-flight load
+    # - fresh for `fresh` seconds: served without loading
+    # - then stale for `stale` more seconds: served at once while one background load refreshes it
+    # - on a failed load, a value up to `stale_if_error` seconds old is served instead of the error
+    # Loads are shielded, so a client that disconnects does not cancel the load the others wait on.
+
+    def __init__(self, name: str, fresh: float, stale: float, stale_if_error: float, max_entries: int):
+        self.name = name
+        self.fresh = fresh
+        self.stale = stale
+        self.stale_if_error = stale_if_error
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        # Entries fetched before this are stale, whatever their age (see expire)
+        self.expired_before = 0.0
+        self.counts = {"fresh": 0, "stale": 0, "loads": 0, "coalesced": 0, "errors": 0, "stale_on_error": 0}
+        caches[name] = self
+
+    async def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            age = now - entry.fetched_at
+            if age < self.fresh and entry.fetched_at >= self.expired_before:
+                self.counts["fresh"] += 1
+                return entry.value
+            if age < self.fresh + self.stale:
+                self.counts["stale"] += 1
+                self._start(key, load)
+                return entry.value
+        try:
+            return await asyncio.shield(self._start(key, load))
+        except Exception:
+            if entry is None or now - entry.fetched_at >= self.stale_if_error:
+                raise
+            self.counts["stale_on_error"] += 1
+            logger.warning(f"{self.name}: load failed, serving a result {now - entry.fetched_at:.0f}s old")
+            return entry.value
+
+    def expire(self) -> None:
+        # Everything cached is stale from now on: the next read of each key refreshes it
+        self.expired_before = time.monotonic()
+
+    def _start(self, key: Hashable, load: Callable[[], Any]) -> asyncio.Task:
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counts["coalesced"] += 1
+            return task
+        self.counts["loads"] += 1
+        task = asyncio.create_task(self._load(key, load))
+        self.in_flight[key] = task
+        task.add_done_callback(lambda done: self._settle(key, done))
+        return task
+
+    async def _load(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        started = time.monotonic()
+        value = await asyncio.to_thread(load)
+        # Timestamped at the start: a change committed during the load is not hidden for longer
+        self.entries[key] = _Entry(value, started)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def _settle(self, key: Hashable, task: asyncio.Task) -> None:
+        self.in_flight.pop(key, None)
+        # Retrieves the exception even when nobody awaited the load (background refreshes)
+        if not task.cancelled() and task.exception() is not None:
+            self.counts["errors"] += 1
+            logger.error(f"{self.name}: load failed: {task.exception()!r}")
+
+    def stats(self) -> dict:
+        return {
+            **self.counts,
+            "entries": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "fresh_seconds": self.fresh,
+            "stale_seconds": self.stale,
+            "stale_if_error_seconds": self.stale_if_error,
+        }
+
+
+caches: Dict[str, SingleFlightCache] = {}
+
+
+def cache_stats() -> Dict[str, dict]:
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,155 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, delete, event, exists, literal_column, or_, select, union_all
+from sqlalchemy.engine import default
+from sqlalchemy.orm import Session, selectinload
+
+from app.auth.models import User
+from app.cart.models import Cart
+from app.core.database import engine
+from app.orders.models import (
+    ARCHIVED_ORDER_SUMMARY_COLUMNS,
+    ORDER_SUMMARY_COLUMNS,
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Order,
+    OrderIntent,
+    OrderItem,
+)
+from app.products.models import PRODUCT_OUT_COLUMNS, Product, ProductImport, ProductImportError
+
+# Hot-path lookups built once at import. A statement object memoizes its cache key, so each
+# execution skips both query construction and cache key generation and goes straight to
+# the engine's compiled cache. Values are passed as bound parameters, never baked in.
+
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+
+PRODUCT_BY_ID = select(Product).where(Product.id == bindparam("product_id"))
+PRODUCT_BY_ID_FOR_UPDATE = PRODUCT_BY_ID.with_for_update()
+
+PRODUCT_BY_NAME = select(Product).where(Product.name == bindparam("name")).limit(1)
+PRODUCT_PAGE = select(*PRODUCT_OUT_COLUMNS).offset(bindparam("skip")).limit(bindparam("limit"))
+PRODUCT_NAMES = select(Product.id, Product.name).where(Product.id.in_(bindparam("product_ids", expanding=True)))
+PRODUCT_IN_ORDERS = select(or_(
+    exists().where(OrderItem.product_id == bindparam("product_id")),
+    exists().where(ArchivedOrderItem.product_id == bindparam("product_id")),
+))
+
+PRODUCT_IMPORT_BY_ID = select(ProductImport).where(ProductImport.id == bindparam("import_id"))
+PRODUCT_IMPORT_ERRORS = (
+    select(ProductImportError)
+    .where(ProductImportError.import_id == bindparam("import_id"))
+    .order_by(ProductImportError.line)
+    .offset(bindparam("skip"))
+    .limit(bindparam("limit"))
+)
+
+CART_ITEMS = select(Cart).where(Cart.user_id == bindparam("user_id"))
+CART_ITEM = select(Cart).where(Cart.user_id == bindparam("user_id"), Cart.product_id == bindparam("product_id"))
+CLEAR_CART = delete(Cart).where(Cart.user_id == bindparam("user_id"))
+
+# Newest first across the hot table and cold storage; orders placed at the same instant newest id first
+ORDER_HISTORY = union_all(
+    select(*ORDER_SUMMARY_COLUMNS).where(Order.user_id == bindparam("user_id")),
+    select(*ARCHIVED_ORDER_SUMMARY_COLUMNS).where(ArchivedOrder.user_id == bindparam("user_id")),
+).order_by(literal_column("created_at").desc(), literal_column("id").desc())
+ORDER_BY_ID = select(Order).where(Order.id == bindparam("order_id"), Order.user_id == bindparam("user_id"))
+ARCHIVED_ORDER_BY_ID = (
+    select(ArchivedOrder)
+    .options(selectinload(ArchivedOrder.items))
+    .where(ArchivedOrder.id == bindparam("order_id"), ArchivedOrder.user_id == bindparam("user_id"))
+)
+ORDER_INTENT_BY_ID = select(OrderIntent).where(
+    OrderIntent.id == bindparam("intent_id"), OrderIntent.user_id == bindparam("user_id")
+)
+
+
+def user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.execute(USER_BY_EMAIL, {"email": email}).scalars().first()
+
+
+def product_by_id(db: Session, product_id: int, for_update: bool = False) -> Optional[Product]:
+    statement = PRODUCT_BY_ID_FOR_UPDATE if for_update else PRODUCT_BY_ID
+    return db.execute(statement, {"product_id": product_id}).scalars().first()
+
+
+def cart_items(db: Session, user_id: int) -> List[Cart]:
+    return db.execute(CART_ITEMS, {"user_id": user_id}).scalars().all()
+
+
+def cart_item(db: Session, user_id: int, product_id: int) -> Optional[Cart]:
+    return db.execute(CART_ITEM, {"user_id": user_id, "product_id": product_id}).scalars().first()
+
+
+def clear_cart(db: Session, user_id: int) -> None:
+    db.execute(CLEAR_CART, {"user_id": user_id})
+
+
+def product_by_name(db: Session, name: str) -> Optional[Product]:
+    return db.execute(PRODUCT_BY_NAME, {"name": name}).scalars().first()
+
+
+def product_page(db: Session, skip: int, limit: int) -> list:
+    return db.execute(PRODUCT_PAGE, {"skip": skip, "limit": limit}).all()
+
+
+def product_names(db: Session, product_ids: List[int]) -> Dict[int, str]:
+    return dict(db.execute(PRODUCT_NAMES, {"product_ids": product_ids}).all()) if product_ids else {}
+
+
+def product_in_orders(db: Session, product_id: int) -> bool:
+    return db.execute(PRODUCT_IN_ORDERS, {"product_id": product_id}).scalar()
+
+
+def product_import(db: Session, import_id: int) -> Optional[ProductImport]:
+    return db.execute(PRODUCT_IMPORT_BY_ID, {"import_id": import_id}).scalars().first()
+
+
+def product_import_errors(db: Session, import_id: int, skip: int, limit: int) -> List[ProductImportError]:
+    return db.execute(PRODUCT_IMPORT_ERRORS, {"import_id": import_id, "skip": skip, "limit": limit}).scalars().all()
+
+
+def order_history(db: Session, user_id: int) -> list:
+    return db.execute(ORDER_HISTORY, {"user_id": user_id}).all()
+
+
+def order_by_id(db: Session, user_id: int, order_id: int) -> Optional[Order]:
+    return db.execute(ORDER_BY_ID, {"order_id": order_id, "user_id": user_id}).scalars().first()
+
+
+def archived_order_by_id(db: Session, user_id: int, order_id: int) -> Optional[ArchivedOrder]:
+    return db.execute(ARCHIVED_ORDER_BY_ID, {"order_id": order_id, "user_id": user_id}).scalars().first()
+
+
+def order_intent(db: Session, user_id: int, intent_id: int) -> Optional[OrderIntent]:
+    return db.execute(ORDER_INTENT_BY_ID, {"intent_id": intent_id, "user_id": user_id}).scalars().first()
+
+
+# Compiled cache outcome of every statement executed by this process
+CACHE_OUTCOMES = {
+    default.CACHE_HIT: "hit",
+    default.CACHE_MISS: "miss",
+    default.CACHING_DISABLED: "disabled",
+    default.NO_CACHE_KEY: "no_cache_key",
+    default.NO_DIALECT_SUPPORT: "no_dialect_support",
+}
+compiled_cache_stats: Counter = Counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _count_cache_outcome(conn, cursor, statement, parameters, context, executemany):
+    outcome = getattr(context, "cache_hit", None)
+    if outcome is not None:
+        compiled_cache_stats[CACHE_OUTCOMES.get(outcome, "other")] += 1
+
+
+def cache_report() -> dict:
+    hits, misses = compiled_cache_stats["hit"], compiled_cache_stats["miss"]
+    cache = engine._compiled_cache
+    return {
+        **compiled_cache_stats,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        "entries": len(cache) if cache is not None else 0,
+        "capacity": cache.capacity if cache is not None else 0,
+    }
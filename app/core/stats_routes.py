@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.auth.models import Roles
+from app.auth.dependencies import require_role
+from app.core.compression import catalog_cache, codecs
+from app.core.profiling import recent_profiles
+from app.core.rate_limit import policy_stats
+from app.core.deps import get_db
+from app.core.retry import retry_stats
+from app.core.scheduler import job_report
+from app.core.single_flight import cache_stats
+from app.core.statements import cache_report
+from app.middlewares.admission import limiters
+from app.products.catalog_engine import catalog_engine
+
+
+router = APIRouter(prefix="/admin/stats", tags=["Admin Stats"])
+
+
+# Transactional retry counters per route since the process started
+@router.get("/retries")
+async def get_retry_stats(user: dict = Depends(require_role(Roles.admin))):
+    return {name: dict(counts) for name, counts in retry_stats.items()}
+
+
+# Admission control per route group: current limit, in-flight and queued requests, rejections
+@router.get("/admission")
+async def get_admission_stats(user: dict = Depends(require_role(Roles.admin))):
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+# Rate limit policies with their allowed / limited hit counts
+@router.get("/rate-limits")
+async def get_rate_limit_stats(user: dict = Depends(require_role(Roles.admin))):
+    return policy_stats()
+
+
+# SQLAlchemy compiled statement cache: hit / miss counts, hit rate and size
+@router.get("/statements")
+async def get_statement_cache_stats(user: dict = Depends(require_role(Roles.admin))):
+    return cache_report()
+
+
+# Encodings this process can serve, and the pre-compressed catalog cache: size, hits and misses
+@router.get("/compression")
+async def get_compression_stats(user: dict = Depends(require_role(Roles.admin))):
+    return {"encodings": list(codecs), "catalog_cache": catalog_cache.stats()}
+
+
+# Coalesced / stale-while-revalidate read caches: fresh and stale hits, loads, requests that
+# joined an in-flight load, failed loads and stale results served in their place
+@router.get("/single-flight")
+async def get_single_flight_stats(user: dict = Depends(require_role(Roles.admin))):
+    return cache_stats()
+
+
+# In-memory catalog engine of this worker: products, interned categories, memory, last build
+@router.get("/catalog-engine")
+async def get_catalog_engine_stats(user: dict = Depends(require_role(Roles.admin))):
+    return catalog_engine.stats()
+
+
+# Profiles written by this process (X-Profile requests and 1-in-N sampling), newest first
+@router.get("/profiles")
+async def get_recent_profiles(user: dict = Depends(require_role(Roles.admin))):
+    return list(reversed(recent_profiles))
+
+
+# Periodic jobs shared by all workers: next run, current lease holder, last duration and rows affected
+@router.get("/jobs")
+def get_job_stats(db: Session = Depends(get_db), user: dict = Depends(require_role(Roles.admin))):
+    return job_report(db)
@@ -1,5 +1,7 @@
 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from app.core.database import engine ,Base  # Assuming get_db is defined in your database module
@@ -7,13 +9,19 @@ from app.auth import models as auth_models
 from app.products import models as product_models 
 from app.cart import models as cart_models
 from app.orders import models as order_models
+from app.core import models as core_models
 from app.core.logging import setup_logging
+from app.core.pubsub import broker, hub
+from app.core.scheduler import SCHEDULER_ENABLED, run_scheduler
 from app.core.error_logger import (
     http_exception_handler,
     validation_exception_handler,
     generic_exception_handler
     )
 from app.middlewares.access_logger import AccessLoggerMiddleware
+from app.middlewares.admission import AdmissionControlMiddleware
+from app.middlewares.compression import CompressionMiddleware
+from app.middlewares.profiler import ProfilerMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
@@ -26,6 +34,16 @@ from app.products.public_routes import router as public_product_router
 from app.cart.routes import router as cart_router
 from app.orders.checkout_routes import router as checkout_router
 from app.orders.orders_routes import router as order_router
+from app.orders.admin_routes import router as admin_order_router
+from app.orders.analytics_routes import router as analytics_router
+from app.core.stats_routes import router as stats_router
+from app.core import maintenance  # noqa: F401  (registers the maintenance jobs)
+from app.orders import archive  # noqa: F401  (registers the archiving job)
+from app.orders import analytics  # noqa: F401  (registers the sales fold job)
+from app.orders.intake import CHECKOUT_QUEUE_ENABLED, worker_pool
+from app.products.autocomplete import AUTOCOMPLETE_ENABLED, run_autocomplete_refresh
+from app.products.catalog_engine import CATALOG_ENGINE_ENABLED, run_catalog_engine
+from app.products import inventory  # noqa: F401  (registers the stock shard sync job)
 
 load_dotenv()  
 smtp_host = os.getenv("SMTP_HOST")
@@ -35,8 +53,33 @@ smtp_pass = os.getenv("SMTP_PASS")
 
 setup_logging()  # Set up logging configuration
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stopping = asyncio.Event()
+    background = []
+    await broker.start(hub)
+    if AUTOCOMPLETE_ENABLED:
+        background.append(asyncio.create_task(run_autocomplete_refresh(stopping)))
+    if CATALOG_ENGINE_ENABLED:
+        background.append(asyncio.create_task(run_catalog_engine(stopping)))
+    if SCHEDULER_ENABLED:
+        background.append(asyncio.create_task(run_scheduler(stopping)))
+    if CHECKOUT_QUEUE_ENABLED:
+        worker_pool.start()
+    yield
+    stopping.set()
+    if CHECKOUT_QUEUE_ENABLED:
+        await worker_pool.stop()
+    await asyncio.gather(*background, return_exceptions=True)
+    await broker.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(ProfilerMiddleware)  # innermost: profiles the request, not its time in the admission queue
+app.add_middleware(AdmissionControlMiddleware)  # inside the access logger, so shed requests are still logged
+app.add_middleware(CompressionMiddleware)  # encodes what the routes did not compress themselves
 app.add_middleware(AccessLoggerMiddleware)
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -45,7 +88,7 @@ app.add_exception_handler(Exception, generic_exception_handler)
 
 
 # For creating the database tables
-_ = [auth_models , product_models,cart_models , order_models] 
+_ = [auth_models , product_models,cart_models , order_models, core_models] 
 
 Base.metadata.create_all(bind=engine) # Create database tables
 
@@ -57,6 +100,9 @@ app.include_router(public_product_router)
 app.include_router(cart_router)
 app.include_router(checkout_router)
 app.include_router(order_router)
+app.include_router(admin_order_router)
+app.include_router(analytics_router)
+app.include_router(stats_router)
 
 
 @app.get("/")
@@ -0,0 +1,198 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.deadline import request_deadline
+from app.core.error_logger import create_error_response
+from app.core.logging import logger
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# group=concurrency:queue; the defaults keep the sum near the engine's pool size (5 + 10 overflow)
+ADMISSION_LIMITS = os.getenv(
+    "ADMISSION_LIMITS", "catalog=8:32,checkout=4:8,auth=2:8,export=2:0,default=6:24"
+)
+# Longest a request waits in a queue; longer waits mean the server is overloaded anyway
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 1))
+# Deadline for requests without an X-Request-Timeout header (seconds)
+ADMISSION_DEFAULT_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_DEFAULT_TIMEOUT_SECONDS", 30))
+# Adaptive mode moves each group's limit between 1 and 4x its configured value from observed latency
+ADMISSION_ADAPTIVE = os.getenv("ADMISSION_ADAPTIVE", "false").lower() == "true"
+
+# First match wins; None means not limited
+ROUTE_GROUPS = [
+    (re.compile(r"^/products/live$"), None),  # SSE: holds no DB session after the snapshot
+    (re.compile(r"/export$"), "export"),
+    (re.compile(r"^/auth/"), "auth"),  # bcrypt hashing is CPU-bound
+    (re.compile(r"^/checkout"), "checkout"),
+    (re.compile(r"^/products"), "catalog"),
+]
+
+
+class GroupLimiter:
+    # Concurrency limit with a bounded FIFO queue. A released slot is handed straight to the
+    # oldest waiter, so queued requests are not overtaken by new arrivals.
+
+    def __init__(self, name: str, limit: int, queue: int, adaptive: bool = False):
+        self.name = name
+        self.configured = limit
+        self.limit = float(limit)
+        self.queue = queue
+        self.adaptive = adaptive
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = 0
+        # Service time (excluding queueing): fast and slow moving averages
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+
+    def _capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    async def acquire(self, wait: float) -> bool:
+        if self.in_flight < self._capacity() and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self.waiters) >= self.queue or wait <= 0:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=wait)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            self.rejected += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            self.release()  # the slot was handed over just as we gave up: pass it on
+            return
+        waiter.cancel()
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # in_flight unchanged: the slot moves to the waiter
+                return
+        self.in_flight -= 1
+
+    def _wake(self) -> None:
+        while self.waiters and self.in_flight < self._capacity():
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def observe(self, seconds: float) -> None:
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        self.baseline = seconds if self.baseline is None else 0.99 * self.baseline + 0.01 * seconds
+        if not self.adaptive:
+            return
+        # Gradient: shrink while latency runs above its long-term baseline (the DB is queueing),
+        # grow by sqrt(limit) headroom while it does not
+        gradient = max(0.5, min(1.0, self.baseline / self.latency)) if self.latency > 0 else 1.0
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = min(max(0.9 * self.limit + 0.1 * target, 1.0), 4.0 * self.configured)
+        self._wake()
+
+    def expected_latency(self) -> float:
+        return self.latency or 0.0
+
+    def stats(self) -> dict:
+        return {
+            "limit": self._capacity(),
+            "configured_limit": self.configured,
+            "queue": self.queue,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "latency_ms": round((self.latency or 0) * 1000, 1),
+        }
+
+
+def parse_limits(spec: str, adaptive: bool) -> Dict[str, GroupLimiter]:
+    limiters = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, sizes = entry.partition("=")
+        limit, _, queue = sizes.partition(":")
+        limiters[name] = GroupLimiter(name, int(limit), int(queue or 0), adaptive)
+    limiters.setdefault("default", GroupLimiter("default", 6, 24, adaptive))
+    return limiters
+
+
+limiters = parse_limits(ADMISSION_LIMITS, ADMISSION_ADAPTIVE)
+
+
+def route_group(path: str) -> Optional[str]:
+    for pattern, group in ROUTE_GROUPS:
+        if pattern.search(path):
+            return group if group in limiters else "default"
+    return "default"
+
+
+def _client_timeout(scope: Scope) -> float:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-request-timeout":
+            try:
+                return min(float(value), ADMISSION_DEFAULT_TIMEOUT_SECONDS)
+            except ValueError:
+                break
+    return ADMISSION_DEFAULT_TIMEOUT_SECONDS
+
+
+class AdmissionControlMiddleware:
+    # Pure ASGI so a slot is held until the response body is fully sent (exports stream for minutes)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        group = route_group(scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = limiters[group]
+        started = time.monotonic()
+        deadline = started + _client_timeout(scope)
+        # Don't queue a request that could not finish before its deadline even if admitted now
+        wait = min(ADMISSION_QUEUE_TIMEOUT_SECONDS, deadline - started - limiter.expected_latency())
+        if not await limiter.acquire(wait):
+            logger.warning(f"Admission rejected {scope['method']} {scope['path']} (group={group}, in_flight={limiter.in_flight})")
+            response = create_error_response("Server is busy, please retry", 503)
+            response.headers["Retry-After"] = "1"
+            await response(scope, receive, send)
+            return
+
+        token = request_deadline.set(deadline)
+        admitted = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
+            limiter.observe(time.monotonic() - admitted)
+            limiter.release()
@@ -0,0 +1,85 @@
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import COMPRESSION_MIN_BYTES, codecs, is_compressible, negotiate_encoding
+
+
+class CompressionMiddleware:
+    # Compresses response bodies with the best encoding the client accepts. Passed through
+    # untouched: bodies under COMPRESSION_MIN_BYTES, media types outside COMPRESSION_TYPES,
+    # server-sent events, and responses that already carry a Content-Encoding (the exports,
+    # the pre-compressed catalog pages).
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding))
+
+
+class _CompressingSend:
+    # Holds back http.response.start until the first body chunk shows whether to compress
+
+    def __init__(self, send: Send, encoding: str):
+        self.send = send
+        self.encoding = encoding
+        self.start: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                message["status"] < 200
+                or message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            length = int(headers.get("content-length", -1))
+            too_small = len(body) < COMPRESSION_MIN_BYTES if not more_body else 0 <= length < COMPRESSION_MIN_BYTES
+            headers.add_vary_header("Accept-Encoding")
+            if too_small:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.encoding
+            if not more_body:
+                body = codecs[self.encoding].compress(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            # Streamed: the compressed length is not known up front
+            del headers["Content-Length"]
+            self.compressor = codecs[self.encoding].stream()
+            await self.send(start)
+
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.flush()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
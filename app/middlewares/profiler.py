@@ -0,0 +1,108 @@
+import itertools
+import os
+import re
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.dependencies import get_current_user, require_role
+from app.auth.models import Roles
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.core.profiling import RequestProfiler
+
+# On demand: an admin sends "X-Profile: sample|cprofile" (or ?profile=sample|cprofile)
+PROFILE_ON_DEMAND = os.getenv("PROFILE_ON_DEMAND", "true").lower() == "true"
+# Background sampling: profile 1 in N requests whose path matches PROFILE_SAMPLE_ROUTES (0 = off)
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))
+PROFILE_SAMPLE_ROUTES = re.compile(os.getenv("PROFILE_SAMPLE_ROUTES", r"^/(products|cart|checkout|orders)"))
+
+MODES = {"sample", "cprofile"}
+
+_request_counter = itertools.count()
+
+
+def _requested_mode(scope: Scope) -> Optional[str]:
+    # Any other value ("1", "true") means the full cProfile run
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            mode = value.decode("latin-1").strip().lower()
+            return mode if mode in MODES else "cprofile"
+    query = scope.get("query_string", b"")
+    values = parse_qs(query.decode("latin-1")).get("profile") if query else None
+    if values:
+        mode = values[0].strip().lower()
+        return mode if mode in MODES else "cprofile"
+    return None
+
+
+def _bearer_token(scope: Scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+    return None
+
+
+def _is_admin(token: str) -> bool:
+    # The same checks as Depends(require_role(Roles.admin)), run before routing
+    db = SessionLocal()
+    try:
+        require_role(Roles.admin)(get_current_user(token, db))
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+
+class ProfilerMiddleware:
+    # Added innermost, so admission queueing is not part of the profile.
+    # When nothing asks for a profile the cost is a header scan and one integer check.
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode, trigger = None, None
+        if PROFILE_ON_DEMAND:
+            mode = _requested_mode(scope)
+            if mode is not None:
+                token = _bearer_token(scope)
+                if token is None or not await run_in_threadpool(_is_admin, token):
+                    mode = None  # not an admin: serve the request normally, without saying why
+                trigger = "on-demand"
+        if mode is None and PROFILE_SAMPLE_EVERY and PROFILE_SAMPLE_ROUTES.search(scope["path"]):
+            if next(_request_counter) % PROFILE_SAMPLE_EVERY == 0:
+                mode, trigger = "sample", f"1-in-{PROFILE_SAMPLE_EVERY}"
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = RequestProfiler(mode)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            # FastAPI leaves the matched route in the scope; fall back to the raw path for 404s
+            route = getattr(scope.get("route"), "path", scope["path"])
+            try:
+                await run_in_threadpool(profiler.write, scope["method"], route, status_code, trigger)
+            except OSError:
+                logger.exception("Could not write request profile")
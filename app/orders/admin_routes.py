@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+from app.auth.dependencies import require_role
+from app.auth.models import Roles
+from app.core.database import utcnow
+from app.core.deps import get_db
+from app.core.export import export_response
+from app.core.logging import logger
+from app.orders import archive, transitions
+from app.orders.models import ORDER_TABLES, OrderStatus
+from app.orders.schemas import OrderStatusUpdate, OrderTransitionOut, TransitionStatus
+
+router = APIRouter(prefix="/admin/orders", tags=["Admin Orders"])
+
+
+def created_between(statement, orders, start: Optional[datetime], end: Optional[datetime]):
+    # Half-open range [start, end) on the order's creation time (UTC)
+    if start:
+        statement = statement.where(orders.created_at >= start)
+    if end:
+        statement = statement.where(orders.created_at < end)
+    return statement
+
+
+# export orders created in [start, end) as NDJSON or CSV
+@router.get("/export")
+async def export_orders(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Created at or after (UTC)"),
+    end: Optional[datetime] = Query(None, description="Created before (UTC)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    # Hot tables and cold storage, merged on id
+    merged = union_all(*(
+        created_between(select(orders.id, orders.user_id, orders.created_at, orders.total_amount, orders.status), orders, start, end)
+        for orders, _, _ in ORDER_TABLES
+    )).subquery()
+    statement = select(*merged.c).order_by(merged.c.id)
+    logger.info(f"Order export started ({start} - {end}) as {format} by admin ID: {user.get('id')}")
+    return export_response(request, statement, format, "orders")
+
+
+# export the items of orders created in [start, end), one row per order line
+@router.get("/items/export")
+async def export_order_items(
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Order created at or after (UTC)"),
+    end: Optional[datetime] = Query(None, description="Order created before (UTC)"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    merged = union_all(*(
+        created_between(
+            select(
+                items.id,
+                items.order_id,
+                orders.user_id,
+                orders.created_at,
+                items.product_id,
+                items.quantity,
+                items.price_at_purchase,
+                items.category,
+            ).join(orders, joined),
+            orders, start, end,
+        )
+        for orders, items, joined in ORDER_TABLES
+    )).subquery()
+    statement = select(*merged.c).order_by(merged.c.id)
+    logger.info(f"Order item export started ({start} - {end}) as {format} by admin ID: {user.get('id')}")
+    return export_response(request, statement, format, "order_items")
+
+
+# BULK STATUS CHANGE - pay or cancel many orders at once; cancelling restocks, one transaction per chunk
+@router.post("/status", response_model=OrderTransitionOut)
+async def change_order_status(
+    data: OrderStatusUpdate,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    try:
+        results = transitions.apply_transitions(db, data.order_ids, OrderStatus(data.status.value))
+        updated = sum(1 for result in results if result["status"] == TransitionStatus.updated)
+        failed = sum(1 for result in results if result["status"] not in (TransitionStatus.updated, TransitionStatus.unchanged))
+        logger.info(f"Status change to {data.status.value} for {len(results)} order(s): {updated} updated, {failed} failed, by admin ID: {user.get('id')}")
+        return OrderTransitionOut(updated=updated, failed=failed, results=results)
+
+    except Exception:
+        logger.exception("Exception while changing order status")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# move closed orders older than the given age from the hot tables to cold storage
+@router.post("/archive")
+async def archive_orders(
+    older_than_days: int = Query(archive.ORDER_ARCHIVE_AFTER_DAYS, ge=1),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    try:
+        moved = archive.archive_orders(db, utcnow() - timedelta(days=older_than_days))
+        logger.info(f"Archived {moved} closed order(s) older than {older_than_days} day(s) by AdminID={user.get('id')}")
+        return {"message": f"Archived {moved} order(s)"}
+
+    except Exception:
+        logger.exception("Exception while archiving orders")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -0,0 +1,244 @@
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import scheduler
+from app.orders.models import ORDER_TABLES, Order, OrderStatus, SalesRollup, SalesRollupChange
+
+GRAINS = ("hour", "day")
+REBUILD_FLUSH_ORDERS = 5000
+# How often the appended rollup changes are folded into sales_rollups (by one worker); reports
+# add the changes not folded yet, so they are current either way. 0 disables
+SALES_FOLD_SECONDS = float(os.getenv("SALES_FOLD_SECONDS", 60))
+# Changes folded per transaction
+SALES_FOLD_BATCH_ROWS = int(os.getenv("SALES_FOLD_BATCH_ROWS", 5000))
+# Rows per upsert statement
+UPSERT_ROWS = 1000
+# INSERT ... ON CONFLICT DO UPDATE: one statement for a whole delta
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# (grain, dimension, key, bucket)
+RollupKey = Tuple[str, str, str, datetime]
+
+KEY_COLUMNS = (SalesRollup.grain, SalesRollup.dimension, SalesRollup.key, SalesRollup.bucket)
+rollups = SalesRollup.__table__
+changes = SalesRollupChange.__table__
+INCREMENT = (
+    update(rollups)
+    .where(
+        rollups.c.grain == bindparam("b_grain"),
+        rollups.c.dimension == bindparam("b_dimension"),
+        rollups.c.key == bindparam("b_key"),
+        rollups.c.bucket == bindparam("b_bucket"),
+    )
+    .values(
+        orders=rollups.c.orders + bindparam("b_orders"),
+        units=rollups.c.units + bindparam("b_units"),
+        revenue=rollups.c.revenue + bindparam("b_revenue"),
+    )
+)
+
+
+def bucket_start(moment: datetime, grain: str) -> datetime:
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if grain == "day" else moment
+
+
+class SalesDelta:
+    # Sums the rollup changes of one or more orders. apply() appends them to the change log in
+    # the caller's transaction: unlike FacetDelta it updates no row, so checkouts never queue
+    # on the hour's and day's total rows. fold() writes them to the rollups themselves.
+
+    def __init__(self):
+        self.rows: Dict[RollupKey, List] = defaultdict(lambda: [0, 0, 0.0])
+
+    def add_order(self, created_at: datetime, lines: List[Tuple[int, str, int, float]], sign: int = 1) -> "SalesDelta":
+        # lines: (product_id, category, quantity, unit price); sign=-1 takes a cancelled order back out
+        products: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+        categories: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+        for product_id, category, quantity, price in lines:
+            for totals, key in ((products, str(product_id)), (categories, category.lower())):
+                totals[key][0] += quantity
+                totals[key][1] += quantity * price
+        units = sum(units for units, _ in products.values())
+        revenue = sum(revenue for _, revenue in products.values())
+
+        for grain in GRAINS:
+            bucket = bucket_start(created_at, grain)
+            self._add((grain, "total", "", bucket), sign, units, revenue)
+            for dimension, totals in (("category", categories), ("product", products)):
+                for key, (key_units, key_revenue) in totals.items():
+                    self._add((grain, dimension, key, bucket), sign, key_units, key_revenue)
+        return self
+
+    def add_placed_order(self, order: Order) -> "SalesDelta":
+        lines = [(item.product_id, item.category, item.quantity, item.price_at_purchase) for item in order.items]
+        return self.add_order(order.created_at, lines)
+
+    def _add(self, key: RollupKey, sign: int, units: int, revenue: float) -> None:
+        row = self.rows[key]
+        row[0] += sign
+        row[1] += sign * units
+        row[2] += sign * revenue
+
+    def apply(self, db: Session) -> None:
+        if self.rows:
+            db.execute(insert(SalesRollupChange), [_values(key, values) for key, values in self.rows.items()])
+        self.rows.clear()
+
+    def fold(self, db: Session) -> None:
+        if not self.rows:
+            return
+        # Rows are written in key order, so a fold and a rebuild cannot deadlock each other
+        rows = sorted(self.rows.items())
+        dialect = db.get_bind().dialect.name
+        if dialect in UPSERT_INSERTS:
+            statement = UPSERT_INSERTS[dialect](SalesRollup)
+            statement = statement.on_conflict_do_update(
+                index_elements=[column.key for column in KEY_COLUMNS],
+                set_={column: rollups.c[column] + statement.excluded[column] for column in ("orders", "units", "revenue")},
+            )
+            for start in range(0, len(rows), UPSERT_ROWS):
+                db.execute(statement, [_values(key, values) for key, values in rows[start:start + UPSERT_ROWS]])
+        else:
+            for key, values in rows:
+                _upsert(db, key, values)
+        self.rows.clear()
+
+
+def _values(key: RollupKey, values: List) -> dict:
+    grain, dimension, name, bucket = key
+    return {"grain": grain, "dimension": dimension, "key": name, "bucket": bucket,
+            "orders": values[0], "units": values[1], "revenue": values[2]}
+
+
+def _params(key: RollupKey, values: List) -> dict:
+    return {"b_" + column: value for column, value in _values(key, values).items()}
+
+
+def _upsert(db: Session, key: RollupKey, values: List) -> None:
+    if db.execute(INCREMENT, _params(key, values)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(SalesRollup), [_values(key, values)])
+    except IntegrityError:
+        db.execute(INCREMENT, _params(key, values))
+
+
+@scheduler.job("fold_sales_changes", SALES_FOLD_SECONDS)
+def fold_sales_changes(db: Session, run: scheduler.JobRun) -> int:
+    # Oldest first; the changes read are deleted by id, so one committed meanwhile with a
+    # lower id (ids are not handed out in commit order) waits for the next batch
+    folded = 0
+    while True:
+        rows = db.execute(
+            select(changes.c.id, changes.c.grain, changes.c.dimension, changes.c.key, changes.c.bucket,
+                   changes.c.orders, changes.c.units, changes.c.revenue)
+            .order_by(changes.c.id)
+            .limit(SALES_FOLD_BATCH_ROWS)
+        ).all()
+        if rows:
+            delta = SalesDelta()
+            for _, grain, dimension, key, bucket, orders, units, revenue in rows:
+                totals = delta.rows[(grain, dimension, key, bucket)]
+                totals[0] += orders
+                totals[1] += units
+                totals[2] += revenue
+            delta.fold(db)
+            db.execute(delete(SalesRollupChange).where(SalesRollupChange.id.in_([row.id for row in rows])))
+            db.commit()
+            folded += len(rows)
+        if len(rows) < SALES_FOLD_BATCH_ROWS or not run.next_batch():
+            return folded
+
+
+def rebuild_sales(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    # Backfill / repair: recompute the rollups of whole days in [start, end) from the orders,
+    # dropping the unfolded changes of the range with them. Orders are streamed in time order
+    # and the delta is folded every few thousand orders, so memory stays flat and each fold
+    # touches only a short run of buckets. Checkouts committed during the rebuild of the
+    # current day can be counted twice: rebuild closed days. Caller commits.
+    start = bucket_start(start, "day") if start else None
+    end = bucket_start(end - timedelta(microseconds=1), "day") + timedelta(days=1) if end else None
+
+    for model in (SalesRollup, SalesRollupChange):
+        stale = delete(model)
+        if start:
+            stale = stale.where(model.bucket >= start)
+        if end:
+            stale = stale.where(model.bucket < end)
+        db.execute(stale)
+
+    delta = SalesDelta()
+    orders = 0
+    # Cold storage first: archived orders are the older ones
+    for order_table, item_table, joined in reversed(ORDER_TABLES):
+        rows = (
+            db.query(order_table.id, order_table.created_at, item_table.product_id, item_table.category,
+                     item_table.quantity, item_table.price_at_purchase)
+            .join(item_table, joined)
+            .filter(order_table.status != OrderStatus.cancelled)
+        )
+        if start:
+            rows = rows.filter(order_table.created_at >= start)
+        if end:
+            rows = rows.filter(order_table.created_at < end)
+
+        for _, items in groupby(rows.order_by(order_table.created_at, order_table.id).yield_per(5000), key=itemgetter(0)):
+            items = list(items)
+            delta.add_order(items[0].created_at, [(item[2], item[3], item[4], item[5]) for item in items])
+            orders += 1
+            if orders % REBUILD_FLUSH_ORDERS == 0:
+                delta.fold(db)
+    delta.fold(db)
+    return orders
+
+
+def _sales(db: Session, grain: str, dimension: str, start: Optional[datetime], end: Optional[datetime]):
+    # The rollups plus the changes not folded yet, each filtered on its own. The union is left
+    # out when no change of the range is waiting, so the rollups are grouped straight off their indexes.
+    parts = []
+    for table in (rollups, changes):
+        part = select(table.c.key, table.c.bucket, table.c.orders, table.c.units, table.c.revenue).where(
+            table.c.grain == grain, table.c.dimension == dimension
+        )
+        if start:
+            part = part.where(table.c.bucket >= start)
+        if end:
+            part = part.where(table.c.bucket < end)
+        parts.append(part)
+    if db.execute(parts[1].with_only_columns(changes.c.id).limit(1)).first() is None:
+        return parts[0].subquery()
+    return union_all(*parts).subquery()
+
+
+def sales_series(db: Session, grain: str, start: Optional[datetime], end: Optional[datetime]) -> List[dict]:
+    sales = _sales(db, grain, "total", start, end)
+    query = db.query(
+        sales.c.bucket,
+        func.sum(sales.c.orders).label("orders"),
+        func.sum(sales.c.units).label("units"),
+        func.sum(sales.c.revenue).label("revenue"),
+    ).group_by(sales.c.bucket)
+    return [row._asdict() for row in query.order_by(sales.c.bucket)]
+
+
+def sales_by(db: Session, dimension: str, grain: str, start: Optional[datetime], end: Optional[datetime],
+             order_by: str = "revenue", limit: Optional[int] = None) -> List[dict]:
+    # Totals per category / product over the range; orders is the number of orders containing it
+    sales = _sales(db, grain, dimension, start, end)
+    totals = (func.sum(sales.c.orders), func.sum(sales.c.units), func.sum(sales.c.revenue))
+    query = db.query(sales.c.key, *totals).group_by(sales.c.key)
+    query = query.order_by((totals[1] if order_by == "units" else totals[2]).desc(), sales.c.key)
+    if limit:
+        query = query.limit(limit)
+    return [{"key": key, "orders": orders, "units": units, "revenue": revenue} for key, orders, units, revenue in query]
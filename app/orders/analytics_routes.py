@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.auth.dependencies import require_role
+from app.auth.models import Roles
+from app.core import statements
+from app.core.database import utcnow
+from app.core.deps import get_db
+from app.core.logging import logger
+from app.orders import analytics
+from app.orders.schemas import CategorySales, ProductSales, SalesGrain, SalesPoint
+
+router = APIRouter(prefix="/admin/analytics", tags=["Admin Analytics"])
+
+# Range used when a report is requested without a start
+DEFAULT_REPORT_DAYS = 30
+
+
+def report_range(start: Optional[datetime], end: Optional[datetime]):
+    return start or utcnow() - timedelta(days=DEFAULT_REPORT_DAYS), end
+
+
+# revenue, orders and units per hour or day, read from the rollups
+@router.get("/sales", response_model=List[SalesPoint])
+async def get_sales(
+    grain: SalesGrain = Query(SalesGrain.day),
+    start: Optional[datetime] = Query(None, description="Bucket at or after (UTC), default 30 days ago"),
+    end: Optional[datetime] = Query(None, description="Bucket before (UTC)"),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    return analytics.sales_series(db, grain.value, *report_range(start, end))
+
+
+# sales per category over the range, highest revenue first
+@router.get("/categories", response_model=List[CategorySales])
+async def get_category_sales(
+    start: Optional[datetime] = Query(None, description="Day at or after (UTC), default 30 days ago"),
+    end: Optional[datetime] = Query(None, description="Day before (UTC)"),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    rows = analytics.sales_by(db, "category", "day", *report_range(start, end))
+    return [{"category": row.pop("key"), **row} for row in rows]
+
+
+# best-selling products over the range
+@router.get("/products", response_model=List[ProductSales])
+async def get_product_sales(
+    start: Optional[datetime] = Query(None, description="Day at or after (UTC), default 30 days ago"),
+    end: Optional[datetime] = Query(None, description="Day before (UTC)"),
+    sort_by: str = Query("revenue", pattern="^(revenue|units)$"),
+    limit: int = Query(20, gt=0, le=500),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    rows = analytics.sales_by(db, "product", "day", *report_range(start, end), order_by=sort_by, limit=limit)
+    product_ids = [int(row.pop("key")) for row in rows]
+    names = statements.product_names(db, product_ids)
+    return [
+        {"product_id": product_id, "name": names.get(product_id), **row}
+        for product_id, row in zip(product_ids, rows)
+    ]
+
+
+# recompute the rollups of whole days in [start, end) from the orders (backfill)
+@router.post("/rebuild")
+async def rebuild_sales(
+    start: Optional[datetime] = Query(None, description="First day (UTC), default all history"),
+    end: Optional[datetime] = Query(None, description="Day after the last (UTC), default now"),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    try:
+        orders = analytics.rebuild_sales(db, start, end)
+        db.commit()
+        logger.info(f"Sales rollups rebuilt from {orders} order(s) ({start} - {end}) by AdminID={user.get('id')}")
+        return {"message": f"Sales rollups rebuilt from {orders} order(s)"}
+
+    except Exception:
+        logger.exception("Exception while rebuilding sales rollups")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -0,0 +1,110 @@
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional, Set
+
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core import scheduler, statements
+from app.core.database import utcnow
+from app.orders.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    Order,
+    OrderIntent,
+    OrderItem,
+    OrderStatus,
+)
+
+# Closed (paid or cancelled) orders older than this move to cold storage
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 180))
+# Scheduled archiving interval, 0 = only through POST /admin/orders/archive
+ORDER_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ORDER_ARCHIVE_INTERVAL_SECONDS", 3600))
+# Orders moved per transaction: bounds lock time and WAL per commit
+ORDER_ARCHIVE_BATCH = int(os.getenv("ORDER_ARCHIVE_BATCH", 1000))
+
+CLOSED_STATUSES = (OrderStatus.paid, OrderStatus.cancelled)
+
+ORDER_COLUMNS = ("id", "user_id", "total_amount", "status", "created_at")
+ITEM_COLUMNS = ("id", "order_id", "product_id", "quantity", "price_at_purchase", "category")
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def ensure_partitions(db: Session, months: Iterable[datetime]) -> None:
+    # One partition per month for both cold tables, created in their own transaction: attaching
+    # a partition briefly locks the parent table, which must not be held across a batch
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for month in sorted(months):
+        following = month_start(month + timedelta(days=32))
+        for table in ("archived_orders", "archived_order_items"):
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {table}_{month:%Y%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+            ))
+        db.commit()
+
+
+def archive_orders(db: Session, older_than: datetime, next_batch: Optional[Callable[[], bool]] = None) -> int:
+    # Moves closed orders created before older_than, oldest first, ORDER_ARCHIVE_BATCH per
+    # transaction: copy into cold storage, then delete from the hot tables. Rows are locked with
+    # SKIP LOCKED, so concurrent archivers (one per worker) split the work and an order being
+    # updated is left for the next run. Order intents are only polled right after checkout:
+    # those of archived orders are dropped with them. next_batch (the scheduler's throttle)
+    # is called between batches and stops the run when it returns False.
+    moved = 0
+    partitions: Set[datetime] = set()
+    candidates = (
+        select(Order.id, Order.created_at)
+        .where(Order.status.in_(CLOSED_STATUSES), Order.created_at < older_than)
+        .order_by(Order.created_at)
+        .limit(ORDER_ARCHIVE_BATCH)
+        .with_for_update(skip_locked=True)
+    )
+    while True:
+        batch = db.execute(candidates).all()
+        if not batch:
+            break
+        months = {month_start(created_at) for _, created_at in batch} - partitions
+        if months:
+            db.rollback()
+            ensure_partitions(db, months)
+            partitions |= months
+            continue
+
+        ids = [order_id for order_id, _ in batch]
+        db.execute(insert(ArchivedOrder).from_select(
+            ORDER_COLUMNS, select(*(Order.__table__.c[column] for column in ORDER_COLUMNS)).where(Order.id.in_(ids))
+        ))
+        db.execute(insert(ArchivedOrderItem).from_select(
+            ITEM_COLUMNS + ("order_created_at",),
+            select(*(OrderItem.__table__.c[column] for column in ITEM_COLUMNS), Order.created_at)
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(OrderItem.order_id.in_(ids)),
+        ))
+        db.execute(delete(OrderIntent).where(OrderIntent.order_id.in_(ids)))
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids)))
+        db.execute(delete(Order).where(Order.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
+        if next_batch and not next_batch():
+            break
+    return moved
+
+
+def order_history(db: Session, user_id: int) -> list:
+    # Newest first across the hot table and cold storage (one index probe per cold partition)
+    return statements.order_history(db, user_id)
+
+
+def find_order(db: Session, user_id: int, order_id: int):
+    # The hot table answers every order younger than the archive age; cold storage is read on a miss
+    return statements.order_by_id(db, user_id, order_id) or statements.archived_order_by_id(db, user_id, order_id)
+
+
+@scheduler.job("archive_orders", ORDER_ARCHIVE_INTERVAL_SECONDS)
+def archive_job(db: Session, run: scheduler.JobRun) -> int:
+    return archive_orders(db, utcnow() - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS), run.next_batch)
@@ -2,28 +2,41 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.auth.models import Roles
 from app.core.error_logger import create_error_response
+from app.core.idempotency import IdempotencyGuard, idempotent
 from app.orders import schemas
 from sqlalchemy.orm import Session
 from app.core.logging import logger
 from app.core.deps import get_db
 from app.auth.dependencies import get_current_user, require_role
-from app.cart import models as cart_models
-from app.products import models as product_models
+from app.core import statements
+from app.core.rate_limit import rate_limit
+from app.core.responses import FastJSONResponse
+from app.core.retry import raise_if_retryable, transactional_retry
 from app.orders import models as order_models
+from app.orders.analytics import SalesDelta
+from app.orders.intake import CHECKOUT_QUEUE_ENABLED, order_queue
+from app.orders.service import CheckoutError, lock_products, place_order
+from app.products.facets import FacetDelta
+from app.products.related import PairDelta
 
 
 
 router = APIRouter(prefix="/checkout",tags = ["Checkout"])
 
 # Checkout route for users to place an order
-@router.post ("",response_model = schemas.OrderOut)
+@router.post ("",response_model = schemas.OrderOut, dependencies=[Depends(rate_limit("checkout"))])
+@transactional_retry()
 async def checkout(
     data: schemas.CheckoutRequest,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(require_role(Roles.user)) # role check for users
+    current_user: dict = Depends(require_role(Roles.user)), # role check for users
+    guard: IdempotencyGuard = Depends(idempotent("checkout"))
 ):
+    if guard.replay is not None:
+        return guard.replay
+
     logger.info(f"Checkout process started by user ID: {current_user['id']}")
-    cart_items = db.query(cart_models.Cart).filter(cart_models.Cart.user_id == current_user["id"]).all()
+    cart_items = statements.cart_items(db, current_user["id"])
 
     if not cart_items:
         logger.warning(f"Checkout failed: Cart is empty for user ID {current_user['id']}")
@@ -33,61 +46,101 @@ async def checkout(
         )
 
     try:
-        total = 0
-        order_items = []
-
-        for item in cart_items:
-            product = db.query(product_models.Product).filter(product_models.Product.id == item.product_id).first()
-            if not product:
-                logger.warning(f"Product not found: Product ID {item.product_id} for user ID {current_user['id']}")
-                return HTTPException(
-                    status_code=404,
-                    detail={"error": True, "message": "Product not found", "code": 404}
-                )
-            
-            if product.stock<item.quantity:
-                 logger.warning(
-                       f"Insufficient stock for Product ID {item.product_id} — "
-                       f"Requested: {item.quantity}, Available: {product.stock} — User ID: {current_user['id']}"
-                 )
-                 return create_error_response(
-                      message="Insufficient stock, could not add the product",
-                      status_code=status.HTTP_400_BAD_REQUEST
-                   )
-            product.stock -=item.quantity
-            subtotal = product.price * item.quantity
-            total += subtotal
-            order_items.append(
-                order_models.OrderItem(
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price_at_purchase=product.price
-                )
-            )
-
-        # Create order
-        order = order_models.Order(user_id=current_user["id"], total_amount=total, status=data.status)
-        db.add(order)
-        db.flush()  # Get order.id before adding items
-
-        for item in order_items:
-            item.order_id = order.id
-            db.add(item)
+        facet_delta = FacetDelta()
+        products = lock_products(db, [item.product_id for item in cart_items])
+        order = place_order(
+            db,
+            current_user["id"],
+            [(item.product_id, item.quantity) for item in cart_items],
+            data.status,
+            products,
+            facet_delta,
+        )
 
         # Clear cart
-        db.query(cart_models.Cart).filter(cart_models.Cart.user_id == current_user["id"]).delete()
-        db.commit()
+        statements.clear_cart(db, current_user["id"])
+        facet_delta.apply(db)
+        # An order placed as cancelled is never counted, as in rebuild_related and rebuild_sales
+        if data.status != schemas.OrderStatus.cancelled:
+            PairDelta().add_order(item.product_id for item in cart_items).apply(db)
+            SalesDelta().add_placed_order(order).apply(db)
+        db.flush()
         db.refresh(order)
 
+        # Commits the order together with the stored Idempotency-Key response
+        response = guard.save(schemas.OrderOut.model_validate(order, from_attributes=True))
         logger.info(f"Order placed successfully: Order ID {order.id} by user ID {current_user['id']}")
-        return order
+        return response
 
-    except Exception:
+    except CheckoutError as e:
+        return create_error_response(message=e.message, status_code=e.status_code)
+    except Exception as e:
+        raise_if_retryable(e)
         logger.exception(f"Checkout failed for user ID {current_user['id']}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
-   
 
-        
 
-   
-  
\ No newline at end of file
+def intent_out(intent: order_models.OrderIntent) -> schemas.QueuedCheckoutOut:
+    return schemas.QueuedCheckoutOut(
+        intent_id=intent.id,
+        status=intent.status.value,
+        order_id=intent.order_id,
+        error=intent.error,
+        status_url=f"{router.prefix}/queued/{intent.id}",
+    )
+
+
+# Queued checkout: snapshot the cart as an order intent and let the intake workers place the order
+@router.post("/queued", response_model=schemas.QueuedCheckoutOut, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit("checkout"))])
+@transactional_retry()
+async def queued_checkout(
+    data: schemas.CheckoutRequest,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_role(Roles.user)),
+    guard: IdempotencyGuard = Depends(idempotent("checkout.queued"))
+):
+    if not CHECKOUT_QUEUE_ENABLED:
+        return create_error_response("Queued checkout is not enabled", status_code=status.HTTP_404_NOT_FOUND)
+    if guard.replay is not None:
+        return guard.replay
+
+    cart_items = statements.cart_items(db, current_user["id"])
+    if not cart_items:
+        logger.warning(f"Queued checkout failed: Cart is empty for user ID {current_user['id']}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": True, "message": "Cart is empty", "code": 400}
+        )
+
+    try:
+        intent = order_queue.enqueue(
+            db, current_user["id"], [(item.product_id, item.quantity) for item in cart_items], data.status
+        )
+        response = guard.save(FastJSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=intent_out(intent).model_dump(mode="json"),
+        ))
+        logger.info(f"Checkout queued: Intent ID {intent.id} by user ID {current_user['id']}")
+        return response
+
+    except CheckoutError as e:
+        logger.warning(f"Queued checkout rejected for user ID {current_user['id']}: {e.message}")
+        return create_error_response(message=e.message, status_code=e.status_code)
+    except Exception as e:
+        raise_if_retryable(e)
+        logger.exception(f"Queued checkout failed for user ID {current_user['id']}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# Outcome of a queued checkout
+@router.get("/queued/{intent_id}", response_model=schemas.QueuedCheckoutOut)
+async def queued_checkout_status(
+    intent_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(require_role(Roles.user))
+):
+    intent = order_queue.get(db, intent_id, current_user["id"])
+    if not intent:
+        logger.warning(f"Order intent not found: Intent ID {intent_id} for user ID {current_user['id']}")
+        return create_error_response(f"Order intent not found for ID {intent_id}", status_code=status.HTTP_404_NOT_FOUND)
+    return intent_out(intent)
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import List, Optional, Sequence
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.cart.models import Cart
+from app.core import statements
+from app.core.database import SessionLocal, engine, utcnow
+from app.core.logging import logger
+from app.orders.analytics import SalesDelta
+from app.orders.models import IntentStatus, Order, OrderIntent, OrderStatus
+from app.orders.service import CheckoutError, OrderLine, lock_products, place_order
+from app.products.facets import FacetDelta
+from app.products.related import PairDelta
+
+CHECKOUT_QUEUE_ENABLED = os.getenv("CHECKOUT_QUEUE_ENABLED", "false").lower() == "true"
+CHECKOUT_QUEUE_WORKERS = int(os.getenv("CHECKOUT_QUEUE_WORKERS", 2))
+CHECKOUT_QUEUE_BATCH_SIZE = int(os.getenv("CHECKOUT_QUEUE_BATCH_SIZE", 50))
+CHECKOUT_QUEUE_POLL_SECONDS = float(os.getenv("CHECKOUT_QUEUE_POLL_SECONDS", 0.2))
+# An intent claimed this long ago and still processing (its worker died) is claimed again
+CHECKOUT_QUEUE_CLAIM_SECONDS = float(os.getenv("CHECKOUT_QUEUE_CLAIM_SECONDS", 300))
+
+
+class ClaimLost(Exception):
+    pass
+
+
+class OrderQueue(ABC):
+    # Transport for order intents. claim() must hand each intent to one worker only, in any
+    # number of processes, and finish() must fail (ClaimLost) once the claim was taken over.
+
+    @abstractmethod
+    def enqueue(self, db: Session, user_id: int, lines: Sequence[OrderLine], order_status) -> OrderIntent:
+        # The caller commits, so an Idempotency-Key record can be stored in the same transaction.
+        # Raises CheckoutError (409) while the user still has an intent queued or processing: the
+        # cart is cleared only when that intent's order is placed, and would be ordered twice.
+        ...
+
+    @abstractmethod
+    def claim(self, db: Session, limit: int) -> List[OrderIntent]:
+        # Commits the claim: the intents stay claimed if the worker's transaction rolls back
+        ...
+
+    @abstractmethod
+    def finish(self, db: Session, intent: OrderIntent, order: Optional[Order] = None, error: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, db: Session, intent_id: int, user_id: int) -> Optional[OrderIntent]:
+        ...
+
+
+class DatabaseOrderQueue(OrderQueue):
+    # Intents live in the order_intents table. A claim is a compare-and-set on their status, like
+    # the scheduler's job claims, so it holds on any database and across processes.
+
+    def enqueue(self, db, user_id, lines, order_status):
+        intent = OrderIntent(user_id=user_id, order_status=order_status, items=[list(line) for line in lines])
+        db.add(intent)
+        try:
+            db.flush()
+        except IntegrityError:
+            # uq_order_intents_open_user; a concurrent enqueue waits for the first one to commit
+            db.rollback()
+            raise CheckoutError("A checkout of this cart is already queued", 409)
+        return intent
+
+    def claim(self, db, limit):
+        now = utcnow()
+        claimable = or_(
+            OrderIntent.status == IntentStatus.queued,
+            and_(
+                OrderIntent.status == IntentStatus.processing,
+                OrderIntent.claimed_at < now - timedelta(seconds=CHECKOUT_QUEUE_CLAIM_SECONDS),
+            ),
+        )
+        # SKIP LOCKED only spreads concurrent claimers over different rows; the UPDATE decides
+        candidates = [
+            intent_id for (intent_id,) in db.query(OrderIntent.id)
+            .filter(claimable)
+            .order_by(OrderIntent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ]
+        if not candidates:
+            return []
+        token = uuid.uuid4().hex
+        db.execute(
+            update(OrderIntent)
+            .where(OrderIntent.id.in_(candidates), claimable)
+            .values(status=IntentStatus.processing, claimed_by=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.query(OrderIntent).filter(OrderIntent.claimed_by == token).order_by(OrderIntent.id).all()
+
+    def finish(self, db, intent, order=None, error=None):
+        finished = db.execute(
+            update(OrderIntent)
+            .where(
+                OrderIntent.id == intent.id,
+                OrderIntent.status == IntentStatus.processing,
+                OrderIntent.claimed_by == intent.claimed_by,
+            )
+            .values(
+                status=IntentStatus.completed if order is not None else IntentStatus.failed,
+                order_id=order.id if order is not None else None,
+                error=error,
+                processed_at=utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not finished:
+            raise ClaimLost(f"Order intent {intent.id} was claimed by another worker")
+
+    def get(self, db, intent_id, user_id):
+        return statements.order_intent(db, user_id, intent_id)
+
+
+order_queue: OrderQueue = DatabaseOrderQueue()
+
+
+def _fulfil(db: Session, intent: OrderIntent, products: dict, facet_delta: FacetDelta, pair_delta: PairDelta, sales_delta: SalesDelta) -> None:
+    lines = [(product_id, quantity) for product_id, quantity in intent.items]
+    try:
+        order = place_order(db, intent.user_id, lines, intent.order_status, products, facet_delta)
+    except CheckoutError as e:
+        order_queue.finish(db, intent, error=e.message)
+        return
+    # An order placed as cancelled is never counted, as in rebuild_related and rebuild_sales
+    if order.status != OrderStatus.cancelled:
+        pair_delta.add_order(product_id for product_id, _ in lines)
+        sales_delta.add_placed_order(order)
+    db.query(Cart).filter(
+        Cart.user_id == intent.user_id,
+        Cart.product_id.in_([product_id for product_id, _ in lines]),
+    ).delete(synchronize_session=False)
+    order_queue.finish(db, intent, order=order)
+
+
+def process_batch(limit: int = CHECKOUT_QUEUE_BATCH_SIZE) -> int:
+    # One transaction per micro-batch: every product touched by the batch is locked and
+    # updated once, however many of the batch's orders contain it.
+    db = SessionLocal()
+    try:
+        intents = order_queue.claim(db, limit)
+        if not intents:
+            db.rollback()
+            return 0
+        claims = [(intent.id, intent.claimed_by) for intent in intents]
+        try:
+            facet_delta, pair_delta, sales_delta = FacetDelta(), PairDelta(), SalesDelta()
+            products = lock_products(db, {product_id for intent in intents for product_id, _ in intent.items})
+            for intent in intents:
+                _fulfil(db, intent, products, facet_delta, pair_delta, sales_delta)
+            facet_delta.apply(db)
+            pair_delta.apply(db)
+            sales_delta.apply(db)
+            db.commit()
+        except Exception:
+            # Isolate the intent that broke the batch by retrying each one on its own
+            logger.exception(f"Order intake batch of {len(intents)} failed, retrying intents one by one")
+            db.rollback()
+            for intent_id, token in claims:
+                _process_single(db, intent_id, token)
+        logger.info(f"Order intake processed {len(intents)} intent(s)")
+        return len(intents)
+    finally:
+        db.close()
+
+
+def _process_single(db: Session, intent_id: int, token: str) -> None:
+    def still_claimed():
+        intent = db.query(OrderIntent).filter(OrderIntent.id == intent_id).first()
+        return intent if intent is not None and intent.status == IntentStatus.processing and intent.claimed_by == token else None
+
+    try:
+        intent = still_claimed()
+        if intent is None:
+            db.rollback()
+            return
+        facet_delta, pair_delta, sales_delta = FacetDelta(), PairDelta(), SalesDelta()
+        products = lock_products(db, [product_id for product_id, _ in intent.items])
+        _fulfil(db, intent, products, facet_delta, pair_delta, sales_delta)
+        facet_delta.apply(db)
+        pair_delta.apply(db)
+        sales_delta.apply(db)
+        db.commit()
+    except ClaimLost:
+        logger.warning(f"Order intent {intent_id} was claimed by another worker, leaving it")
+        db.rollback()
+    except Exception:
+        logger.exception(f"Order intent {intent_id} failed")
+        db.rollback()
+        intent = still_claimed()
+        if intent is not None:
+            order_queue.finish(db, intent, error="Internal Server Error")
+            db.commit()
+
+
+class IntakeWorkerPool:
+    def __init__(self, workers: int = CHECKOUT_QUEUE_WORKERS, poll_seconds: float = CHECKOUT_QUEUE_POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def _run(self, number: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = await asyncio.to_thread(process_batch)
+            except Exception:
+                logger.exception(f"Order intake worker {number} crashed while processing a batch")
+                processed = 0
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        if engine.dialect.name == "sqlite" and self.workers > 1:
+            # SQLite runs one write transaction at a time: more workers would only wait on each other
+            logger.warning("Order intake on SQLite runs a single worker")
+            self.workers = 1
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._run(n)) for n in range(self.workers)]
+        logger.info(f"Order intake started with {self.workers} worker(s)")
+
+    async def stop(self) -> None:
+        # Lets in-flight batches commit before returning
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Order intake stopped")
+
+
+worker_pool = IntakeWorkerPool()
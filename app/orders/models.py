@@ -1,9 +1,8 @@
-from datetime import datetime
 from sqlalchemy.orm import relationship
 from sqlalchemy import DateTime
 import enum
-from sqlalchemy import Column, Float, ForeignKey, Integer,Enum
-from app.core.database import Base
+from sqlalchemy import JSON, Column, Float, ForeignKey, Index, Integer, Enum, String, and_, text
+from app.core.database import Base, utcnow
 
 class OrderStatus(enum.Enum):
     pending = "pending"
@@ -17,7 +16,7 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     total_amount = Column(Float , nullable=False)
     status = Column(Enum(OrderStatus), default=OrderStatus.pending)  
-    created_at = Column(DateTime, default=datetime.now())
+    created_at = Column(DateTime, default=utcnow, index=True)
 
     items = relationship("OrderItem", back_populates="order")
 
@@ -30,4 +29,140 @@ class OrderItem(Base):
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     quantity = Column(Integer, nullable=False)
     price_at_purchase = Column(Float, nullable=False)
+    # The product's category when ordered: the sales rollups count the order under it, and a
+    # cancellation or rebuild must find the same one after the product is recategorized
+    category = Column(String, nullable=False)
     order = relationship("Order", back_populates="items")
+
+
+class IntentStatus(enum.Enum):
+    queued = "queued"
+    processing = "processing"
+    completed = "completed"
+    failed = "failed"
+
+
+# Checkout request accepted by POST /checkout/queued, turned into an Order by the intake workers
+# A user has at most one intent waiting or being placed: the cart is only cleared once its order is
+class OrderIntent(Base):
+    __tablename__ = "order_intents"
+    __table_args__ = (
+        Index(
+            "uq_order_intents_open_user", "user_id", unique=True,
+            postgresql_where=text("status IN ('queued', 'processing')"),
+            sqlite_where=text("status IN ('queued', 'processing')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(Enum(IntentStatus), nullable=False, default=IntentStatus.queued, index=True)
+    order_status = Column(Enum(OrderStatus), nullable=False, default=OrderStatus.pending)
+    items = Column(JSON, nullable=False)  # [[product_id, quantity], ...] snapshot of the cart
+    order_id = Column(Integer, ForeignKey("orders.id"))
+    error = Column(String)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    processed_at = Column(DateTime)
+    # Token of the intake batch that claimed the intent, and when (see DatabaseOrderQueue.claim)
+    claimed_by = Column(String)
+    claimed_at = Column(DateTime)
+
+
+
+# Sales pre-aggregated per hour and per day, maintained by app.orders.analytics.
+# dimension "total" (key ""), "category" (lower(category)) or "product" (product id as text).
+# The primary key serves per-key range scans; ix_sales_rollups_range serves "all keys in a range".
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+    __table_args__ = (Index("ix_sales_rollups_range", "grain", "dimension", "bucket"),)
+
+    grain = Column(String, primary_key=True)  # "hour" or "day"
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # UTC start of the hour / day
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# Rollup changes of checkouts and cancellations, appended (INSERT only, so concurrent checkouts
+# share no row) and folded into sales_rollups by a scheduled job in app.orders.analytics
+class SalesRollupChange(Base):
+    __tablename__ = "sales_rollup_changes"
+
+    id = Column(Integer, primary_key=True)
+    grain = Column(String, nullable=False)
+    dimension = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    bucket = Column(DateTime, nullable=False)
+    orders = Column(Integer, nullable=False)
+    units = Column(Integer, nullable=False)
+    revenue = Column(Float, nullable=False)
+
+
+# Cold storage for closed orders moved out of orders / order_items by app.orders.archive.
+# On PostgreSQL both tables are range-partitioned by month on the order's creation time (the
+# partitions are created by the archiver), so a lookup with a time bound only touches the
+# months it needs and old months can be detached or dropped as a whole. Elsewhere they are
+# plain tables. No foreign key to orders: the rows outlive them.
+class ArchivedOrder(Base):
+    __tablename__ = "archived_orders"
+    __table_args__ = (
+        Index("ix_archived_orders_user", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    total_amount = Column(Float, nullable=False)
+    status = Column(Enum(OrderStatus), nullable=False)
+    created_at = Column(DateTime, primary_key=True)  # partitioned tables need the partition key in the primary key
+
+    items = relationship(
+        "ArchivedOrderItem",
+        primaryjoin="and_(ArchivedOrder.id == foreign(ArchivedOrderItem.order_id), "
+                    "ArchivedOrder.created_at == foreign(ArchivedOrderItem.order_created_at))",
+        order_by="ArchivedOrderItem.id",
+        viewonly=True,
+    )
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = "archived_order_items"
+    __table_args__ = (
+        Index("ix_archived_order_items_order", "order_id"),
+        Index("ix_archived_order_items_product", "product_id"),
+        {"postgresql_partition_by": "RANGE (order_created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    price_at_purchase = Column(Float, nullable=False)
+    category = Column(String, nullable=False)
+    order_created_at = Column(DateTime, primary_key=True)  # the order's created_at, partition key
+
+
+# (orders, items, join condition) of the hot tables and of cold storage, for reads that span both
+ORDER_TABLES = (
+    (Order, OrderItem, OrderItem.order_id == Order.id),
+    (ArchivedOrder, ArchivedOrderItem, and_(
+        ArchivedOrderItem.order_id == ArchivedOrder.id,
+        ArchivedOrderItem.order_created_at == ArchivedOrder.created_at,
+    )),
+)
+
+# Columns in OrderSummary field order, for the order history list
+ORDER_SUMMARY_COLUMNS = (
+    Order.id,
+    Order.created_at,
+    Order.total_amount,
+    Order.status,
+)
+ARCHIVED_ORDER_SUMMARY_COLUMNS = (
+    ArchivedOrder.id,
+    ArchivedOrder.created_at,
+    ArchivedOrder.total_amount,
+    ArchivedOrder.status,
+)
@@ -2,11 +2,12 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from app.core.error_logger import create_error_response
+from app.core.responses import FastJSONResponse, rows_to_dicts
 from app.core.logging import logger
 from app.core.deps import get_db
 from app.auth.dependencies import require_role
 from app.auth.models import Roles
-from app.orders import models as order_models, schemas
+from app.orders import archive, schemas
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -19,19 +20,14 @@ def get_order_history(
      
     logger.info(f"Fetching order history for user ID: {current_user['id']}")
     try:
-        orders = (
-        db.query(order_models.Order)
-        .filter(order_models.Order.user_id == current_user["id"])
-        .order_by(order_models.Order.created_at.desc())
-        .all()
-        )
+        orders = rows_to_dicts(archive.order_history(db, current_user["id"]))
         if not orders:
             logger.warning(f"No orders found for user ID: {current_user['id']} — returning 204 No Content")
             return create_error_response(f"No orders found for user ID: {current_user['id']}" ,status_code=status.HTTP_404_NOT_FOUND)
         else:
             logger.info(f"Found {len(orders)} orders for user ID: {current_user['id']}")
 
-        return orders
+        return FastJSONResponse(content=orders)
     
     except Exception:
         logger.exception(f"Failed to fetch order history for user ID: {current_user['id']}")
@@ -48,14 +44,7 @@ def get_order_detail(
     logger.info(f"Fetching order details: Order ID {order_id} for user ID {current_user['id']}")
 
     try:
-        order = (
-            db.query(order_models.Order)
-            .filter(
-                order_models.Order.id == order_id,
-                order_models.Order.user_id == current_user["id"]
-            )
-            .first()
-        )
+        order = archive.find_order(db, current_user["id"], order_id)
 
         if not order:
             logger.warning(f"Order not found: Order ID {order_id} for user ID {current_user['id']}")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -36,4 +36,62 @@ class OrderSummary(BaseModel):
         orm_mode = True
 
 class CheckoutRequest(BaseModel):
-    status: OrderStatus = OrderStatus.pending
\ No newline at end of file
+    status: OrderStatus = OrderStatus.pending
+
+class IntentStatus(str, Enum):
+    queued = "queued"
+    processing = "processing"
+    completed = "completed"
+    failed = "failed"
+
+class QueuedCheckoutOut(BaseModel):
+    intent_id: int
+    status: IntentStatus
+    order_id: Optional[int] = None
+    error: Optional[str] = None
+    status_url: str
+
+class SalesGrain(str, Enum):
+    hour = "hour"
+    day = "day"
+
+class SalesPoint(BaseModel):
+    bucket: datetime
+    orders: int
+    units: int
+    revenue: float
+
+class CategorySales(BaseModel):
+    category: str
+    orders: int
+    units: int
+    revenue: float
+
+class ProductSales(BaseModel):
+    product_id: int
+    name: Optional[str] = None
+    orders: int
+    units: int
+    revenue: float
+
+class OrderStatusUpdate(BaseModel):
+    order_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    status: OrderStatus
+
+class TransitionStatus(str, Enum):
+    updated = "updated"
+    unchanged = "unchanged"
+    not_found = "not_found"
+    archived = "archived"
+    invalid_transition = "invalid_transition"
+    duplicate = "duplicate"
+
+class OrderTransitionResult(BaseModel):
+    id: int
+    status: TransitionStatus
+    order_status: Optional[OrderStatus] = None  # the order's status after the request
+
+class OrderTransitionOut(BaseModel):
+    updated: int
+    failed: int
+    results: List[OrderTransitionResult]
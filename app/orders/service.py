@@ -0,0 +1,91 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.logging import logger
+from app.orders.models import Order, OrderItem
+from app.products import inventory
+from app.products.facets import FacetDelta, facet_entry
+from app.products.models import Product
+
+# (product_id, quantity)
+OrderLine = Tuple[int, int]
+
+
+class CheckoutError(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def lock_products(db: Session, product_ids: Iterable[int]) -> Dict[int, Product]:
+    # Row locks taken in id order, so concurrent checkouts sharing products cannot deadlock each other.
+    # Sharded products are read without a lock: their stock is taken from the shard rows.
+    product_ids = set(product_ids)
+    products = (
+        db.query(Product)
+        .filter(Product.id.in_(product_ids), Product.stock_shards == 0)
+        .order_by(Product.id)
+        .with_for_update()
+        .all()
+    )
+    products += db.query(Product).filter(Product.id.in_(product_ids), Product.stock_shards > 0).all()
+    return {product.id: product for product in products}
+
+
+def place_order(
+    db: Session,
+    user_id: int,
+    lines: Sequence[OrderLine],
+    status,
+    products: Dict[int, Product],
+    facet_delta: FacetDelta,
+) -> Order:
+    # Every line is checked before any stock moves, so a rejected order leaves the session untouched
+    requested = defaultdict(int)
+    for product_id, quantity in lines:
+        requested[product_id] += quantity
+
+    for product_id, quantity in requested.items():
+        product = products.get(product_id)
+        if product is None:
+            logger.warning(f"Product not found: Product ID {product_id} for user ID {user_id}")
+            raise CheckoutError("Product not found", 404)
+        if not product.stock_shards and product.stock < quantity:
+            logger.warning(
+                f"Insufficient stock for Product ID {product_id} — "
+                f"Requested: {quantity}, Available: {product.stock} — User ID: {user_id}"
+            )
+            raise CheckoutError("Insufficient stock, could not add the product", 400)
+
+    sharded = sorted(product_id for product_id in requested if products[product_id].stock_shards)
+    if sharded:
+        # A savepoint undoes shard decrements already made if a later product runs short
+        with db.begin_nested():
+            for product_id in sharded:
+                if not inventory.take_stock(db, products[product_id], requested[product_id]):
+                    logger.warning(
+                        f"Insufficient sharded stock for Product ID {product_id} — "
+                        f"Requested: {requested[product_id]} — User ID: {user_id}"
+                    )
+                    raise CheckoutError("Insufficient stock, could not add the product", 400)
+
+    total = 0
+    order_items = []
+    for product_id, quantity in lines:
+        product = products[product_id]
+        if not product.stock_shards:
+            before = facet_entry(product)
+            product.stock -= quantity
+            facet_delta.change(before, facet_entry(product))
+        total += product.price * quantity
+        order_items.append(OrderItem(
+            product_id=product_id, quantity=quantity, price_at_purchase=product.price, category=product.category,
+        ))
+
+    order = Order(user_id=user_id, total_amount=total, status=status, items=order_items)
+    db.add(order)
+    db.flush()
+    return order
@@ -0,0 +1,114 @@
+import os
+from collections import defaultdict
+from itertools import groupby
+from operator import attrgetter
+from typing import Dict, List
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.retry import Retrying
+from app.orders.analytics import SalesDelta
+from app.orders.models import ArchivedOrder, Order, OrderItem, OrderStatus
+from app.orders.schemas import TransitionStatus
+from app.products import inventory
+from app.products.related import PairDelta
+
+ORDER_STATUS_CHUNK_SIZE = int(os.getenv("ORDER_STATUS_CHUNK_SIZE", 500))
+
+# Allowed status changes. Cancelling returns the stock and takes the order back out of the
+# sales rollups and bought-together counts; a cancelled order is final.
+TRANSITIONS = {
+    OrderStatus.pending: {OrderStatus.paid, OrderStatus.cancelled},
+    OrderStatus.paid: {OrderStatus.cancelled},
+    OrderStatus.cancelled: set(),
+}
+
+
+def _cancel(db: Session, order_ids: List[int]) -> None:
+    # One read of the chunk's order lines feeds all three deltas; the stock comes back with one
+    # UPDATE for all products of the chunk (quantities summed per product)
+    lines = (
+        db.query(OrderItem.order_id, Order.created_at, OrderItem.product_id, OrderItem.category,
+                 OrderItem.quantity, OrderItem.price_at_purchase)
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.order_id)
+    )
+    quantities: Dict[int, int] = defaultdict(int)
+    sales, pairs = SalesDelta(), PairDelta()
+    for _, items in groupby(lines, key=attrgetter("order_id")):
+        items = list(items)
+        sales.add_order(
+            items[0].created_at,
+            [(item.product_id, item.category, item.quantity, item.price_at_purchase) for item in items],
+            sign=-1,
+        )
+        pairs.add_order((item.product_id for item in items), sign=-1)
+        for item in items:
+            quantities[item.product_id] += item.quantity
+
+    inventory.restock(db, quantities)
+    pairs.apply(db)
+    sales.apply(db)
+
+
+def _apply_chunk(db: Session, order_ids: List[int], target: OrderStatus) -> Dict[int, dict]:
+    # Orders are locked in id order; the status change itself is one UPDATE for the chunk
+    current = dict(
+        db.query(Order.id, Order.status)
+        .filter(Order.id.in_(order_ids))
+        .order_by(Order.id)
+        .with_for_update()
+    )
+    missing = [order_id for order_id in order_ids if order_id not in current]
+    archived = dict(
+        db.query(ArchivedOrder.id, ArchivedOrder.status).filter(ArchivedOrder.id.in_(missing))
+    ) if missing else {}
+
+    results, moving = {}, []
+    for order_id in order_ids:
+        status = current.get(order_id)
+        if status is None:
+            if order_id in archived:
+                results[order_id] = {"id": order_id, "status": TransitionStatus.archived, "order_status": archived[order_id].value}
+            else:
+                results[order_id] = {"id": order_id, "status": TransitionStatus.not_found}
+        elif status == target:
+            results[order_id] = {"id": order_id, "status": TransitionStatus.unchanged, "order_status": status.value}
+        elif target not in TRANSITIONS[status]:
+            results[order_id] = {"id": order_id, "status": TransitionStatus.invalid_transition, "order_status": status.value}
+        else:
+            moving.append(order_id)
+            results[order_id] = {"id": order_id, "status": TransitionStatus.updated, "order_status": target.value}
+
+    if moving:
+        db.execute(
+            update(Order).where(Order.id.in_(moving)).values(status=target).execution_options(synchronize_session=False)
+        )
+        if target == OrderStatus.cancelled:
+            _cancel(db, moving)
+    return results
+
+
+def apply_transitions(db: Session, order_ids: List[int], target: OrderStatus,
+                      chunk_size: int = ORDER_STATUS_CHUNK_SIZE) -> List[dict]:
+    # One transaction per chunk, like the product batch; results keep the request order and
+    # a repeated id is applied once. Transitions are idempotent: a replayed request reports unchanged.
+    seen, unique, results = set(), [], {}
+    for index, order_id in enumerate(order_ids):
+        if order_id in seen:
+            results[index] = {"id": order_id, "status": TransitionStatus.duplicate}
+        else:
+            seen.add(order_id)
+            unique.append((index, order_id))
+
+    for start in range(0, len(unique), chunk_size):
+        chunk = unique[start:start + chunk_size]
+        for attempt in Retrying(db, "order_status"):
+            with attempt:
+                chunk_results = _apply_chunk(db, [order_id for _, order_id in chunk], target)
+                db.commit()
+        for index, order_id in chunk:
+            results[index] = chunk_results[order_id]
+    return [results[index] for index in range(len(order_ids))]
@@ -0,0 +1,221 @@
+import asyncio
+import os
+import time
+from array import array
+from heapq import nlargest
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.core import pubsub
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.orders.models import SalesRollup
+from app.products.models import Product
+
+AUTOCOMPLETE_ENABLED = os.getenv("AUTOCOMPLETE_ENABLED", "true").lower() == "true"
+# Full rebuild interval: folds in new popularity figures and the changes applied since the last build
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", 300))
+AUTOCOMPLETE_MAX_SUGGESTIONS = 10
+# Prefixes matching more names than this get their top list precomputed at build time
+HEAVY_PREFIX_ROWS = 1000
+HEAVY_TOP = 2 * AUTOCOMPLETE_MAX_SUGGESTIONS  # headroom for names changed since the build
+
+TOPIC = "catalog:names"
+
+# (normalised name, name, product id, popularity)
+Entry = Tuple[str, str, int, int]
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    # Immutable sorted-array index. Normalised names are packed into one UTF-8 blob (byte order
+    # is code point order) with offset, id and popularity arrays alongside: a handful of objects
+    # in total instead of several per name. A prefix maps to a contiguous range found by binary search.
+
+    def __init__(self, entries: List[Entry]):
+        entries = sorted(entries)
+        keys = [key.encode() for key, _, _, _ in entries]
+        names = [name.encode() for _, name, _, _ in entries]
+        self.keys, self.names = b"".join(keys), b"".join(names)
+        self.key_offsets = array("I", accumulate(map(len, keys), initial=0))
+        self.name_offsets = array("I", accumulate(map(len, names), initial=0))
+        self.ids = array("i", [product_id for _, _, product_id, _ in entries])
+        self.popularity = array("I", [popularity for _, _, _, popularity in entries])
+        self.top: Dict[bytes, Tuple[int, ...]] = {}
+        self._precompute()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def key(self, i: int) -> bytes:
+        return self.keys[self.key_offsets[i]:self.key_offsets[i + 1]]
+
+    def name(self, i: int) -> str:
+        return self.names[self.name_offsets[i]:self.name_offsets[i + 1]].decode()
+
+    def _bisect(self, probe: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        hi = len(self) if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < probe:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, prefix: bytes, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        # 0xff never occurs in UTF-8, so prefix + b"\xff" sorts after every key starting with prefix
+        lo = self._bisect(prefix, lo, hi)
+        return lo, self._bisect(prefix + b"\xff", lo, hi)
+
+    def _precompute(self) -> None:
+        # Walks the implicit trie over the sorted keys, one byte per level, down to the prefixes
+        # small enough to rank on the fly; every heavy prefix keeps its top HEAVY_TOP entries
+        stack = [(b"", 0, len(self))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= HEAVY_PREFIX_ROWS:
+                continue
+            self.top[prefix] = tuple(nlargest(HEAVY_TOP, range(lo, hi), key=self.popularity.__getitem__))
+            depth = len(prefix)
+            i = self._bisect(prefix + b"\x00", lo, hi)  # skip the key equal to the prefix itself
+            while i < hi:
+                byte = self.key(i)[depth]
+                child = prefix + bytes([byte])
+                j = self._bisect(prefix + bytes([byte + 1]), i, hi) if byte < 0xff else hi
+                stack.append((child, i, j))
+                i = j
+
+    def candidates(self, prefix: bytes, limit: int) -> Iterable[int]:
+        lo, hi = self.range(prefix)
+        if hi - lo > HEAVY_PREFIX_ROWS:
+            return self.top[prefix]
+        # nlargest is stable: on equal popularity the shorter / alphabetically first name wins
+        return nlargest(limit, range(lo, hi), key=self.popularity.__getitem__)
+
+
+class Autocomplete:
+    # The index is rebuilt in a worker thread and swapped in on the event loop. Product changes
+    # committed in between (any worker, via pub/sub) sit in a small overlay that takes precedence.
+
+    def __init__(self):
+        self.index = PrefixIndex([])
+        self.categories: Dict[str, List] = {}  # normalised -> [name, popularity]
+        self.changes: Dict[int, Tuple[float, Optional[Entry]]] = {}  # product id -> (applied at, entry or None if deleted)
+        self.ready = False
+        self.reload = asyncio.Event()
+
+    def build(self) -> Tuple[PrefixIndex, Dict[str, List]]:
+        db = SessionLocal()
+        try:
+            popularity = {
+                int(key): int(units)
+                for key, units in db.query(SalesRollup.key, func.sum(SalesRollup.units))
+                .filter(SalesRollup.grain == "day", SalesRollup.dimension == "product")
+                .group_by(SalesRollup.key)
+            }
+            entries, categories = [], {}
+            for product_id, name, category in db.query(Product.id, Product.name, Product.category).yield_per(10_000):
+                score = popularity.get(product_id, 0)
+                entries.append((normalize(name), name, product_id, score))
+                counts = categories.setdefault(normalize(category), [category, 0])
+                counts[1] += score
+        finally:
+            db.close()
+        return PrefixIndex(entries), categories
+
+    def swap(self, index: PrefixIndex, categories: Dict[str, List], started: float) -> None:
+        self.index, self.categories, self.ready = index, categories, True
+        # Changes applied after the build started may be missing from it: keep them
+        self.changes = {product_id: change for product_id, change in self.changes.items() if change[0] >= started}
+
+    def apply(self, message: dict) -> None:
+        # pub/sub listener, on the event loop
+        if message.get("reload"):
+            self.reload.set()
+            return
+        entry = None
+        if not message.get("deleted"):
+            entry = (normalize(message["name"]), message["name"], message["id"], 0)
+            self.categories.setdefault(normalize(message["category"]), [message["category"], 0])
+        self.changes[message["id"]] = (time.monotonic(), entry)
+
+    def suggest(self, text: str, limit: int) -> dict:
+        prefix = normalize(text)
+        probe = prefix.encode()
+        found = [
+            (self.index.popularity[i], self.index.ids[i], self.index.name(i))
+            for i in self.index.candidates(probe, limit + len(self.changes))
+            if self.index.ids[i] not in self.changes
+        ]
+        found += [
+            (popularity, product_id, name)
+            for _, entry in self.changes.values() if entry is not None
+            for key, name, product_id, popularity in [entry] if key.startswith(prefix)
+        ]
+        found.sort(key=lambda item: (-item[0], normalize(item[2])))
+        categories = sorted(
+            (counts for key, counts in self.categories.items() if key.startswith(prefix)),
+            key=lambda counts: (-counts[1], counts[0]),
+        )
+        return {
+            "products": [{"id": product_id, "name": name} for _, product_id, name in found[:limit]],
+            "categories": [name for name, _ in categories[:limit]],
+        }
+
+
+autocomplete = Autocomplete()
+pubsub.hub.listen(TOPIC, autocomplete.apply)
+
+
+def suggest_from_db(db: Session, text: str, limit: int) -> dict:
+    # Before the first build (or with AUTOCOMPLETE_ENABLED=false): prefix match in SQL, unranked
+    pattern = text.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    products = db.query(Product.id, Product.name).filter(Product.name.ilike(pattern, escape="\\")).order_by(Product.name).limit(limit)
+    categories = db.query(Product.category).filter(Product.category.ilike(pattern, escape="\\")).distinct().order_by(Product.category).limit(limit)
+    return {
+        "products": [{"id": product_id, "name": name} for product_id, name in products],
+        "categories": [category for (category,) in categories],
+    }
+
+
+def request_reload(db: Session) -> None:
+    # For set-based writes the session does not see (bulk imports): every worker rebuilds
+    pubsub.publish(db, TOPIC, {"reload": True})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_changes(session, flush_context):
+    for product in session.new:
+        if isinstance(product, Product):
+            pubsub.publish(session, TOPIC, {"id": product.id, "name": product.name, "category": product.category})
+    for product in session.dirty:
+        if isinstance(product, Product):
+            state = inspect(product)
+            if state.attrs.name.history.has_changes() or state.attrs.category.history.has_changes():
+                pubsub.publish(session, TOPIC, {"id": product.id, "name": product.name, "category": product.category})
+    for product in session.deleted:
+        if isinstance(product, Product):
+            pubsub.publish(session, TOPIC, {"id": product.id, "deleted": True})
+
+
+async def run_autocomplete_refresh(stopping: asyncio.Event) -> None:
+    while not stopping.is_set():
+        started = time.monotonic()
+        try:
+            index, categories = await asyncio.to_thread(autocomplete.build)
+            autocomplete.swap(index, categories, started)
+            logger.info(f"Autocomplete index built: {len(index)} name(s) in {time.monotonic() - started:.1f}s")
+        except Exception:
+            logger.exception("Autocomplete index build failed")
+        autocomplete.reload.clear()
+        waits = [asyncio.create_task(stopping.wait()), asyncio.create_task(autocomplete.reload.wait())]
+        await asyncio.wait(waits, timeout=AUTOCOMPLETE_REFRESH_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waits:
+            waiter.cancel()
@@ -0,0 +1,138 @@
+import os
+from typing import Dict, List
+
+from sqlalchemy import Float, Integer, String, bindparam, cast, column, func, update, values
+from sqlalchemy.orm import Session
+
+from app.products import facets, inventory, live
+from app.products.models import Product
+from app.products.schemas import BatchStatus, ProductBatchItem
+
+PRODUCT_BATCH_CHUNK_SIZE = int(os.getenv("PRODUCT_BATCH_CHUNK_SIZE", 1000))
+
+# Columns of the per-chunk VALUES list; None keeps the product's current value
+BATCH_COLUMNS = (
+    ("id", Integer),
+    ("stock_delta", Integer),
+    ("price", Float),
+    ("name", String),
+    ("description", String),
+    ("category", String),
+    ("image_url", String),
+)
+
+
+def _row(item: ProductBatchItem) -> dict:
+    return {
+        "id": item.id,
+        "stock_delta": item.stock_delta,
+        "price": item.price,
+        "name": item.name or None,
+        "description": item.description or None,
+        "category": item.category or None,
+        "image_url": str(item.image_url) if item.image_url else None,
+    }
+
+
+def _set_clause(source) -> dict:
+    # Relative stock and COALESCE'd fields, so the statement never writes a value read earlier
+    assignments = {"stock": Product.stock + source["stock_delta"]}
+    for name, type_ in BATCH_COLUMNS[2:]:
+        assignments[name] = func.coalesce(cast(source[name], type_), getattr(Product, name))
+    return assignments
+
+
+def _execute(db: Session, rows: List[dict]) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        # One UPDATE ... FROM (VALUES ...) for the whole chunk
+        source = values(*(column(name, type_) for name, type_ in BATCH_COLUMNS), name="batch").data(
+            [tuple(row[name] for name, _ in BATCH_COLUMNS) for row in rows]
+        )
+        db.execute(
+            update(Product)
+            .where(Product.id == source.c.id)
+            .values(**_set_clause(source.c))
+            .execution_options(synchronize_session=False)
+        )
+        return
+    # SQLite cannot alias a VALUES list's columns: one prepared UPDATE run with executemany
+    params = [{"b_" + name: value for name, value in row.items()} for row in rows]
+    statement = (
+        update(Product.__table__)
+        .where(Product.__table__.c.id == bindparam("b_id"))
+        .values(**_set_clause({name: bindparam("b_" + name) for name, _ in BATCH_COLUMNS}))
+    )
+    db.execute(statement, params)
+
+
+def _apply_chunk(db: Session, items: List[ProductBatchItem]) -> List[dict]:
+    # Locks the chunk's products in id order (the order checkout locks them in), so a concurrent
+    # checkout waits for the chunk instead of deadlocking with it or having its decrement lost
+    locked = {
+        row.id: row
+        for row in db.query(Product.id, Product.category, Product.price, Product.stock, Product.stock_shards)
+        .filter(Product.id.in_([item.id for item in items]))
+        .order_by(Product.id)
+        .with_for_update()
+    }
+
+    results, rows = [], []
+    delta = facets.FacetDelta()
+    for item in items:
+        row = locked.get(item.id)
+        if row is None:
+            results.append({"id": item.id, "status": BatchStatus.not_found})
+            continue
+        entry = _row(item)
+        if row.stock_shards:
+            # The delta goes to the shards, and take_stock is the only check: the cached
+            # products.stock (and its facet entry) lags behind them until sync_stock_shards runs
+            if item.stock_delta > 0:
+                inventory.return_stock(db, row, item.stock_delta)
+            elif item.stock_delta < 0 and not inventory.take_stock(db, row, -item.stock_delta):
+                results.append({
+                    "id": item.id, "status": BatchStatus.insufficient_stock, "stock": inventory.shard_stock(db, item.id),
+                })
+                continue
+            entry["stock_delta"] = 0
+            stock, cached = inventory.shard_stock(db, item.id), row.stock
+        else:
+            stock = cached = row.stock + item.stock_delta
+            if stock < 0:
+                results.append({"id": item.id, "status": BatchStatus.insufficient_stock, "stock": row.stock})
+                continue
+
+        price = item.price if item.price is not None else row.price
+        category = item.category or row.category
+        delta.change(facets.facet_entry(row), (category.lower(), price, cached > 0))
+        rows.append(entry)
+        results.append({"id": item.id, "status": BatchStatus.updated, "stock": stock, "price": price})
+        live.publish_product(db, item.id, stock, price)
+
+    if rows:
+        _execute(db, rows)
+    delta.apply(db)
+    return results
+
+
+def apply_batch(db: Session, items: List[ProductBatchItem], chunk_size: int = PRODUCT_BATCH_CHUNK_SIZE) -> List[dict]:
+    # One statement per chunk, all in the caller's transaction (the caller commits), so a batch
+    # that fails part way leaves nothing applied for an Idempotency-Key retry to apply twice.
+    # Chunks go in id order to keep the row locks in checkout's order across the whole batch.
+    # Results keep the request order; a repeated id is applied once.
+    seen: Dict[int, bool] = {}
+    unique, results = [], {}
+    for index, item in enumerate(items):
+        if item.id in seen:
+            results[index] = {"id": item.id, "status": BatchStatus.duplicate}
+        else:
+            seen[item.id] = True
+            unique.append((index, item))
+    unique.sort(key=lambda entry: entry[1].id)
+
+    for start in range(0, len(unique), chunk_size):
+        chunk = unique[start:start + chunk_size]
+        chunk_results = _apply_chunk(db, [item for _, item in chunk])
+        for (index, _), result in zip(chunk, chunk_results):
+            results[index] = result
+    return [results[index] for index in range(len(items))]
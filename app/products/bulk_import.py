@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Request
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, utcnow
+from app.core.logging import logger
+from app.core.retry import Retrying
+from app.products import autocomplete, facets, inventory, live
+from app.products.models import ImportStatus, Product, ProductImport, ProductImportError
+from app.products.schemas import DuplicatePolicy, ImportFormat, ProductCreate
+
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", 1000))
+# Rejected rows stored per import; later ones are only counted in `failed`
+PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", 1000))
+# Uploads larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_BYTES = 1024 * 1024
+
+CONTENT_TYPES = {
+    "text/csv": ImportFormat.csv,
+    "application/x-ndjson": ImportFormat.ndjson,
+    "application/ndjson": ImportFormat.ndjson,
+    "application/jsonl": ImportFormat.ndjson,
+}
+
+# (line number, record, parse error)
+Record = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(content_type: Optional[str]) -> Optional[ImportFormat]:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+
+async def spool_upload(request: Request) -> Tuple[BinaryIO, int]:
+    upload = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        upload.write(chunk)
+        size += len(chunk)
+    upload.seek(0)
+    return upload, size
+
+
+def iter_records(upload: BinaryIO, fmt: ImportFormat) -> Iterator[Record]:
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    if fmt == ImportFormat.csv:
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Empty cells mean "not set"; cells beyond the header row are dropped
+            yield reader.line_num, {key: value or None for key, value in record.items() if key is not None}, None
+        return
+
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, record, None
+
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors())
+
+
+def _values(product: ProductCreate) -> dict:
+    return {
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "stock": product.stock,
+        "category": product.category,
+        "image_url": str(product.image_url) if product.image_url else None,
+    }
+
+
+def _upsert(db: Session, job: ProductImport, pending: Dict[str, ProductCreate], on_duplicate: DuplicatePolicy) -> None:
+    # One duplicate lookup and at most one INSERT and one UPDATE statement for the whole chunk
+    existing = {}
+    rows = (
+        db.query(Product.id, Product.name, Product.category, Product.price, Product.stock, Product.stock_shards)
+        .filter(Product.name.in_(list(pending)))
+        .order_by(Product.id)
+        .with_for_update()
+    )
+    for row in rows:
+        existing.setdefault(row.name, row)  # same product create_products' duplicate check finds
+
+    inserts, updates, sharded = [], [], []
+    delta = facets.FacetDelta()
+    for name, product in pending.items():
+        values = _values(product)
+        after = (values["category"].lower(), values["price"], values["stock"] > 0)
+        row = existing.get(name)
+        if row is None:
+            inserts.append(values)
+            delta.change(None, after)
+        elif on_duplicate == DuplicatePolicy.skip:
+            job.skipped += 1
+        else:
+            updates.append({"id": row.id, **values})
+            live.publish_product(db, row.id, values["stock"], values["price"])
+            delta.change(facets.facet_entry(row), after)
+            if row.stock_shards:
+                sharded.append((row.id, values["stock"]))
+
+    if inserts:
+        db.execute(insert(Product), inserts)
+    if updates:
+        db.execute(update(Product), updates)
+    for product_id, stock in sharded:
+        inventory.set_sharded_stock(db, db.get(Product, product_id), stock)
+    delta.apply(db)
+    job.created += len(inserts)
+    job.updated += len(updates)
+
+
+def _commit_chunk(
+    db: Session,
+    job: ProductImport,
+    pending: Dict[str, ProductCreate],
+    errors: List[Tuple[int, str]],
+    rows: int,
+    superseded: int,
+    on_duplicate: DuplicatePolicy,
+    bytes_processed: int,
+) -> None:
+    # Products and progress counters commit together, so a retried or crashed chunk is never half-counted
+    for attempt in Retrying(db, "product_import"):
+        with attempt:
+            if pending:
+                _upsert(db, job, pending, on_duplicate)
+            room = max(PRODUCT_IMPORT_MAX_ERRORS - job.failed, 0)
+            db.add_all(ProductImportError(import_id=job.id, line=line, message=message) for line, message in errors[:room])
+            job.rows += rows
+            job.skipped += superseded
+            job.failed += len(errors)
+            job.bytes_processed = bytes_processed
+            db.commit()
+
+
+def run_import(
+    import_id: int,
+    upload: BinaryIO,
+    fmt: ImportFormat,
+    chunk_size: int = PRODUCT_IMPORT_CHUNK_SIZE,
+    on_duplicate: DuplicatePolicy = DuplicatePolicy.update,
+) -> None:
+    # Runs after the 202 response (BackgroundTasks), with its own session
+    db = SessionLocal()
+    try:
+        job = db.get(ProductImport, import_id)
+        pending: Dict[str, ProductCreate] = {}
+        errors: List[Tuple[int, str]] = []
+        rows = superseded = 0
+
+        for line, record, error in iter_records(upload, fmt):
+            rows += 1
+            if error is None:
+                try:
+                    product = ProductCreate.model_validate(record)
+                except ValidationError as e:
+                    error = describe(e)
+            if error is not None:
+                errors.append((line, error))
+            else:
+                # A name repeated within the chunk: the last row wins
+                if product.name in pending:
+                    superseded += 1
+                pending[product.name] = product
+
+            if len(pending) + len(errors) >= chunk_size:
+                _commit_chunk(db, job, pending, errors, rows, superseded, on_duplicate, upload.tell())
+                logger.info(f"Product import {import_id}: {job.rows} row(s) processed")
+                pending, errors, rows, superseded = {}, [], 0, 0
+
+        _commit_chunk(db, job, pending, errors, rows, superseded, on_duplicate, job.bytes_total)
+        job.status = ImportStatus.completed
+        job.finished_at = utcnow()
+        autocomplete.request_reload(db)
+        db.commit()
+        logger.info(
+            f"Product import {import_id} completed: {job.rows} row(s), {job.created} created, "
+            f"{job.updated} updated, {job.skipped} skipped, {job.failed} failed"
+        )
+
+    except Exception as e:
+        logger.exception(f"Product import {import_id} failed")
+        db.rollback()
+        job = db.get(ProductImport, import_id)
+        if isinstance(e, UnicodeDecodeError):
+            job.error = "File is not valid UTF-8"
+        elif isinstance(e, csv.Error):
+            job.error = f"Malformed CSV: {e}"
+        else:
+            job.error = "Internal Server Error"
+        job.status = ImportStatus.failed
+        job.finished_at = utcnow()
+        autocomplete.request_reload(db)  # chunks committed before the failure stay imported
+        db.commit()
+
+    finally:
+        upload.close()
+        db.close()
@@ -0,0 +1,341 @@
+import asyncio
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from itertools import compress, islice, tee
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core import pubsub
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.products import live
+from app.products.autocomplete import TOPIC as NAMES_TOPIC
+from app.products.models import Product
+
+# Answers GET /products filtering, sorting and paging from memory; the page's rows are then
+# read by primary key. Off by default: each worker holds its own copy of the catalog.
+CATALOG_ENGINE_ENABLED = os.getenv("CATALOG_ENGINE_ENABLED", "false").lower() == "true"
+# Full rebuild interval: reclaims the slots of deleted products and the bytes of old names
+CATALOG_ENGINE_REBUILD_SECONDS = float(os.getenv("CATALOG_ENGINE_REBUILD_SECONDS", 3600))
+CATALOG_ENGINE_RETRY_SECONDS = 5
+
+SORT_KEYS = ("price", "name", "stock")
+DELETED = 0xFFFFFFFF  # category code of a deleted product's slot
+
+# id, name, price, stock, category
+Row = Tuple[int, str, float, int, str]
+
+
+class ColumnarCatalog:
+    # One slot per product, in id order, as parallel arrays: 4 + 8 + 4 + 4 + 4 + 4 bytes a slot,
+    # plus the names packed in one UTF-8 blob (byte order is code point order, the order of the
+    # C collation and of SQLite). Categories are interned as integer codes. For each sort key a
+    # permutation of the live slots, ordered by (value, id), adds 4 bytes a slot.
+    # Slots are only appended; a deleted product's slot leaves the permutations and stays
+    # unused until the next rebuild. Not thread-safe: CatalogEngine holds the lock.
+
+    def __init__(self, rows: Iterable[Row]):
+        self.ids = array("i")
+        self.prices = array("d")
+        self.stocks = array("i")
+        self.category_codes = array("I")
+        self.name_starts = array("I")
+        self.name_lengths = array("I")
+        self.names = bytearray()
+        self.categories: Dict[str, int] = {}  # lower-cased category -> code
+        self.deleted = 0
+        for product_id, name, price, stock, category in rows:  # ascending id
+            self.ids.append(product_id)
+            self.prices.append(0.0)
+            self.stocks.append(0)
+            self.category_codes.append(DELETED)
+            self.name_starts.append(0)
+            self.name_lengths.append(0)
+            self._set(len(self.ids) - 1, name, price, stock, category)
+        # Slots are in id order and sorted() is stable, so sorting by the bare value gives the
+        # (value, id) order without building a tuple per slot
+        names = [self.name(slot) for slot in range(len(self.ids))]
+        self.orders = {
+            "price": array("I", sorted(range(len(self.ids)), key=self.prices.__getitem__)),
+            "name": array("I", sorted(range(len(self.ids)), key=names.__getitem__)),
+            "stock": array("I", sorted(range(len(self.ids)), key=self.stocks.__getitem__)),
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.deleted
+
+    def name(self, slot: int) -> bytes:
+        start = self.name_starts[slot]
+        return bytes(self.names[start:start + self.name_lengths[slot]])
+
+    def _sort_key(self, sort_key: str) -> Callable[[int], tuple]:
+        ids = self.ids
+        if sort_key == "price":
+            prices = self.prices
+            return lambda slot: (prices[slot], ids[slot])
+        if sort_key == "stock":
+            stocks = self.stocks
+            return lambda slot: (stocks[slot], ids[slot])
+        return lambda slot: (self.name(slot), ids[slot])
+
+    def _set(self, slot: int, name: str, price: float, stock: int, category: str) -> None:
+        encoded = name.encode()
+        if encoded != self.name(slot):
+            # The old bytes stay in the blob until the next rebuild
+            self.name_starts[slot] = len(self.names)
+            self.name_lengths[slot] = len(encoded)
+            self.names += encoded
+        self.prices[slot] = price
+        self.stocks[slot] = stock
+        self.category_codes[slot] = self.categories.setdefault(category.lower(), len(self.categories))
+
+    def _unlink(self, slot: int, sort_keys: Iterable[str]) -> None:
+        for sort_key in sort_keys:
+            key = self._sort_key(sort_key)
+            order = self.orders[sort_key]
+            del order[bisect_left(order, key(slot), key=key)]
+
+    def _link(self, slot: int, sort_keys: Iterable[str]) -> None:
+        for sort_key in sort_keys:
+            insort(self.orders[sort_key], slot, key=self._sort_key(sort_key))
+
+    def _find(self, product_id: int) -> Optional[int]:
+        slot = bisect_left(self.ids, product_id)
+        if slot < len(self.ids) and self.ids[slot] == product_id:
+            return slot
+        return None
+
+    def upsert(self, product_id: int, name: str, price: float, stock: int, category: str) -> bool:
+        # False when the product cannot be placed (an id below the highest one): rebuild
+        slot = self._find(product_id)
+        if slot is None:
+            if self.ids and product_id < self.ids[-1]:
+                return False
+            self.ids.append(product_id)
+            self.prices.append(0.0)
+            self.stocks.append(0)
+            self.category_codes.append(DELETED)
+            self.name_starts.append(0)
+            self.name_lengths.append(0)
+            slot = len(self.ids) - 1
+            self.deleted += 1  # a new slot starts out deleted
+        if self.category_codes[slot] == DELETED:
+            self.deleted -= 1
+        else:
+            self._unlink(slot, SORT_KEYS)
+        self._set(slot, name, price, stock, category)
+        self._link(slot, SORT_KEYS)
+        return True
+
+    def update_stock_price(self, product_id: int, stock: int, price: float) -> None:
+        slot = self._find(product_id)
+        if slot is None or self.category_codes[slot] == DELETED:
+            return  # added since the build: picked up by the engine's pending read
+        changed = [sort_key for sort_key, old, new in (("price", self.prices[slot], price), ("stock", self.stocks[slot], stock)) if old != new]
+        self._unlink(slot, changed)
+        self.prices[slot] = price
+        self.stocks[slot] = stock
+        self._link(slot, changed)
+
+    def remove(self, product_id: int) -> None:
+        slot = self._find(product_id)
+        if slot is None or self.category_codes[slot] == DELETED:
+            return
+        self._unlink(slot, SORT_KEYS)
+        self.category_codes[slot] = DELETED
+        self.deleted += 1
+
+    @staticmethod
+    def _where(slots: Iterator[int], column: array, test: Callable) -> Iterator[int]:
+        # A mask applied in C, without a Python call per slot: the selectors are the column's
+        # values at those slots, mapped through a bound comparison such as (42).__eq__
+        slots, probe = tee(slots)
+        return compress(slots, map(test, map(column.__getitem__, probe)))
+
+    def search(self, category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+               sort_by: str, offset: int, limit: int) -> List[int]:
+        # Product ids of one page, with the semantics of the SQL path in get_products
+        order = self.orders[sort_by]
+        lo, hi = 0, len(order)
+        if sort_by == "price":
+            # Already in price order: the price range is a slice of the permutation
+            if min_price:
+                lo = bisect_left(order, min_price, key=self.prices.__getitem__)
+            if max_price:
+                hi = bisect_right(order, max_price, key=self.prices.__getitem__)
+            min_price = max_price = None
+        if not (category or min_price or max_price):
+            # Nothing left to filter: the page is a slice
+            return [self.ids[slot] for slot in order[min(lo + offset, hi):min(lo + offset + limit, hi)]]
+        # A copy of the price range (a memcpy) rather than islice(order, lo, hi), which would step
+        # over the first lo slots one by one
+        slots = iter(order if hi - lo == len(order) else order[lo:hi])
+        if category:
+            code = self.categories.get(category.lower())
+            if code is None:
+                return []
+            slots = self._where(slots, self.category_codes, code.__eq__)
+        if min_price:
+            slots = self._where(slots, self.prices, float(min_price).__le__)
+        if max_price:
+            slots = self._where(slots, self.prices, float(max_price).__ge__)
+        return [self.ids[slot] for slot in islice(slots, offset, offset + limit)]
+
+    def memory_bytes(self) -> int:
+        columns = [self.ids, self.prices, self.stocks, self.category_codes, self.name_starts, self.name_lengths]
+        columns += self.orders.values()
+        return sum(len(column) * column.itemsize for column in columns) + len(self.names)
+
+
+class CatalogEngine:
+    # The catalog is read in a worker thread and swapped in. Stock and price changes (checkouts,
+    # admin edits, restocks: the live product topics) are applied in place on the event loop;
+    # added, renamed and recategorized products (the autocomplete topic) are re-read from the
+    # database in a batch. Queries run in request threads: one lock serialises them with updates.
+
+    def __init__(self):
+        self.catalog = ColumnarCatalog([])
+        self.lock = threading.Lock()
+        self.ready = False
+        self.pending: Set[int] = set()
+        self.rebuild = False
+        self.wake = asyncio.Event()
+        self.building = False
+        self.replay: List[Callable[[ColumnarCatalog], None]] = []  # changes received during a build
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+
+    def _apply(self, change: Callable[[ColumnarCatalog], None]) -> None:
+        with self.lock:
+            change(self.catalog)
+        if self.building:
+            self.replay.append(change)
+
+    def on_product(self, topic: str, message: dict) -> None:
+        # pub/sub listener, on the event loop
+        self._apply(lambda catalog: catalog.update_stock_price(message["id"], message["stock"], message["price"]))
+
+    def on_names(self, message: dict) -> None:
+        # pub/sub listener, on the event loop
+        if message.get("reload"):
+            self.rebuild = True
+        elif message.get("deleted"):
+            self._apply(lambda catalog: catalog.remove(message["id"]))
+        else:
+            self.pending.add(message["id"])
+        self.wake.set()
+
+    def search(self, category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+               sort_by: str, offset: int, limit: int) -> List[int]:
+        with self.lock:
+            return self.catalog.search(category, min_price, max_price, sort_by, offset, limit)
+
+    @staticmethod
+    def read_catalog() -> ColumnarCatalog:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Product.id, Product.name, Product.price, Product.stock, Product.category)
+                .order_by(Product.id)
+                .yield_per(10_000)
+            )
+            return ColumnarCatalog(rows)
+        finally:
+            db.close()
+
+    @staticmethod
+    def read_rows(product_ids: Set[int]) -> List[Row]:
+        db = SessionLocal()
+        try:
+            return (
+                db.query(Product.id, Product.name, Product.price, Product.stock, Product.category)
+                .filter(Product.id.in_(product_ids))
+                .order_by(Product.id)
+                .all()
+            )
+        finally:
+            db.close()
+
+    async def build(self) -> None:
+        started = time.monotonic()
+        self.replay, self.building = [], True
+        try:
+            catalog = await asyncio.to_thread(self.read_catalog)
+        finally:
+            self.building = False
+        with self.lock:
+            for change in self.replay:
+                change(catalog)
+            self.catalog, self.ready = catalog, True
+        self.replay = []
+        self.built_at, self.build_seconds = time.time(), time.monotonic() - started
+
+    async def apply_pending(self) -> None:
+        product_ids, self.pending = self.pending, set()
+        rows = {row[0]: row for row in await asyncio.to_thread(self.read_rows, product_ids)}
+        placed = True
+        with self.lock:
+            for product_id in sorted(product_ids):
+                row = rows.get(product_id)
+                if row is None:
+                    self.catalog.remove(product_id)
+                else:
+                    placed = self.catalog.upsert(*row) and placed
+        if not placed:
+            self.rebuild = True
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": CATALOG_ENGINE_ENABLED,
+                "ready": self.ready,
+                "products": len(self.catalog),
+                "deleted_slots": self.catalog.deleted,
+                "categories": len(self.catalog.categories),
+                "memory_bytes": self.catalog.memory_bytes(),
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+                "pending": len(self.pending),
+            }
+
+
+catalog_engine = CatalogEngine()
+# Kept current only by the published changes: with several workers on the local broker, each
+# engine would miss the other workers' writes until the next rebuild
+if CATALOG_ENGINE_ENABLED and not pubsub.REACHES_ALL_WORKERS:
+    logger.error(
+        f"CATALOG_ENGINE_ENABLED needs PUBSUB_BROKER=postgres with {pubsub.WORKER_PROCESSES} workers: "
+        f"the catalog engine stays off"
+    )
+    CATALOG_ENGINE_ENABLED = False
+if CATALOG_ENGINE_ENABLED:
+    pubsub.hub.listen_prefix(live.TOPIC_PREFIX, catalog_engine.on_product)
+    pubsub.hub.listen(NAMES_TOPIC, catalog_engine.on_names)
+
+
+async def run_catalog_engine(stopping: asyncio.Event) -> None:
+    next_build = 0.0
+    while not stopping.is_set():
+        catalog_engine.wake.clear()
+        failed = False
+        try:
+            if catalog_engine.rebuild or time.monotonic() >= next_build:
+                catalog_engine.rebuild = False
+                await catalog_engine.build()
+                next_build = time.monotonic() + CATALOG_ENGINE_REBUILD_SECONDS
+                logger.info(f"Catalog engine built: {len(catalog_engine.catalog)} product(s) in {catalog_engine.build_seconds:.1f}s")
+            elif catalog_engine.pending:
+                await catalog_engine.apply_pending()
+        except Exception:
+            # Changes may have been lost: start over from a full read once the database answers
+            logger.exception("Catalog engine update failed")
+            catalog_engine.rebuild = failed = True
+        if not failed and (catalog_engine.pending or catalog_engine.rebuild):
+            continue
+        timeout = CATALOG_ENGINE_RETRY_SECONDS if failed else max(0.0, next_build - time.monotonic())
+        waits = [asyncio.create_task(stopping.wait()), asyncio.create_task(catalog_engine.wake.wait())]
+        await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waits:
+            waiter.cancel()
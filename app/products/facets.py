@@ -0,0 +1,131 @@
+import os
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.products.models import CategoryFacet, CategoryPriceBucket, Product
+
+# Upper bounds of the price histogram buckets; the last bucket is open-ended
+PRICE_BUCKETS = [float(b) for b in os.getenv("FACET_PRICE_BUCKETS", "10,25,50,100,250,500,1000").split(",")]
+
+# (lower(category), price, in stock) - the only product attributes the facets depend on
+FacetEntry = Tuple[str, float, bool]
+
+
+def facet_entry(product: Product) -> FacetEntry:
+    return (product.category.lower(), product.price, product.stock > 0)
+
+
+def price_bucket(price: float) -> int:
+    return bisect_right(PRICE_BUCKETS, price)
+
+
+def bucket_bounds(bucket: int) -> Tuple[float, Optional[float]]:
+    low = PRICE_BUCKETS[bucket - 1] if bucket > 0 else 0.0
+    high = PRICE_BUCKETS[bucket] if bucket < len(PRICE_BUCKETS) else None
+    return low, high
+
+
+class FacetDelta:
+    # Accumulates count changes so a batch of product changes costs one UPDATE per touched key
+
+    def __init__(self):
+        self.categories: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self.buckets: Dict[Tuple[str, int], int] = defaultdict(int)
+
+    def change(self, before: Optional[FacetEntry], after: Optional[FacetEntry]) -> "FacetDelta":
+        if before == after:
+            return self
+        for entry, sign in ((before, -1), (after, 1)):
+            if entry is None:
+                continue
+            category, price, in_stock = entry
+            counts = self.categories[category]
+            counts[0] += sign
+            counts[1] += sign if in_stock else 0
+            self.buckets[(category, price_bucket(price))] += sign
+        return self
+
+    def apply(self, db: Session) -> None:
+        # Runs inside the caller's transaction, so facets commit or roll back with the product change.
+        # Rows are updated in key order so concurrent checkouts cannot deadlock on each other.
+        for category, (products, in_stock) in sorted(self.categories.items()):
+            if products or in_stock:
+                _increment(
+                    db, CategoryFacet, {"category": category},
+                    product_count=products, in_stock_count=in_stock,
+                )
+        for (category, bucket), products in sorted(self.buckets.items()):
+            if products:
+                _increment(
+                    db, CategoryPriceBucket, {"category": category, "bucket": bucket},
+                    product_count=products,
+                )
+        self.categories.clear()
+        self.buckets.clear()
+
+
+def record_change(db: Session, before: Optional[FacetEntry], after: Optional[FacetEntry]) -> None:
+    FacetDelta().change(before, after).apply(db)
+
+
+def _increment(db: Session, model, key: dict, **deltas: int) -> None:
+    where = [getattr(model, column) == value for column, value in key.items()]
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+    if db.execute(update(model).where(*where).values(**values)).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(model(**key, **deltas))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        db.execute(update(model).where(*where).values(**values))
+
+
+def rebuild_facets(db: Session) -> int:
+    # Full recount, for backfilling or repairing the aggregates; caller commits
+    db.execute(delete(CategoryFacet))
+    db.execute(delete(CategoryPriceBucket))
+    delta = FacetDelta()
+    scanned = 0
+    rows = db.query(Product.category, Product.price, Product.stock).yield_per(1000)
+    for category, price, stock in rows:
+        delta.change(None, (category.lower(), price, stock > 0))
+        scanned += 1
+    db.add_all(
+        CategoryFacet(category=category, product_count=products, in_stock_count=in_stock)
+        for category, (products, in_stock) in delta.categories.items()
+    )
+    db.add_all(
+        CategoryPriceBucket(category=category, bucket=bucket, product_count=products)
+        for (category, bucket), products in delta.buckets.items()
+    )
+    return scanned
+
+
+def read_facets(db: Session, category: Optional[str] = None) -> dict:
+    facets = db.query(CategoryFacet).filter(CategoryFacet.product_count > 0)
+    buckets = db.query(CategoryPriceBucket.bucket, CategoryPriceBucket.product_count)
+    if category:
+        facets = facets.filter(CategoryFacet.category == category.lower())
+        buckets = buckets.filter(CategoryPriceBucket.category == category.lower())
+
+    histogram: Dict[int, int] = defaultdict(int)
+    for bucket, products in buckets:
+        histogram[bucket] += products
+
+    return {
+        "categories": [
+            {"category": f.category, "product_count": f.product_count, "in_stock_count": f.in_stock_count}
+            for f in facets.order_by(CategoryFacet.category)
+        ],
+        "price_buckets": [
+            {"min_price": low, "max_price": high, "product_count": histogram[bucket]}
+            for bucket in range(len(PRICE_BUCKETS) + 1)
+            for low, high in [bucket_bounds(bucket)]
+        ],
+    }
@@ -0,0 +1,194 @@
+import os
+import random
+from typing import Dict, List
+
+from sqlalchemy import Integer, bindparam, column, delete, func, select, update, values
+from sqlalchemy.orm import Session
+
+from app.core.logging import logger
+from app.core import scheduler, statements
+from app.core.scheduler import MAINTENANCE_BATCH_ROWS
+from app.products import facets, live
+from app.products.models import Product, ProductStockShard
+
+# How often sharded products whose shards moved get them rebalanced and `products.stock`
+# refreshed, by one worker (a scheduled job); 0 disables
+STOCK_SHARD_SYNC_SECONDS = float(os.getenv("STOCK_SHARD_SYNC_SECONDS", 30))
+
+
+def _split(total: int, shards: int) -> List[int]:
+    if not shards:
+        return []
+    base, extra = divmod(total, shards)
+    return [base + (1 if n < extra else 0) for n in range(shards)]
+
+
+def _lock_shards(db: Session, product_id: int) -> List[ProductStockShard]:
+    return (
+        db.query(ProductStockShard)
+        .filter(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard)
+        .with_for_update()
+        .all()
+    )
+
+
+def set_shards(db: Session, product: Product, shards: int) -> None:
+    # Re-splits the product's current stock over `shards` rows; 0 folds it back into products.stock.
+    # Caller holds the product row lock and commits.
+    if product.stock_shards:
+        total = sum(shard.quantity for shard in _lock_shards(db, product.id))
+    else:
+        total = product.stock
+    db.execute(delete(ProductStockShard).where(ProductStockShard.product_id == product.id))
+    db.add_all(
+        ProductStockShard(product_id=product.id, shard=n, quantity=quantity)
+        for n, quantity in enumerate(_split(total, shards))
+    )
+    product.stock_shards = shards
+    product.stock = total
+
+
+def set_sharded_stock(db: Session, product: Product, stock: int) -> None:
+    # Absolute stock update (admin edit) for a sharded product
+    shards = _lock_shards(db, product.id)
+    for shard, quantity in zip(shards, _split(stock, len(shards))):
+        shard.quantity = quantity
+    product.stock = stock
+
+
+def take_stock(db: Session, product: Product, quantity: int) -> bool:
+    # Tries shards in random order with a conditional decrement, so concurrent checkouts of the
+    # same product usually lock different rows. Falls back to draining several shards.
+    order = list(range(product.stock_shards))
+    random.shuffle(order)
+    for shard in order:
+        taken = db.execute(
+            update(ProductStockShard)
+            .where(
+                ProductStockShard.product_id == product.id,
+                ProductStockShard.shard == shard,
+                ProductStockShard.quantity >= quantity,
+            )
+            .values(quantity=ProductStockShard.quantity - quantity, dirty=True)
+        ).rowcount
+        if taken:
+            return True
+
+    shards = _lock_shards(db, product.id)
+    if sum(shard.quantity for shard in shards) < quantity:
+        return False
+    remaining = quantity
+    for shard in sorted(shards, key=lambda s: s.quantity, reverse=True):
+        used = min(shard.quantity, remaining)
+        shard.quantity -= used
+        shard.dirty = True
+        remaining -= used
+        if not remaining:
+            break
+    db.flush()
+    return True
+
+
+def shard_stock(db: Session, product_id: int) -> int:
+    # The live stock of a sharded product; products.stock only caches it between syncs
+    return db.scalar(
+        select(func.coalesce(func.sum(ProductStockShard.quantity), 0)).where(ProductStockShard.product_id == product_id)
+    )
+
+
+def return_stock(db: Session, product: Product, quantity: int) -> None:
+    shard = random.randrange(product.stock_shards)
+    db.execute(
+        update(ProductStockShard)
+        .where(ProductStockShard.product_id == product.id, ProductStockShard.shard == shard)
+        .values(quantity=ProductStockShard.quantity + quantity, dirty=True)
+    )
+
+
+def restock(db: Session, quantities: Dict[int, int]) -> None:
+    # Adds stock back for many products at once (cancelled orders). Products are locked in id
+    # order like checkout; unsharded ones get one UPDATE for all of them, sharded ones a shard
+    # increment each. Facets and live listeners are updated for the unsharded ones; a sharded
+    # product's cached stock, and what is published for it, is refreshed by sync_product.
+    # Caller commits.
+    rows = (
+        db.query(Product.id, Product.category, Product.price, Product.stock, Product.stock_shards)
+        .filter(Product.id.in_(quantities))
+        .order_by(Product.id)
+        .with_for_update()
+        .all()
+    )
+    delta = facets.FacetDelta()
+    increments = []
+    for row in rows:
+        quantity = quantities[row.id]
+        if row.stock_shards:
+            return_stock(db, row, quantity)
+        else:
+            increments.append((row.id, quantity))
+            delta.change(facets.facet_entry(row), (row.category.lower(), row.price, row.stock + quantity > 0))
+            live.publish_product(db, row.id, row.stock + quantity, row.price)
+
+    if increments and db.get_bind().dialect.name == "postgresql":
+        # UPDATE ... FROM (VALUES ...)
+        source = values(column("id", Integer), column("quantity", Integer), name="restock").data(increments)
+        db.execute(
+            update(Product)
+            .where(Product.id == source.c.id)
+            .values(stock=Product.stock + source.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
+    elif increments:
+        products = Product.__table__
+        db.execute(
+            update(products).where(products.c.id == bindparam("b_id")).values(stock=products.c.stock + bindparam("b_quantity")),
+            [{"b_id": product_id, "b_quantity": quantity} for product_id, quantity in increments],
+        )
+    delta.apply(db)
+
+
+def sync_product(db: Session, product_id: int) -> None:
+    # Evens out the shards and caches their sum in products.stock, one short transaction per product
+    product = statements.product_by_id(db, product_id, for_update=True)
+    if product is None or not product.stock_shards:
+        return
+    shards = _lock_shards(db, product_id)
+    quantities = [shard.quantity for shard in shards]
+    total = sum(quantities)
+    if max(quantities) - min(quantities) > 1:
+        for shard, quantity in zip(shards, _split(total, len(shards))):
+            shard.quantity = quantity
+    for shard in shards:
+        shard.dirty = False
+    if product.stock != total:
+        before = facets.facet_entry(product)
+        product.stock = total
+        facets.record_change(db, before, facets.facet_entry(product))
+
+
+@scheduler.job("sync_stock_shards", STOCK_SHARD_SYNC_SECONDS)
+def sync_stock_shards(db: Session, run: scheduler.JobRun) -> int:
+    # Only products with a dirty shard, in id order (keyset): a product that keeps failing
+    # waits for the next run instead of being retried in a loop
+    synced, after = 0, 0
+    while True:
+        product_ids = db.scalars(
+            select(ProductStockShard.product_id)
+            .where(ProductStockShard.dirty.is_(True), ProductStockShard.product_id > after)
+            .distinct()
+            .order_by(ProductStockShard.product_id)
+            .limit(MAINTENANCE_BATCH_ROWS)
+        ).all()
+        for product_id in product_ids:
+            try:
+                sync_product(db, product_id)
+                db.commit()
+                synced += 1
+            except Exception:
+                db.rollback()
+                logger.exception(f"Stock shard sync failed for Product ID {product_id}")
+        if product_ids:
+            after = product_ids[-1]
+        if len(product_ids) < MAINTENANCE_BATCH_ROWS or not run.next_batch():
+            return synced
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from typing import AsyncIterator, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core import pubsub
+from app.core.database import SessionLocal
+from app.core.logging import logger
+from app.core.responses import render_json
+from app.products.models import Product
+
+# A subscriber gets at most one update per product per interval, the latest one
+LIVE_COALESCE_SECONDS = float(os.getenv("LIVE_COALESCE_SECONDS", 1))
+# Comment line sent on idle streams so proxies do not time them out
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+LIVE_MAX_PRODUCTS = int(os.getenv("LIVE_MAX_PRODUCTS", 100))
+
+
+TOPIC_PREFIX = "product:"
+
+
+def topic(product_id: int) -> str:
+    return f"{TOPIC_PREFIX}{product_id}"
+
+
+def publish_product(db: Session, product_id: int, stock: int, price: float) -> None:
+    # For set-based updates the session does not see; ORM changes are picked up automatically
+    pubsub.publish(db, topic(product_id), {"id": product_id, "stock": stock, "price": price})
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _capture_changes(session, flush_context):
+    # Checkout, admin edits, shard syncs: any flushed change to a product's stock or price
+    for product in session.dirty:
+        if isinstance(product, Product):
+            state = inspect(product)
+            if state.attrs.stock.history.has_changes() or state.attrs.price.history.has_changes():
+                publish_product(session, product.id, product.stock, product.price)
+
+
+def sse_event(name: str, data) -> bytes:
+    return b"event: " + name.encode() + b"\ndata: " + render_json(data) + b"\n\n"
+
+
+async def stream_products(product_ids: List[int]) -> AsyncIterator[bytes]:
+    subscription = pubsub.hub.subscribe(topic(product_id) for product_id in product_ids)
+    try:
+        # Subscribed before the snapshot is read, so no change can fall between the two
+        db = SessionLocal()
+        try:
+            rows = db.query(Product.id, Product.stock, Product.price).filter(Product.id.in_(product_ids)).all()
+        finally:
+            db.close()
+        yield sse_event("snapshot", [{"id": row.id, "stock": row.stock, "price": row.price} for row in rows])
+
+        # Ends when the client disconnects: Starlette cancels the stream, or the next write fails
+        while True:
+            batch = await subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+            if not batch:
+                yield b": keep-alive\n\n"
+                continue
+            for message in batch.values():
+                yield sse_event("product", message)
+            # Changes arriving meanwhile are merged into the next batch
+            await asyncio.sleep(LIVE_COALESCE_SECONDS)
+    finally:
+        subscription.close()
+        logger.info(f"Live product stream closed ({len(product_ids)} product(s))")
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float
-from app.core.database import Base
+import enum
+from sqlalchemy import Boolean, Column, DateTime, Enum, ForeignKey, Index, Integer, String, Float, func, literal_column
+from app.core.database import Base, utcnow
 from sqlalchemy.orm import relationship
 class Product(Base):
     __tablename__ = "products"
@@ -11,6 +12,102 @@ class Product(Base):
     stock = Column(Integer, nullable=False)
     category = Column(String, nullable=False)
     image_url = Column(String) 
+    # Bumped on every UPDATE of the row (admin edits, checkout stock changes); drives catalog ETags
+    version = Column(Integer, nullable=False, default=1, server_default="1",
+                     onupdate=literal_column("products.version") + 1)
+    updated_at = Column(DateTime, nullable=False, default=utcnow, server_default=func.now(), onupdate=utcnow)
+    # > 0: stock lives in that many ProductStockShard rows and `stock` is their periodically synced sum
+    stock_shards = Column(Integer, nullable=False, default=0, server_default="0")
 
     
-    cart_items = relationship("Cart", back_populates="product")
\ No newline at end of file
+    cart_items = relationship("Cart", back_populates="product")
+
+
+# Sparse item-item co-occurrence matrix: how many orders contained both products. Stored in both
+# directions; the (product_id, orders, related_id) index hands out a product's top-K neighbours
+# as a K-row range scan. Maintained by app.products.related.
+class ProductPair(Base):
+    __tablename__ = "product_pairs"
+    __table_args__ = (Index("ix_product_pairs_top", "product_id", "orders", "related_id"),)
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    related_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+
+
+# Slice of a sharded product's stock; checkouts decrement one shard instead of the product row
+class ProductStockShard(Base):
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    # Set by every checkout / restock that moves the shard, cleared when the product is synced
+    dirty = Column(Boolean, nullable=False, default=False, server_default="0")
+
+
+# Facet aggregates, maintained incrementally by app.products.facets. Keyed by lower(category),
+# the same normalisation get_products filters on.
+class CategoryFacet(Base):
+    __tablename__ = "category_facets"
+
+    category = Column(String, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+    in_stock_count = Column(Integer, nullable=False, default=0)
+
+
+class CategoryPriceBucket(Base):
+    __tablename__ = "category_price_buckets"
+
+    category = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    product_count = Column(Integer, nullable=False, default=0)
+
+
+class ImportStatus(enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+# Bulk product import started by POST /admin/products/import; counters are committed after every chunk
+class ProductImport(Base):
+    __tablename__ = "product_imports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    format = Column(String, nullable=False)
+    status = Column(Enum(ImportStatus), nullable=False, default=ImportStatus.running)
+    rows = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    bytes_total = Column(Integer, nullable=False, default=0)
+    bytes_processed = Column(Integer, nullable=False, default=0)
+    error = Column(String)  # why the whole import stopped, if it did
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    finished_at = Column(DateTime)
+
+
+# Rejected import row; only the first PRODUCT_IMPORT_MAX_ERRORS per import are kept
+class ProductImportError(Base):
+    __tablename__ = "product_import_errors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    import_id = Column(Integer, ForeignKey("product_imports.id"), nullable=False, index=True)
+    line = Column(Integer, nullable=False)
+    message = Column(String, nullable=False)
+
+
+# Columns in ProductOut field order, for list endpoints that return rows instead of ORM objects
+PRODUCT_OUT_COLUMNS = (
+    Product.name,
+    Product.description,
+    Product.price,
+    Product.stock,
+    Product.category,
+    Product.image_url,
+    Product.id,
+)
+PRODUCT_OUT_KEYS = tuple(column.key for column in PRODUCT_OUT_COLUMNS)
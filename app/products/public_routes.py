@@ -1,25 +1,112 @@
-from fastapi import APIRouter, Depends, Query
+import os
+from functools import partial
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.exception_handlers import http_exception_handler
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_catalog_user, get_current_user
 from app.core.deps import get_db
+from app.core.compression import catalog_cache, negotiate_encoding
+from app.core.database import SessionLocal
 from app.core.error_logger import create_error_response
-from app.products.models import Product
-from app.products.schemas import ProductOut
+from app.core.rate_limit import rate_limit
+from app.core.http_cache import is_not_modified, not_modified_response, set_cache_headers, weak_etag
+from app.core.responses import FastJSONResponse, rows_to_dicts
+from app.core.single_flight import SingleFlightCache
+from fastapi.responses import StreamingResponse
+from app.core import pubsub
+from app.products import live
+from app.products.autocomplete import AUTOCOMPLETE_MAX_SUGGESTIONS, TOPIC as CATALOG_NAMES_TOPIC, autocomplete, suggest_from_db
+from app.products.catalog_engine import catalog_engine
+from app.products.facets import read_facets
+from app.products.models import PRODUCT_OUT_COLUMNS, PRODUCT_OUT_KEYS, Product, ProductPair
+from app.products.schemas import AutocompleteOut, FacetsOut, ProductOut
 from app.core.logging import logger
 
 
+# List and search results per worker: identical concurrent requests share one query, a result
+# is reused for CATALOG_READ_FRESH_SECONDS, then served stale for CATALOG_READ_STALE_SECONDS more
+# while one request refreshes it in the background. When the query fails (database down), a
+# result up to CATALOG_STALE_IF_ERROR_SECONDS old is served instead. 0 / 0 keeps the coalescing only.
+CATALOG_READ_FRESH_SECONDS = float(os.getenv("CATALOG_READ_FRESH_SECONDS", 1))
+CATALOG_READ_STALE_SECONDS = float(os.getenv("CATALOG_READ_STALE_SECONDS", 10))
+CATALOG_STALE_IF_ERROR_SECONDS = float(os.getenv("CATALOG_STALE_IF_ERROR_SECONDS", 300))
+CATALOG_READ_CACHE_ENTRIES = int(os.getenv("CATALOG_READ_CACHE_ENTRIES", 2000))
 
 router = APIRouter(prefix='/products', tags=["Public Products"])
 
+catalog_reads = SingleFlightCache(
+    "catalog_reads",
+    CATALOG_READ_FRESH_SECONDS,
+    CATALOG_READ_STALE_SECONDS,
+    CATALOG_STALE_IF_ERROR_SECONDS,
+    CATALOG_READ_CACHE_ENTRIES,
+)
+# A product added, renamed, recategorized or deleted: refresh on the next read. Only with
+# PUBSUB_BROKER=postgres does this reach the other workers; otherwise they pick the change up,
+# like stock and price changes, within the fresh + stale windows.
+pubsub.hub.listen(CATALOG_NAMES_TOPIC, lambda message: catalog_reads.expire())
+
+# ProductOut columns plus what the ETag (and the detail's Last-Modified) is derived from
+CATALOG_COLUMNS = PRODUCT_OUT_COLUMNS + (Product.version, Product.updated_at)
+CATALOG_ROW_BY_ID = select(*CATALOG_COLUMNS).where(Product.id == bindparam("product_id"))  # prebuilt, see app/core/statements.py
+
+
+# Answers with 304 when the client's ETag still matches, otherwise renders the rows.
+# The ETag identifies the body, so a hot page is rendered and compressed once per encoding.
+# No Last-Modified: the newest row on a page can go back in time (a product leaves the
+# filter or moves to another page), so If-Modified-Since would answer 304 for a changed page.
+def catalog_response(request: Request, policy: str, rows: list):
+    etag = weak_etag(*[(row.id, row.version) for row in rows])
+    if is_not_modified(request, etag):
+        return not_modified_response(policy, etag)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    response = catalog_cache.get(etag, encoding, "application/json")
+    if response is None:
+        response = FastJSONResponse(content=rows_to_dicts(rows, PRODUCT_OUT_KEYS))
+        response = catalog_cache.compress(etag, encoding, response)
+    return set_cache_headers(response, policy, etag)
+
+
+# Runs in a worker thread with its own session: a background refresh outlives the request
+def load_products(category: Optional[str], min_price: Optional[float], max_price: Optional[float],
+                  sort_by: str, page: int, page_size: int) -> list:
+    db = SessionLocal()
+    try:
+        if catalog_engine.ready:
+            # Filtered, sorted and paged in memory; only the page's rows are read, by primary key
+            ids = catalog_engine.search(category, min_price, max_price, sort_by, (page - 1) * page_size, page_size)
+            rows = {row.id: row for row in db.query(*CATALOG_COLUMNS).filter(Product.id.in_(ids))} if ids else {}
+            return [rows[product_id] for product_id in ids if product_id in rows]
+
+        query = db.query(*CATALOG_COLUMNS)
+
+        if category:
+            logger.info(f"Applying category filter: {category}")
+            query = query.filter(func.lower(Product.category) == category)
+        if min_price:
+            logger.info(f"Applying min_price filter: {min_price}")
+            query = query.filter(Product.price >= min_price)
+        if max_price:
+            logger.info(f"Applying max_price filter: {max_price}")
+            query = query.filter(Product.price <= max_price)
+
+        logger.info(f"Sorting by: {sort_by}")
+        query = query.order_by(getattr(Product, sort_by))
+
+        start = (page - 1) * page_size
+        return query.offset(start).limit(page_size).all()
+    finally:
+        db.close()
+
 
 # List all products with optional filters and sorting
 @router.get("", response_model=List[ProductOut])
 async def get_products(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    request: Request,
+    current_user: dict = Depends(get_catalog_user),
     category: Optional[str] = Query(None, description="Filter by category"),
     min_price: Optional[float] = Query(None, gt=0, description="Minimum price"),
     max_price: Optional[float] = Query(None, gt=0, description="Maximum price"),
@@ -32,27 +119,11 @@ async def get_products(
        raise http_exception_handler("Invalid sort_by value. Choose from: price, name, stock", 400)
     
     try:
-     
-       query = db.query(Product)
-
-       if category:
-        logger.info(f"Applying category filter: {category}")
-        query = query.filter(func.lower(Product.category) == category.lower())
-       if min_price:
-        logger.info(f"Applying min_price filter: {min_price}")
-        query = query.filter(Product.price >= min_price)
-       if max_price:
-        logger.info(f"Applying max_price filter: {max_price}")
-        query = query.filter(Product.price <= max_price)
-
-       logger.info(f"Sorting by: {sort_by}")
-       query = query.order_by(getattr(Product, sort_by))
-
-       start = (page - 1) * page_size
-       products = query.offset(start).limit(page_size).all()
+       key = ("list", category.lower() if category else None, min_price, max_price, sort_by, page, page_size)
+       products = await catalog_reads.get(key, partial(load_products, *key[1:]))
 
        logger.info(f"Retrieved {len(products)} product(s)")
-       return products
+       return catalog_response(request, "products.list", products)
 
     except Exception:
        logger.exception("Error while retrieving filtered products")
@@ -61,40 +132,132 @@ async def get_products(
 
     
 
+def load_search(keyword: str) -> list:
+    db = SessionLocal()
+    try:
+        return db.query(*CATALOG_COLUMNS).filter(
+            Product.name.ilike(f"%{keyword}%") | Product.description.ilike(f"%{keyword}%")
+        ).all()
+    finally:
+        db.close()
+
+
 # Search for products by keyword
-@router.get("/search", response_model=List[ProductOut])
+@router.get("/search", response_model=List[ProductOut], dependencies=[Depends(rate_limit("products.search"))])
 async def search_products(
+    request: Request,
     keyword: str = Query(..., min_length=1, description="Search term"),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_catalog_user)
 ):
     try:
-        results = db.query(Product).filter(
-            Product.name.ilike(f"%{keyword}%") | Product.description.ilike(f"%{keyword}%")
-        ).all()
+        results = await catalog_reads.get(("search", keyword.lower()), partial(load_search, keyword.lower()))
         logger.info(f"Search returned {len(results)} result(s) for keyword: '{keyword}'")
-        return results
+        return catalog_response(request, "products.search", results)
     except Exception as e:
         logger.exception(f"Error during product search: {str(e)}")
         return create_error_response("Search failed", 500)
+
+
+# Name and category suggestions for a search box prefix, most purchased first, from the in-memory index
+@router.get("/autocomplete", response_model=AutocompleteOut)
+async def autocomplete_products(
+    q: str = Query(..., min_length=1, max_length=100, description="What has been typed so far"),
+    limit: int = Query(AUTOCOMPLETE_MAX_SUGGESTIONS, gt=0, le=AUTOCOMPLETE_MAX_SUGGESTIONS),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        if autocomplete.ready:
+            return FastJSONResponse(content=autocomplete.suggest(q, limit))
+        return suggest_from_db(db, q, limit)
+    except Exception:
+        logger.exception(f"Error while suggesting products for '{q}'")
+        return create_error_response("Unable to suggest products", 500)
+
+
+# Category counts and price histogram, read from the precomputed facet tables
+@router.get("/facets", response_model=FacetsOut)
+async def get_facets(
+    category: Optional[str] = Query(None, description="Restrict the price histogram to one category"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return read_facets(db, category)
+    except Exception:
+        logger.exception("Error while reading product facets")
+        return create_error_response("Unable to retrieve facets", 500)
         
 
 
 
+# Live stock and price of a set of products as server-sent events (replaces polling /products/{id})
+@router.get("/live")
+async def live_products(
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$", description="Comma-separated product IDs"),
+    current_user: dict = Depends(get_current_user)
+):
+    product_ids = sorted({int(product_id) for product_id in ids.split(",")})
+    if len(product_ids) > live.LIVE_MAX_PRODUCTS:
+        return create_error_response(f"At most {live.LIVE_MAX_PRODUCTS} products per stream", 400)
+
+    logger.info(f"Live product stream opened for {len(product_ids)} product(s) by user '{current_user['email']}'")
+    return StreamingResponse(
+        live.stream_products(product_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+
+# Products most often bought together with this one, read from the precomputed pair counts
+@router.get("/{id}/related", response_model=List[ProductOut])
+async def get_related_products(
+    id: int,
+    request: Request,
+    limit: int = Query(10, gt=0, le=50, description="Number of products"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        products = (
+            db.query(*CATALOG_COLUMNS)
+            .join(ProductPair, ProductPair.related_id == Product.id)
+            .filter(ProductPair.product_id == id, ProductPair.orders > 0)
+            .order_by(ProductPair.orders.desc(), ProductPair.related_id.desc())
+            .limit(limit)
+            .all()
+        )
+    except Exception:
+        logger.exception(f"Error while retrieving products related to product ID {id}")
+        return create_error_response("Unable to retrieve related products", 500)
+
+    if not products and db.execute(CATALOG_ROW_BY_ID, {"product_id": id}).first() is None:
+        raise HTTPException(status_code=404, detail=f"Product with ID {id} not found")
+    return catalog_response(request, "products.related", products)
+
+
 # Get details of a single product by ID
 @router.get("/{id}", response_model=ProductOut)
 async def get_product_by_id(
     id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    product = db.query(Product).filter(Product.id == id).first()
+    product = db.execute(CATALOG_ROW_BY_ID, {"product_id": id}).first()
     if not product:
             logger.warning(f"Product with ID {id} not found for user '{current_user['email']}'")
-            raise http_exception_handler(f"Product with ID {id} not found", 404)
+            raise HTTPException(status_code=404, detail=f"Product with ID {id} not found")
     try:
+        etag = weak_etag(product.id, product.version)
+        if is_not_modified(request, etag, product.updated_at):
+            return not_modified_response("products.detail", etag, product.updated_at)
+
         logger.info(f"Product with ID {id} retrieved successfully for user '{current_user['email']}'")
-        return product
+        response = FastJSONResponse(content=dict(zip(PRODUCT_OUT_KEYS, product)))
+        return set_cache_headers(response, "products.detail", etag, product.updated_at)
    
     except Exception as e:
         logger.exception(f"Error retrieving product with ID {id} for user '{current_user['email']}'")
@@ -0,0 +1,116 @@
+import os
+from collections import Counter
+from itertools import groupby, permutations
+from operator import itemgetter
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import bindparam, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.orders.models import ORDER_TABLES, OrderStatus
+from app.products.models import ProductPair
+
+# Orders with more distinct products than this (bulk / wholesale) are left out of the matrix:
+# they add n*(n-1) pairs each and say little about what is bought together
+RELATED_MAX_ORDER_PRODUCTS = int(os.getenv("RELATED_MAX_ORDER_PRODUCTS", 20))
+REBUILD_INSERT_ROWS = 10_000
+
+pairs_table = ProductPair.__table__
+INCREMENT = (
+    update(pairs_table)
+    .where(pairs_table.c.product_id == bindparam("b_product_id"), pairs_table.c.related_id == bindparam("b_related_id"))
+    .values(orders=pairs_table.c.orders + bindparam("b_orders"))
+)
+
+
+def order_pairs(product_ids: Iterable[int]) -> List[Tuple[int, int]]:
+    # Both directions of every pair of distinct products in one order
+    distinct = sorted(set(product_ids))
+    if len(distinct) > RELATED_MAX_ORDER_PRODUCTS:
+        return []
+    return list(permutations(distinct, 2))
+
+
+class PairDelta:
+    # Like FacetDelta: accumulates the pair counts of one or more orders (a dict-of-keys sparse
+    # matrix) and applies them with a handful of set-based statements in the caller's transaction
+
+    def __init__(self):
+        self.pairs: Counter = Counter()
+
+    def add_order(self, product_ids: Iterable[int], sign: int = 1) -> "PairDelta":
+        # sign=-1 takes a cancelled order back out
+        for pair in order_pairs(product_ids):
+            self.pairs[pair] += sign
+        return self
+
+    def apply(self, db: Session) -> None:
+        pairs = sorted((pair, count) for pair, count in self.pairs.items() if count)
+        if not pairs:
+            return
+        product_ids = sorted({product_id for (product_id, _), _ in pairs})
+        # Existing rows are locked in key order, so concurrent checkouts cannot deadlock each other
+        existing = {
+            tuple(row)
+            for row in db.query(ProductPair.product_id, ProductPair.related_id)
+            .filter(ProductPair.product_id.in_(product_ids), ProductPair.related_id.in_(product_ids))
+            .order_by(ProductPair.product_id, ProductPair.related_id)
+            .with_for_update()
+        }
+        updates = [
+            {"b_product_id": product_id, "b_related_id": related_id, "b_orders": count}
+            for (product_id, related_id), count in pairs if (product_id, related_id) in existing
+        ]
+        inserts = [
+            {"product_id": product_id, "related_id": related_id, "orders": count}
+            for (product_id, related_id), count in pairs if (product_id, related_id) not in existing
+        ]
+        if updates:
+            db.execute(INCREMENT, updates)
+        if inserts:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(ProductPair), inserts)
+            except IntegrityError:
+                # A concurrent checkout created some of these pairs first
+                for row in inserts:
+                    _upsert_pair(db, row)
+        self.pairs.clear()
+
+
+def _upsert_pair(db: Session, row: dict) -> None:
+    params = {"b_product_id": row["product_id"], "b_related_id": row["related_id"], "b_orders": row["orders"]}
+    if db.execute(INCREMENT, params).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(ProductPair), [row])
+    except IntegrityError:
+        db.execute(INCREMENT, params)
+
+
+def rebuild_related(db: Session) -> int:
+    # Full recount from the order items, hot and archived (backfill or repair), streamed in order_id order; caller commits
+    db.execute(delete(ProductPair))
+    delta = PairDelta()
+    orders = 0
+    for order_table, item_table, joined in ORDER_TABLES:
+        rows = (
+            db.query(item_table.order_id, item_table.product_id)
+            .join(order_table, joined)
+            .filter(order_table.status != OrderStatus.cancelled)
+            .order_by(item_table.order_id)
+            .yield_per(5000)
+        )
+        for _, items in groupby(rows, key=itemgetter(0)):
+            delta.add_order(product_id for _, product_id in items)
+            orders += 1
+
+    rows = [
+        {"product_id": product_id, "related_id": related_id, "orders": count}
+        for (product_id, related_id), count in delta.pairs.items()
+    ]
+    for start in range(0, len(rows), REBUILD_INSERT_ROWS):
+        db.execute(insert(ProductPair), rows[start:start + REBUILD_INSERT_ROWS])
+    return orders
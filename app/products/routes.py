@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query , status
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query , Request, status
 from app.core.error_logger import create_error_response
+from app.core.export import export_response
+from app.core.idempotency import IdempotencyGuard, idempotent
+from app.core.responses import FastJSONResponse, rows_to_dicts
+from app.core.retry import raise_if_retryable, transactional_retry
+from app.core import statements
 from app.core.logging import logger
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.auth.dependencies import require_role
 from app.auth.models import Roles
 from app.core.deps import get_db
-from app.orders.models import OrderItem
-from app.products.models import Product
+from app.products import batch, bulk_import, facets, inventory, related
+from app.products.models import PRODUCT_OUT_COLUMNS, Product, ProductImport
 from app.products.schemas import *
 
 
@@ -21,7 +28,7 @@ async def create_products(
     user: dict = Depends(require_role(Roles.admin))
 ):
  # Check if the product already exists
- exist_product = db.query(Product).filter(Product.name == product.name).first()
+ exist_product = statements.product_by_name(db, product.name)
  if exist_product:
         logger.warning(f"Product creation failed: '{product.name}' already exists.")
         raise HTTPException(status_code=400, detail="Product already exists")
@@ -37,9 +44,10 @@ async def create_products(
     )
 
     db.add(new_product)
+    facets.record_change(db, None, facets.facet_entry(new_product))
     db.commit()
     db.refresh(new_product)
-    logger.info(f"Product created: ID {product.id} by admin ID: {user.id}")
+    logger.info(f"Product created: ID {new_product.id} by admin ID: {user.get('id')}")
     return new_product
  
  except Exception as e:
@@ -48,6 +56,106 @@ async def create_products(
 
 
 
+def import_out(job: ProductImport, errors=()) -> ProductImportOut:
+    return ProductImportOut(
+        id=job.id,
+        status=job.status.value,
+        format=job.format,
+        rows=job.rows,
+        created=job.created,
+        updated=job.updated,
+        skipped=job.skipped,
+        failed=job.failed,
+        bytes_total=job.bytes_total,
+        bytes_processed=job.bytes_processed,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        status_url=f"{router.prefix}/imports/{job.id}",
+        errors=[ProductImportErrorOut.model_validate(error) for error in errors],
+    )
+
+
+# BULK IMPORT - streams a CSV or NDJSON body (one ProductCreate per row) and upserts by name in the background
+@router.post("/import", response_model=ProductImportOut, status_code=202)
+async def import_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: Optional[ImportFormat] = Query(None, description="Defaults to the request Content-Type"),
+    chunk_size: int = Query(bulk_import.PRODUCT_IMPORT_CHUNK_SIZE, ge=1, le=10000),
+    on_duplicate: DuplicatePolicy = Query(DuplicatePolicy.update),
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    fmt = format or bulk_import.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        logger.warning(f"Product import rejected: unsupported content type {request.headers.get('content-type')}")
+        return create_error_response(
+            "Send text/csv or application/x-ndjson, or set the format query parameter",
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    upload, size = await bulk_import.spool_upload(request)
+    try:
+        job = ProductImport(user_id=user.get("id"), format=fmt.value, bytes_total=size)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception:
+        upload.close()
+        logger.exception("Error occurred while starting product import.")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    background_tasks.add_task(bulk_import.run_import, job.id, upload, fmt, chunk_size, on_duplicate)
+    logger.info(f"Product import {job.id} started: {size} bytes of {fmt.value} by admin ID: {user.get('id')}")
+    return FastJSONResponse(status_code=202, content=import_out(job).model_dump(mode="json"))
+
+
+# progress of a bulk import and the rejected rows (paginated)
+@router.get("/imports/{import_id}", response_model=ProductImportOut)
+async def get_product_import(
+    import_id: int,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin)),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, le=1000),
+):
+    job = statements.product_import(db, import_id)
+    if not job:
+        logger.warning(f"Product import not found: ID {import_id}")
+        raise HTTPException(status_code=404, detail="Product import not found")
+
+    return import_out(job, statements.product_import_errors(db, import_id, skip, limit))
+
+
+
+# BATCH UPDATE - relative stock deltas and absolute field updates for many products, one statement per chunk
+@router.post("/batch", response_model=ProductBatchOut)
+@transactional_retry("product_batch")
+async def batch_update_products(
+    data: ProductBatchUpdate,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin)),
+    guard: IdempotencyGuard = Depends(idempotent("products.batch"))
+):
+    # stock_delta is not idempotent: clients should send an Idempotency-Key so a retried request is replayed
+    if guard.replay is not None:
+        return guard.replay
+
+    try:
+        results = batch.apply_batch(db, data.items)
+        updated = sum(1 for result in results if result["status"] == BatchStatus.updated)
+        logger.info(f"Batch update of {len(results)} product(s): {updated} updated, by admin ID: {user.get('id')}")
+        # Commits the whole batch together with the stored Idempotency-Key response
+        return guard.save(ProductBatchOut(updated=updated, failed=len(results) - updated, results=results))
+
+    except Exception as e:
+        raise_if_retryable(e)
+        logger.exception("Exception while applying product batch update")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+
 #GET ALL PRODUCTS- USE OF PAGINATION - accessible to admin only
 @router.get("", response_model=list[ProductOut],status_code=200)
 async def get_all_products(
@@ -57,12 +165,12 @@ async def get_all_products(
     limit: int = Query(10, le=100),
 ):
     try:
-        products = db.query(Product).offset(skip).limit(limit).all()
+        products = rows_to_dicts(statements.product_page(db, skip, limit))
         logger.info(
             f"Admin {user['email']} accessed product list: skip={skip}, limit={limit}, total={len(products)}"
         )
 
-        return [ProductOut.model_validate(p, from_attributes=True) for p in products]
+        return FastJSONResponse(content=products)
 
     except Exception as e:
         logger.error(f"Failed to fetch products: {str(e)}")
@@ -77,6 +185,19 @@ async def get_all_products(
     
 
 
+# EXPORT - the whole catalog as one NDJSON or CSV stream (gzip when the client accepts it)
+@router.get("/export")
+async def export_products(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    statement = select(*PRODUCT_OUT_COLUMNS, Product.updated_at).order_by(Product.id)
+    logger.info(f"Product export started as {format} by admin ID: {user.get('id')}")
+    return export_response(request, statement, format, "products")
+
+
+
 # GET PRODUCTS BY ID - accessible to admin only
 @router.get("/{id}", response_model=ProductOut)
 async def get_product_by_id(
@@ -85,7 +206,7 @@ async def get_product_by_id(
     user: dict = Depends(require_role(Roles.admin))
     ):
 
-    product_exists = db.query(Product).filter(Product.id == id).first()
+    product_exists = statements.product_by_id(db, id)
     if not product_exists:
         logger.warning(f"Product not found for ID: {id}")
         raise HTTPException(status_code=404, detail="Product not found")
@@ -108,19 +229,23 @@ async def update_product(
     db: Session = Depends(get_db),
     user: dict = Depends(require_role(Roles.admin))
 ):
-    product = db.query(Product).filter(Product.id == id).first()
+    product = statements.product_by_id(db, id)
     if not product:
         logger.warning(f"Update failed: Product with ID {id} not found")
         raise HTTPException(status_code=404, detail="Product not found")
 
     try:
+        before = facets.facet_entry(product)
         product.name = product_update.name if product_update.name else product.name
         product.description = product_update.description if product_update.description else product.description
         product.price = product_update.price if product_update.price is not None else product.price
         product.stock = product_update.stock if product_update.stock is not None else product.stock
         product.category = product_update.category if product_update.category else product.category
         product.image_url = str(product_update.image_url) if product_update.image_url else product.image_url
+        if product.stock_shards and product_update.stock is not None:
+            inventory.set_sharded_stock(db, product, product_update.stock)
 
+        facets.record_change(db, before, facets.facet_entry(product))
         db.commit()
         db.refresh(product)
 
@@ -138,19 +263,21 @@ async def delete_product(
     db: Session = Depends(get_db),
     user: dict = Depends(require_role(Roles.admin))
 ):
-   product = db.query(Product).filter(Product.id == id).first()
+   product = statements.product_by_id(db, id)
    if not product:
         logger.warning(f"Delete failed: Product with ID {id} not found")
         raise HTTPException(status_code=404, detail="Product not found")
 
    try:
-        product_in_orders = db.query(OrderItem).filter(OrderItem.product_id == id).first()
-        if product_in_orders:
+        if statements.product_in_orders(db, id):
             logger.warning(f"Delete failed: Product ID {id} is referenced in orders, cannot be deleted")
             return create_error_response(
                 f"Product '{product.name}' is part of existing orders and cannot be deleted",
                  status_code=status.HTTP_400_BAD_REQUEST
             )
+        facets.record_change(db, facets.facet_entry(product), None)
+        if product.stock_shards:
+            inventory.set_shards(db, product, 0)
         db.delete(product)
         db.commit()
         logger.info(f"Product deleted: ID={id}, Name='{product.name}', by AdminID={user.get('id')}")
@@ -160,3 +287,65 @@ async def delete_product(
         logger.exception(f"Exception while deleting product ID={id}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+
+
+# split a hot product's stock over N counter rows (0 folds it back into the product row)
+@router.put("/{id}/shards", response_model=ProductOut)
+async def set_stock_shards(
+    id: int,
+    data: StockShardsUpdate,
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    product = statements.product_by_id(db, id, for_update=True)
+    if not product:
+        logger.warning(f"Shard update failed: Product with ID {id} not found")
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    try:
+        before = facets.facet_entry(product)
+        inventory.set_shards(db, product, data.shards)
+        facets.record_change(db, before, facets.facet_entry(product))
+        db.commit()
+        db.refresh(product)
+
+        logger.info(f"Stock shards set to {data.shards} for product ID={id} by AdminID={user.get('id')}")
+        return product
+
+    except Exception:
+        logger.exception(f"Exception while sharding stock of product ID={id}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# rebuild facet aggregates from the products table
+@router.post("/facets/rebuild")
+async def rebuild_facets(
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    try:
+        scanned = facets.rebuild_facets(db)
+        db.commit()
+        logger.info(f"Facets rebuilt from {scanned} product(s) by AdminID={user.get('id')}")
+        return {"message": f"Facets rebuilt from {scanned} product(s)"}
+
+    except Exception:
+        logger.exception("Exception while rebuilding facets")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# rebuild the frequently-bought-together matrix from order history
+@router.post("/related/rebuild")
+async def rebuild_related(
+    db: Session = Depends(get_db),
+    user: dict = Depends(require_role(Roles.admin))
+):
+    try:
+        orders = related.rebuild_related(db)
+        db.commit()
+        logger.info(f"Related products rebuilt from {orders} order(s) by AdminID={user.get('id')}")
+        return {"message": f"Related products rebuilt from {orders} order(s)"}
+
+    except Exception:
+        logger.exception("Exception while rebuilding related products")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
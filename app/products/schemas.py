@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
 
 class ProductBase(BaseModel):
     name: str
@@ -26,4 +28,99 @@ class ProductOut(ProductBase):
 
     model_config = {
         "from_attributes": True
-    }
\ No newline at end of file
+    }
+
+class StockShardsUpdate(BaseModel):
+    shards: int = Field(..., ge=0, le=64, description="Number of stock shards, 0 to disable sharding")
+
+
+class CategoryFacetOut(BaseModel):
+    category: str
+    product_count: int
+    in_stock_count: int
+
+class PriceBucketOut(BaseModel):
+    min_price: float
+    max_price: Optional[float] = None
+    product_count: int
+
+class FacetsOut(BaseModel):
+    categories: List[CategoryFacetOut]
+    price_buckets: List[PriceBucketOut]
+
+class ProductSuggestion(BaseModel):
+    id: int
+    name: str
+
+class AutocompleteOut(BaseModel):
+    products: List[ProductSuggestion]
+    categories: List[str]
+
+
+class ImportStatus(str, Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+class DuplicatePolicy(str, Enum):
+    update = "update"
+    skip = "skip"
+
+class ProductImportErrorOut(BaseModel):
+    line: int
+    message: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class ProductImportOut(BaseModel):
+    id: int
+    status: ImportStatus
+    format: ImportFormat
+    rows: int
+    created: int
+    updated: int
+    skipped: int
+    failed: int
+    bytes_total: int
+    bytes_processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    status_url: str
+    errors: List[ProductImportErrorOut] = []
+
+
+class ProductBatchItem(BaseModel):
+    id: int
+    stock_delta: int = Field(0, description="Added to the current stock; negative to remove")
+    price: Optional[float] = Field(None, gt=0)
+    name: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    image_url: Optional[HttpUrl] = None
+
+class ProductBatchUpdate(BaseModel):
+    items: List[ProductBatchItem] = Field(..., min_length=1, max_length=10000)
+
+class BatchStatus(str, Enum):
+    updated = "updated"
+    not_found = "not_found"
+    insufficient_stock = "insufficient_stock"
+    duplicate = "duplicate"
+
+class ProductBatchResult(BaseModel):
+    id: int
+    status: BatchStatus
+    stock: Optional[int] = None
+    price: Optional[float] = None
+
+class ProductBatchOut(BaseModel):
+    updated: int
+    failed: int
+    results: List[ProductBatchResult]
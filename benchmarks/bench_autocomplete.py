@@ -0,0 +1,59 @@
+"""Autocomplete prefix index at catalog scale (in memory; the database is not queried).
+
+Builds PrefixIndex over synthetic product names (Zipf-ish popularity), reports build time and
+memory against a plain list of (key, name, id, popularity) tuples, then times suggestions for
+random prefixes of 1 to 6 characters.
+
+    DATABASE_URL=... python -m benchmarks.bench_autocomplete [names]
+"""
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+from app.products.autocomplete import AUTOCOMPLETE_MAX_SUGGESTIONS, PrefixIndex, normalize
+
+WORDS = ["".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(5000)]
+
+
+def synthetic_names(count):
+    random.seed(42)
+    for product_id in range(1, count + 1):
+        name = " ".join(random.choice(WORDS).capitalize() for _ in range(random.randint(2, 4)))
+        yield normalize(name), name, product_id, int(1000 / random.randint(1, 1000))
+
+
+def allocated(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    entries = list(synthetic_names(count))
+
+    started = time.perf_counter()
+    index = PrefixIndex(entries)
+    elapsed = time.perf_counter() - started
+    print(f"{count} names: built in {elapsed:.1f} s, {len(index.top)} heavy prefixes precomputed")
+    tuples_size = allocated(lambda: list(synthetic_names(count)))
+    index_size = allocated(lambda: PrefixIndex(entries))
+    print(f"  list of tuples: {tuples_size / count:6.1f} bytes/name ({tuples_size / 2**20:.0f} MiB)")
+    print(f"  prefix index:   {index_size / count:6.1f} bytes/name ({index_size / 2**20:.0f} MiB)")
+
+    for length in range(1, 7):
+        prefixes = [entries[random.randrange(count)][0][:length] for _ in range(2000)]
+        started = time.perf_counter()
+        for prefix in prefixes:
+            [index.name(i) for i in index.candidates(prefix.encode(), AUTOCOMPLETE_MAX_SUGGESTIONS)][:AUTOCOMPLETE_MAX_SUGGESTIONS]
+        per_query = (time.perf_counter() - started) / len(prefixes) * 1e6
+        print(f"  prefix length {length}: {per_query:7.1f} us per top-{AUTOCOMPLETE_MAX_SUGGESTIONS} lookup")
+
+
+if __name__ == "__main__":
+    main()
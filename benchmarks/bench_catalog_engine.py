@@ -0,0 +1,114 @@
+"""Memory and latency of the in-memory catalog engine vs. the SQL path of GET /products.
+
+Seeds the products (once; re-runs reuse them), builds the columnar catalog from the database
+and reports its build time and size: the arrays themselves, and the Python heap it keeps as
+measured by tracemalloc on a second build. Then runs typical list queries both ways through
+load_products: SQL (filter + ORDER BY + OFFSET) and engine (in-memory filter/sort/page, then
+the page's rows by primary key), plus the in-memory search alone and the cost of one
+stock/price update.
+
+    DATABASE_URL=... python -m benchmarks.bench_catalog_engine [products]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/bench_catalog_engine.db")
+
+from sqlalchemy import func, insert
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth import models as _auth_models  # noqa: F401  (relationship targets)
+from app.cart import models as _cart_models  # noqa: F401
+from app.orders import models as _order_models  # noqa: F401
+from app.products import public_routes
+from app.products.catalog_engine import CatalogEngine, catalog_engine
+from app.products.models import Product
+
+CATEGORIES = 200
+ROUNDS = 20
+
+QUERIES = [
+    ("all, by price, page 1", (None, None, None, "price", 1, 20)),
+    ("category, by name, page 1", ("category-7", None, None, "name", 1, 20)),
+    ("category + price range, by stock, page 5", ("category-7", 100.0, 300.0, "stock", 5, 20)),
+    ("price range, by price, page 50", (None, 250.0, 260.0, "price", 50, 20)),
+    ("all, by stock, page 1000", (None, None, None, "stock", 1000, 20)),
+]
+
+
+def seed(products: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Product.id)).scalar()
+        if existing >= products:
+            return
+        rng = random.Random(7)
+        for start in range(existing, products, 50_000):
+            db.execute(insert(Product), [
+                {
+                    "name": f"Product {rng.getrandbits(40):010x}",
+                    "description": "Benchmark product",
+                    "price": round(rng.uniform(1, 1000), 2),
+                    "stock": rng.randint(0, 1000),
+                    "category": f"Category-{rng.randrange(CATEGORIES)}",
+                    "image_url": f"https://cdn.example.com/products/{i}.jpg",
+                }
+                for i in range(start, min(start + 50_000, products))
+            ])
+            db.commit()
+    finally:
+        db.close()
+
+
+def timed_ms(function, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    seed(products)
+
+    started = time.perf_counter()
+    catalog = CatalogEngine.read_catalog()
+    build_seconds = time.perf_counter() - started
+    # A second build under tracemalloc (which slows allocation down) for the heap it keeps
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    measured = CatalogEngine.read_catalog()
+    heap = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del measured
+    rows = len(catalog)
+    print(f"{rows} products: built in {build_seconds:.1f}s, arrays {catalog.memory_bytes() / 2**20:.1f} MiB, "
+          f"heap {heap / 2**20:.1f} MiB ({heap / rows * 1_000_000 / 2**20:.0f} MiB per 1M products)")
+
+    catalog_engine.catalog = catalog
+    print(f"\n{'query':>42} {'SQL ms':>9} {'engine ms':>10} {'search only':>12}")
+    for label, params in QUERIES:
+        catalog_engine.ready = False
+        sql_ms = timed_ms(public_routes.load_products, *params)
+        expected = len(public_routes.load_products(*params))
+        catalog_engine.ready = True
+        engine_ms = timed_ms(public_routes.load_products, *params)
+        assert len(public_routes.load_products(*params)) == expected, label
+        category, min_price, max_price, sort_by, page, page_size = params
+        search_ms = timed_ms(catalog.search, category, min_price, max_price, sort_by, (page - 1) * page_size, page_size)
+        print(f"{label:>42} {sql_ms:9.2f} {engine_ms:10.2f} {search_ms:12.3f}")
+
+    rng = random.Random(1)
+    ids = [catalog.ids[rng.randrange(len(catalog.ids))] for _ in range(1000)]
+    started = time.perf_counter()
+    for product_id in ids:
+        catalog.update_stock_price(product_id, rng.randint(0, 1000), round(rng.uniform(1, 1000), 2))
+    print(f"\nstock + price update: {(time.perf_counter() - started) / len(ids) * 1e6:.0f} us each")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""CPU per response vs. bytes saved when compressing catalog pages.
+
+Renders product pages of a few sizes the way catalog_response does (column rows +
+FastJSONResponse), then for every installed encoding and a few levels reports the compressed
+size, the CPU spent per response and the CPU per KB saved. The last column of each row is a hit
+in the pre-compressed catalog cache, which replaces both the JSON rendering and the compression.
+Descriptions are random words so the ratios are not flattered by repeated text.
+
+    python -m benchmarks.bench_compression
+"""
+import gzip
+import os
+import random
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.core.compression import CompressedCache, brotli, zstandard
+from app.core.responses import FastJSONResponse
+from app.products.models import PRODUCT_OUT_KEYS
+
+PAGES = (20, 100, 500)  # a list page, the largest list page, a broad search
+ROUNDS = 50
+
+WORDS = (
+    "steel cotton wireless compact premium organic waterproof ergonomic vintage portable leather "
+    "bamboo ceramic outdoor kitchen garden travel office kids smart classic slim heavy duty soft "
+    "adjustable rechargeable handmade stainless recycled lightweight foldable"
+).split()
+
+
+def rows(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    return [
+        (
+            i,
+            " ".join(rng.choice(WORDS) for _ in range(3)).title(),
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))),
+            round(rng.uniform(1, 500), 2),
+            rng.randint(0, 500),
+            rng.choice(("Electronics", "Home", "Garden", "Toys", "Books", "Clothing", "Sports")),
+            f"https://cdn.example.com/products/{i}/{rng.getrandbits(64):016x}.jpg",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def render(page: list) -> bytes:
+    return FastJSONResponse(content=[dict(zip(PRODUCT_OUT_KEYS, row)) for row in page]).body
+
+
+def codecs() -> list:
+    candidates = [(f"gzip -{level}", lambda data, level=level: gzip.compress(data, level, mtime=0)) for level in (1, 6, 9)]
+    if brotli is not None:
+        candidates += [(f"br {level}", lambda data, level=level: brotli.compress(data, quality=level)) for level in (4, 5, 11)]
+    if zstandard is not None:
+        candidates += [
+            (f"zstd {level}", zstandard.ZstdCompressor(level=level).compress) for level in (1, 3, 9)
+        ]
+    return candidates
+
+
+def cpu_ms(function, *args) -> float:
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        function(*args)
+    return (time.process_time() - start) / ROUNDS * 1000
+
+
+def main():
+    missing = [name for name, module in (("brotli", brotli), ("zstandard", zstandard)) if module is None]
+    if missing:
+        print(f"not installed, skipped: {', '.join(missing)}")
+    for size in PAGES:
+        page = rows(size)
+        body = render(page)
+        render_ms = cpu_ms(render, page)
+        print(f"\n{size} rows: {len(body) / 1024:.1f} KB of JSON, rendered in {render_ms:.3f} ms CPU")
+        print(f"{'encoding':>10} {'KB':>8} {'ratio':>6} {'ms CPU':>8} {'us/KB saved':>12} {'cached ms':>10}")
+        for name, compress in codecs():
+            compressed = compress(body)
+            ms = cpu_ms(compress, body)
+            saved_kb = (len(body) - len(compressed)) / 1024
+            cache = CompressedCache(1 << 30)
+            cache.entries[("etag", name)] = compressed
+            cached_ms = cpu_ms(cache.get, "etag", name, "application/json")
+            print(
+                f"{name:>10} {len(compressed) / 1024:8.1f} {len(body) / len(compressed):6.1f} "
+                f"{ms:8.3f} {ms * 1000 / saved_kb:12.1f} {cached_ms:10.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
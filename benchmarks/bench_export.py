@@ -0,0 +1,83 @@
+"""Export throughput (rows/s) and memory for the streaming catalog export.
+
+Seeds N products (default 2,000,000) in a "bench-export" category, streams them
+through app.core.export.iter_export in every format, and removes them afterwards.
+On PostgreSQL the export uses a server-side cursor, so peak RSS should not grow
+with N:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_export [rows]
+"""
+import resource
+import sys
+import time
+
+from sqlalchemy import delete, insert, select
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth import models as _auth_models  # noqa: F401  (relationship targets)
+from app.cart import models as _cart_models  # noqa: F401
+from app.core.export import iter_export
+from app.products.models import PRODUCT_OUT_COLUMNS, Product
+
+CATEGORY = "bench-export"
+SEED_BATCH = 50_000
+
+
+def seed(rows: int):
+    db = SessionLocal()
+    for start in range(0, rows, SEED_BATCH):
+        db.execute(insert(Product), [
+            {
+                "name": f"bench-export-{n}",
+                "description": f"Generated product number {n}, with a comma",
+                "price": round(1 + n % 997 * 0.37, 2),
+                "stock": n % 50,
+                "category": CATEGORY,
+                "image_url": f"https://cdn.example.com/p/{n}.jpg",
+            }
+            for n in range(start, min(start + SEED_BATCH, rows))
+        ])
+        db.commit()
+    db.close()
+
+
+def cleanup():
+    db = SessionLocal()
+    db.execute(delete(Product).where(Product.category == CATEGORY))
+    db.commit()
+    db.close()
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    seed(rows)
+    print(f"seeded {rows} products in {time.perf_counter() - started:.1f}s, max RSS {max_rss_mb():.0f} MB")
+
+    statement = (
+        select(*PRODUCT_OUT_COLUMNS, Product.updated_at)
+        .where(Product.category == CATEGORY)
+        .order_by(Product.id)
+    )
+    try:
+        for fmt in ("ndjson", "csv"):
+            for compress in (False, True):
+                started = time.perf_counter()
+                size = sum(len(chunk) for chunk in iter_export(statement, fmt, compress, "bench"))
+                elapsed = time.perf_counter() - started
+                label = f"{fmt}{' + gzip' if compress else ''}"
+                print(
+                    f"{label:>13}: {rows / elapsed:10,.0f} rows/s  {size / elapsed / 2**20:6.1f} MB/s  "
+                    f"{size / 2**20:7.1f} MB  max RSS {max_rss_mb():.0f} MB"
+                )
+    finally:
+        cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Checkout throughput on a single hot product: one stock row vs sharded stock counters.
+
+Needs a PostgreSQL DATABASE_URL (SQLite has no row-level locking). The tables are
+created if missing and the benchmark rows are removed afterwards:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_hot_sku [threads] [seconds]
+"""
+import sys
+import threading
+import time
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth.models import User
+from app.cart import models as _cart_models  # noqa: F401  (relationship targets)
+from app.core import models as _core_models  # noqa: F401
+from app.orders.models import Order, OrderItem
+from app.orders.schemas import OrderStatus
+from app.orders.service import lock_products, place_order
+from app.products import inventory
+from app.products.facets import FacetDelta
+from app.products.models import Product, ProductStockShard
+
+# Simulated work between taking the stock and committing (payment call, other items, ...)
+HOLD_SECONDS = 0.01
+
+
+def setup(shards: int):
+    db = SessionLocal()
+    user = User(name="bench", email=f"bench-{time.time_ns()}@example.com", hashed_password="x")
+    product = Product(name=f"bench-hot-{time.time_ns()}", price=1.0, stock=10_000_000, category="bench")
+    db.add_all([user, product])
+    db.flush()
+    if shards:
+        inventory.set_shards(db, product, shards)
+    db.commit()
+    ids = user.id, product.id
+    db.close()
+    return ids
+
+
+def teardown(user_id: int, product_id: int):
+    db = SessionLocal()
+    order_ids = [oid for (oid,) in db.query(Order.id).filter(Order.user_id == user_id)]
+    db.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+    db.query(Order).filter(Order.user_id == user_id).delete(synchronize_session=False)
+    db.query(ProductStockShard).filter(ProductStockShard.product_id == product_id).delete()
+    db.query(Product).filter(Product.id == product_id).delete()
+    db.query(User).filter(User.id == user_id).delete()
+    db.commit()
+    db.close()
+
+
+def worker(user_id: int, product_id: int, deadline: float, counts: list, index: int):
+    db = SessionLocal()
+    while time.monotonic() < deadline:
+        products = lock_products(db, [product_id])
+        place_order(db, user_id, [(product_id, 1)], OrderStatus.pending, products, FacetDelta())
+        time.sleep(HOLD_SECONDS)
+        db.commit()
+        counts[index] += 1
+    db.close()
+
+
+def run(shards: int, threads: int, seconds: float) -> float:
+    user_id, product_id = setup(shards)
+    counts = [0] * threads
+    deadline = time.monotonic() + seconds
+    pool = [
+        threading.Thread(target=worker, args=(user_id, product_id, deadline, counts, n))
+        for n in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    teardown(user_id, product_id)
+    return sum(counts) / seconds
+
+
+def main():
+    # The default engine pool allows 15 connections
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    Base.metadata.create_all(bind=engine)
+    for shards in (0, 4, 16):
+        label = "single row" if not shards else f"{shards} shards"
+        print(f"{label:>11}: {run(shards, threads, seconds):8.1f} orders/s with {threads} threads")
+
+
+if __name__ == "__main__":
+    main()
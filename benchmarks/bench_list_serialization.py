@@ -0,0 +1,80 @@
+"""CPU per request for a 100-row product page: ORM + response_model vs column rows + FastJSONResponse.
+
+Runs against an in-memory SQLite database:
+
+    python -m benchmarks.bench_list_serialization
+"""
+import asyncio
+import os
+import time
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.database import Base, SessionLocal, engine
+from app.core.responses import FastJSONResponse, rows_to_dicts
+from app.auth import models as _auth_models  # noqa: F401  (relationship targets)
+from app.cart import models as _cart_models  # noqa: F401
+from app.orders import models as _order_models  # noqa: F401
+from app.products.models import PRODUCT_OUT_COLUMNS, Product
+from app.products.schemas import ProductOut
+
+ROWS = 100
+ROUNDS = 300
+
+
+def seed(db):
+    db.add_all(
+        Product(
+            name=f"Product {i}",
+            description=f"Description for product {i}",
+            price=10 + i * 0.25,
+            stock=i % 50,
+            category=f"cat-{i % 7}",
+            image_url=f"https://cdn.example.com/img/{i}.png",
+        )
+        for i in range(ROWS)
+    )
+    db.commit()
+
+
+async def orm_path(db, field):
+    products = db.query(Product).limit(ROWS).all()
+    content = await serialize_response(field=field, response_content=products)
+    return JSONResponse(content=content).body
+
+
+async def fast_path(db):
+    products = rows_to_dicts(db.query(*PRODUCT_OUT_COLUMNS).limit(ROWS).all())
+    return FastJSONResponse(content=products).body
+
+
+async def measure(path, db, *args):
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await path(db, *args)
+        db.expire_all()
+    return (time.process_time() - start) / ROUNDS * 1000
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed(db)
+    field = create_model_field(name="Response", type_=List[ProductOut], mode="serialization")
+
+    assert await orm_path(db, field) == await fast_path(db), "outputs differ"
+    db.expire_all()
+
+    orm_ms = await measure(orm_path, db, field)
+    fast_ms = await measure(fast_path, db)
+    print(f"ORM + response_model   : {orm_ms:.3f} ms CPU/request")
+    print(f"rows + FastJSONResponse: {fast_ms:.3f} ms CPU/request ({orm_ms / fast_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""Per-request overhead of rate limiting.
+
+1. Cost of one counter update per store and algorithm (distinct keys, never limited).
+2. End-to-end: a trivial FastAPI route driven in-process over ASGI, without and with
+   an IP-keyed rate_limit dependency (memory store).
+
+    DATABASE_URL=... python -m benchmarks.bench_rate_limit [iterations]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.core.database import Base, engine
+from app.cart import models as _cart_models  # noqa: F401  (relationship targets)
+from app.orders import models as _order_models  # noqa: F401
+from app.products import models as _product_models  # noqa: F401
+from app.core import rate_limit
+from app.core.rate_limit import DatabaseCounterStore, MemoryCounterStore, RateLimitPolicy, sliding_window, token_bucket
+
+
+def bench_store(label, store, algorithm, iterations):
+    started = time.perf_counter()
+    for n in range(iterations):
+        store.hit(f"bench:{n % 1000}", algorithm)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>32}: {elapsed / iterations * 1e6:8.1f} us/hit")
+
+
+async def bench_requests(iterations):
+    policy = RateLimitPolicy("bench", f"{iterations * 10}/second", key="ip")
+    rate_limit.POLICIES[policy.name] = policy
+    rate_limit.store = MemoryCounterStore()
+    app = FastAPI()
+
+    @app.get("/plain")
+    async def plain():
+        return {"ok": True}
+
+    @app.get("/limited", dependencies=[Depends(rate_limit.rate_limit("bench"))])
+    async def limited():
+        return {"ok": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        timings = {}
+        for path in ("/plain", "/limited", "/plain", "/limited"):  # second round after warm-up
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await client.get(path)
+            timings[path] = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{'request without limit':>32}: {timings['/plain']:8.1f} us")
+    print(f"{'request with limit':>32}: {timings['/limited']:8.1f} us "
+          f"(+{timings['/limited'] - timings['/plain']:.1f} us)")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    Base.metadata.create_all(bind=engine)
+    memory = MemoryCounterStore()
+    bench_store("memory sliding_window", memory, sliding_window(10**9, 60), iterations)
+    bench_store("memory token_bucket", memory, token_bucket(10**9, 10**9), iterations)
+    database = DatabaseCounterStore()
+    bench_store(f"{engine.dialect.name} sliding_window", database, sliding_window(10**9, 60), iterations // 20)
+    bench_store(f"{engine.dialect.name} token_bucket", database, token_bucket(10**9, 10**9), iterations // 20)
+    asyncio.run(bench_requests(iterations // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Failed transactions under contention, with and without transactional retry.
+
+Every thread repeatedly decrements the stock of the same few products in one
+REPEATABLE READ transaction. PostgreSQL aborts the losers with serialization
+failures (40001); without retry each abort is a failed checkout. Needs a PostgreSQL DATABASE_URL:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_retry_contention [threads] [transactions]
+"""
+import sys
+import threading
+import time
+
+from sqlalchemy import delete
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth import models as _auth_models  # noqa: F401  (relationship targets)
+from app.cart import models as _cart_models  # noqa: F401
+from app.core import models as _core_models  # noqa: F401
+from app.orders import models as _order_models  # noqa: F401
+from app.core.retry import Retrying, is_retryable, retry_stats
+from app.products.models import Product
+
+PRODUCTS = 3
+
+
+def setup():
+    db = SessionLocal()
+    products = [
+        Product(name=f"bench-retry-{time.time_ns()}-{n}", price=1.0, stock=1_000_000, category="bench")
+        for n in range(PRODUCTS)
+    ]
+    db.add_all(products)
+    db.commit()
+    ids = [product.id for product in products]
+    db.close()
+    return ids
+
+
+def decrement(db, product_ids):
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    for product_id in product_ids:
+        product = db.get(Product, product_id)
+        product.stock -= 1
+        db.flush()
+        time.sleep(0.001)
+    db.commit()
+
+
+def worker(product_ids, transactions, retry, results, index):
+    db = SessionLocal()
+    failed = 0
+    for _ in range(transactions):
+        try:
+            if retry:
+                # Generous budget: the point is to show no transaction is lost
+                for attempt in Retrying(db, "bench", budget_seconds=30, max_attempts=100):
+                    with attempt:
+                        decrement(db, product_ids)
+            else:
+                decrement(db, product_ids)
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            db.rollback()
+            failed += 1
+    results[index] = failed
+    db.close()
+
+
+def run(retry, threads, transactions):
+    product_ids = setup()
+    retry_stats.clear()
+    results = [0] * threads
+    started = time.perf_counter()
+    pool = [
+        threading.Thread(target=worker, args=(product_ids, transactions, retry, results, n))
+        for n in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    stocks = [db.get(Product, product_id).stock for product_id in product_ids]
+    db.execute(delete(Product).where(Product.id.in_(product_ids)))
+    db.commit()
+    db.close()
+
+    total = threads * transactions
+    failed = sum(results)
+    # Every committed transaction took one unit of each product
+    committed = 1_000_000 - stocks[0]
+    label = "with retry" if retry else "no retry"
+    print(
+        f"{label:>10}: {failed}/{total} failed ({failed / total:.1%}), "
+        f"{retry_stats['bench']['retries']} retries, committed {committed}, {elapsed:.2f}s"
+    )
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    transactions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    Base.metadata.create_all(bind=engine)
+    run(False, threads, transactions)
+    run(True, threads, transactions)
+
+
+if __name__ == "__main__":
+    main()
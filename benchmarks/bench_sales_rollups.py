@@ -0,0 +1,96 @@
+"""Admin sales reports: ad-hoc aggregation over orders vs. the sales rollups.
+
+Generates a year of synthetic orders (bulk inserted, no checkout), backfills the rollups with
+rebuild_sales(), then times three reports both ways: revenue per day for 90 days, units per
+product (top 20) and revenue per category over the same range.
+
+    DATABASE_URL=... python -m benchmarks.bench_sales_rollups [orders]
+"""
+import random
+import sys
+import time
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert
+
+from app.core.database import Base, SessionLocal, engine, utcnow
+from app.auth.models import User
+from app.cart import models as _cart_models  # noqa: F401  (relationship targets)
+from app.orders import analytics
+from app.orders.models import Order, OrderItem, OrderStatus, SalesRollup
+from app.products.models import Product
+
+PRODUCTS = 2000
+CATEGORIES = 40
+CHUNK = 10_000
+
+
+def seed(db, orders):
+    user = User(name="bench", email="bench-sales@example.com", hashed_password="x", role="user")
+    db.add(user)
+    db.flush()
+    db.execute(insert(Product), [
+        {"name": f"bench sales {n}", "price": 5.0 + n % 100, "stock": 10**6, "category": f"cat{n % CATEGORIES}"}
+        for n in range(PRODUCTS)
+    ])
+    categories = dict(db.query(Product.id, Product.category).filter(Product.name.like("bench sales %")))
+    product_ids = list(categories)
+    now = utcnow()
+    first_order = (db.query(func.max(Order.id)).scalar() or 0) + 1
+    for start in range(0, orders, CHUNK):
+        ids = range(first_order + start, first_order + min(start + CHUNK, orders))
+        db.execute(insert(Order), [
+            {"id": order_id, "user_id": user.id, "total_amount": 0, "status": OrderStatus.paid,
+             "created_at": now - timedelta(seconds=random.randrange(365 * 86400))}
+            for order_id in ids
+        ])
+        db.execute(insert(OrderItem), [
+            {"order_id": order_id, "product_id": product_id, "quantity": random.randint(1, 3), "price_at_purchase": 9.99,
+             "category": categories[product_id]}
+            for order_id in ids
+            for product_id in random.sample(product_ids, random.randint(1, 4))
+        ])
+    db.commit()
+    return now
+
+
+def timed(label, report, repeat=5):
+    report()  # warm up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = report()
+    print(f"{label:>34}: {(time.perf_counter() - started) / repeat * 1000:9.2f} ms ({len(rows)} rows)")
+
+
+def main():
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.execute(delete(SalesRollup))
+        now = seed(db, orders)
+        started = time.perf_counter()
+        analytics.rebuild_sales(db)
+        db.commit()
+        print(f"backfilled rollups from {orders} orders in {time.perf_counter() - started:.1f} s")
+
+        start = now - timedelta(days=90)
+        revenue = func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+        day = func.date(Order.created_at)
+        in_range = (Order.created_at >= start, Order.status != OrderStatus.cancelled)
+        timed("ad-hoc revenue per day", lambda: db.query(day, revenue).join(OrderItem).filter(*in_range).group_by(day).all())
+        timed("rollup revenue per day", lambda: analytics.sales_series(db, "day", start, None))
+        timed("ad-hoc units per product", lambda: db.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+              .join(Order).filter(*in_range).group_by(OrderItem.product_id)
+              .order_by(func.sum(OrderItem.quantity).desc()).limit(20).all())
+        timed("rollup units per product", lambda: analytics.sales_by(db, "product", "day", start, None, "units", 20))
+        timed("ad-hoc revenue per category", lambda: db.query(func.lower(Product.category), revenue)
+              .select_from(Order).join(OrderItem).join(Product).filter(*in_range)
+              .group_by(func.lower(Product.category)).all())
+        timed("rollup revenue per category", lambda: analytics.sales_by(db, "category", "day", start, None))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
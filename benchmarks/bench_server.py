@@ -0,0 +1,162 @@
+"""Throughput and latency of `python -m app` under different runtime settings.
+
+Starts the launcher once per configuration (worker count, event loop, HTTP parser), drives it
+with keep-alive HTTP/1.1 connections from a few load generator processes for a fixed time, and
+reports requests per second with p50 / p99 latency for `GET /` (framework overhead only) and
+`GET /products` (token check, database read and JSON encoding). Configurations whose loop or
+parser is not installed are skipped. The load generators share the machine: compare rows,
+not absolutes.
+
+    DATABASE_URL=... SMTP_PORT=465 python -m benchmarks.bench_server [seconds] [connections]
+"""
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth.models import Roles, User
+from app.auth.utils import create_tokens
+from app.cart import models as _cart_models  # noqa: F401  (relationship targets)
+from app.core import models as _core_models  # noqa: F401
+from app.orders import models as _order_models  # noqa: F401
+from app.products import models as _product_models  # noqa: F401
+
+PORT = 8799
+LOADERS = max(1, min(4, os.cpu_count() or 1))
+PATHS = ("/", "/products?page_size=20")
+EMAIL = "bench-server@example.com"
+
+CONFIGS = [
+    ("1 worker, asyncio + h11", {"WEB_WORKERS": "1", "WEB_LOOP": "asyncio", "WEB_HTTP": "h11"}),
+    ("1 worker, uvloop + httptools", {"WEB_WORKERS": "1", "WEB_LOOP": "uvloop", "WEB_HTTP": "httptools"}),
+    ("per-CPU workers, asyncio + h11", {"WEB_WORKERS": "0", "WEB_LOOP": "asyncio", "WEB_HTTP": "h11"}),
+    ("per-CPU workers, auto", {"WEB_WORKERS": "0", "WEB_LOOP": "auto", "WEB_HTTP": "auto"}),
+    ("per-CPU workers, auto, recycle 5000", {"WEB_WORKERS": "0", "WEB_MAX_REQUESTS": "5000", "WEB_MAX_REQUESTS_JITTER": "500"}),
+]
+
+
+def _bearer() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == EMAIL).first()
+        if user is None:
+            user = User(name="bench", email=EMAIL, hashed_password="x", role=Roles.user.value)
+            db.add(user)
+            db.commit()
+        return create_tokens(user.email, user.hashed_password, Roles.user)["access_token"]
+    finally:
+        db.close()
+
+
+async def _connection(path: str, token: str, deadline: float, latencies: list, errors: list) -> None:
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n\r\n".encode()
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+            started = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = next(
+                (int(line.split(b":")[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:")), 0
+            )
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if b"connection: close" in head.lower():
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError):
+            # A recycled worker closes its idle connections: reconnect
+            errors.append(1)
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+def _load(path: str, token: str, connections: int, seconds: float, results) -> None:
+    latencies, errors = [], []
+
+    async def run():
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(_connection(path, token, deadline, latencies, errors) for _ in range(connections)))
+
+    asyncio.run(run())
+    results.put((latencies, len(errors)))
+
+
+def _wait_ready(timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", PORT), timeout=1) as sock:
+                sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if sock.recv(12).endswith(b"200"):
+                    return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def measure(path: str, token: str, seconds: float, connections: int):
+    results = multiprocessing.Queue()
+    per_loader = max(1, connections // LOADERS)
+    loaders = [multiprocessing.Process(target=_load, args=(path, token, per_loader, seconds, results)) for _ in range(LOADERS)]
+    for loader in loaders:
+        loader.start()
+    latencies, errors = [], 0
+    for _ in loaders:
+        loader_latencies, loader_errors = results.get()
+        latencies += loader_latencies
+        errors += loader_errors
+    for loader in loaders:
+        loader.join()
+    latencies.sort()
+    if not latencies:
+        return 0, 0, 0, errors
+    return (
+        len(latencies) / seconds,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+        errors,
+    )
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    token = _bearer()
+    print(f"{LOADERS} load generator(s), {connections} keep-alive connections, {seconds:.0f} s per run")
+    for label, settings in CONFIGS:
+        missing = [name for name in (settings.get("WEB_LOOP"), settings.get("WEB_HTTP"))
+                   if name in ("uvloop", "httptools") and importlib.util.find_spec(name) is None]
+        if missing:
+            print(f"{label:>38}: skipped, {' and '.join(missing)} not installed")
+            continue
+        env = {
+            **os.environ, **settings, "WEB_PORT": str(PORT), "SCHEDULER_ENABLED": "false",
+            "AUTOCOMPLETE_ENABLED": "false", "RATE_LIMIT_ENABLED": "false",
+        }
+        server = subprocess.Popen([sys.executable, "-m", "app"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not _wait_ready():
+                print(f"{label:>38}: server did not start")
+                continue
+            for path in PATHS:
+                measure(path, token, 1, connections)  # warm up
+                rate, p50, p99, errors = measure(path, token, seconds, connections)
+                print(f"{label:>38} {path:<20} {rate:9.0f} req/s  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  reconnects {errors}")
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""A burst of identical catalog reads: one query per request vs. single flight.
+
+Seeds products, then fires BURST concurrent reads of the same category page, several times.
+"per request" runs load_products once per read in worker threads (what get_products did before
+the coalescing layer); "single flight" goes through a SingleFlightCache with no fresh or stale
+window, so every burst still reaches the database, once. Reports queries per burst and wall time.
+
+    DATABASE_URL=... python -m benchmarks.bench_single_flight [burst]
+"""
+import asyncio
+import sys
+import time
+from functools import partial
+
+from sqlalchemy import event
+
+from app.core.database import Base, SessionLocal, engine
+from app.core.single_flight import SingleFlightCache
+from app.auth import models as _auth_models  # noqa: F401  (relationship targets)
+from app.cart import models as _cart_models  # noqa: F401
+from app.orders import models as _order_models  # noqa: F401
+from app.products.models import Product
+from app.products.public_routes import load_products
+
+PRODUCTS = 20000
+ROUNDS = 5
+LOAD = partial(load_products, "bench-hot", None, None, "price", 1, 100)
+
+queries = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global queries
+    queries += 1
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if db.query(Product.id).filter(Product.category == "bench-hot").first() is None:
+            db.add_all(
+                Product(
+                    name=f"Bench product {i}",
+                    description=f"Description {i}",
+                    price=1 + (i * 37) % 1000,
+                    stock=i % 100,
+                    category="bench-hot" if i % 4 == 0 else f"bench-{i % 20}",
+                    image_url=f"https://cdn.example.com/bench/{i}.png",
+                )
+                for i in range(PRODUCTS)
+            )
+            db.commit()
+    finally:
+        db.close()
+
+
+async def per_request(burst: int):
+    await asyncio.gather(*(asyncio.to_thread(LOAD) for _ in range(burst)))
+
+
+async def single_flight(cache: SingleFlightCache, burst: int):
+    await asyncio.gather(*(cache.get("hot", LOAD) for _ in range(burst)))
+
+
+async def measure(label: str, run, burst: int):
+    global queries
+    queries = 0
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        await run(burst)
+    elapsed = (time.perf_counter() - started) / ROUNDS
+    print(f"{label:>14}: {queries / ROUNDS:6.0f} queries per burst, {elapsed * 1000:8.1f} ms per burst")
+
+
+async def main():
+    burst = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seed()
+    LOAD()  # warm the connection pool and the compiled cache
+    print(f"{burst} concurrent reads of the same page, {ROUNDS} bursts")
+    await measure("per request", per_request, burst)
+    cache = SingleFlightCache("bench", 0, 0, 0, 10)
+    await measure("single flight", partial(single_flight, cache), burst)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
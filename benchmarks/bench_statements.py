@@ -0,0 +1,66 @@
+"""CPU spent building queries: ORM Query per call vs. the prebuilt statements.
+
+Runs the three hot lookups of an add-to-cart request (get_current_user's user by email,
+product by id, the cart (user_id, product_id) row) both ways against the same rows,
+then prints the compiled cache hit rate seen by the engine.
+
+    DATABASE_URL=... python -m benchmarks.bench_statements [iterations]
+"""
+import sys
+import time
+
+from app.core.database import Base, SessionLocal, engine
+from app.auth.models import User
+from app.cart.models import Cart
+from app.orders import models as _order_models  # noqa: F401  (relationship targets)
+from app.products.models import Product
+from app.core import statements
+
+
+def query_lookups(db, email, user_id, product_id):
+    db.query(User).filter(User.email == email).first()
+    db.query(Product).filter(Product.id == product_id).first()
+    db.query(Cart).filter(Cart.user_id == user_id, Cart.product_id == product_id).first()
+
+
+def prebuilt_lookups(db, email, user_id, product_id):
+    statements.user_by_email(db, email)
+    statements.product_by_id(db, product_id)
+    statements.cart_item(db, user_id, product_id)
+
+
+def run(label, lookups, db, iterations, fixture):
+    lookups(db, *fixture)  # warm the compiled cache
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(iterations):
+        lookups(db, *fixture)
+        db.expire_all()  # identity map hits would skip the work being measured
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print(f"{label:>10}: {cpu / iterations * 1e6:8.1f} us CPU, {wall / iterations * 1e6:8.1f} us wall per request")
+    return cpu / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(name="bench", email="bench-statements@example.com", hashed_password="x", role="user")
+        product = Product(name="bench statements", price=1.0, stock=10, category="bench")
+        db.add_all([user, product])
+        db.flush()
+        db.add(Cart(user_id=user.id, product_id=product.id, quantity=1))
+        db.flush()
+        fixture = (user.email, user.id, product.id)
+
+        orm = run("ORM query", query_lookups, db, iterations, fixture)
+        prebuilt = run("prebuilt", prebuilt_lookups, db, iterations, fixture)
+        print(f"{'saved':>10}: {(orm - prebuilt) * 1e6:8.1f} us CPU per request ({(1 - prebuilt / orm) * 100:.0f}%)")
+        print(f"compiled cache: {statements.cache_report()}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
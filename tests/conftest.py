@@ -0,0 +1,116 @@
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+
+# The app reads its settings at import time: a throwaway SQLite database unless
+# TEST_DATABASE_URL points somewhere else, and no background jobs or rate limits
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("SMTP_PORT", "465")
+os.environ["SCHEDULER_ENABLED"] = "false"
+os.environ["AUTOCOMPLETE_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth.models import Roles, User
+from app.auth.utils import create_tokens
+from app.core import scheduler
+from app.core.database import SessionLocal
+from app.products.models import CategoryFacet, CategoryPriceBucket, ProductPair
+
+_emails = itertools.count()
+
+
+def make_user(role: str) -> dict:
+    # Authorization headers of a new user; the password is never used
+    db = SessionLocal()
+    try:
+        user = User(name=role, email=f"{role}{next(_emails)}@example.com", hashed_password="x", role=role)
+        db.add(user)
+        db.commit()
+        return {"Authorization": f"Bearer {create_tokens(user.email, user.hashed_password, Roles(role))['access_token']}"}
+    finally:
+        db.close()
+
+
+def run_job(name: str) -> int:
+    # One run of a scheduled job in this process, whatever its schedule
+    db = SessionLocal()
+    try:
+        return scheduler.jobs[name].run(db, scheduler.JobRun(db, name, asyncio.Event()))
+    finally:
+        db.close()
+
+
+def create_product(client, admin, name, price, stock, category) -> int:
+    response = client.post("/admin/products", headers=admin, json={
+        "name": name, "price": price, "stock": stock, "category": category,
+        "image_url": "https://cdn.example.com/products/test.png",
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def checkout(client, user, lines, status="pending") -> int:
+    # Fills the user's cart with {product_id: quantity} and places the order
+    for product_id, quantity in lines.items():
+        assert client.post("/cart", headers=user, json={"product_id": product_id, "quantity": quantity}).status_code == 200
+    response = client.post("/checkout", headers=user, json={"status": status})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def set_status(client, admin, order_ids, status):
+    response = client.post("/admin/orders/status", headers=admin, json={"order_ids": order_ids, "status": status})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def facet_counts(db):
+    # Rows counted down to zero are left in place; a rebuild does not create them
+    db.expire_all()
+    categories = {(row.category, row.product_count, row.in_stock_count) for row in db.query(CategoryFacet)
+                  if row.product_count or row.in_stock_count}
+    buckets = {(row.category, row.bucket, row.product_count) for row in db.query(CategoryPriceBucket) if row.product_count}
+    return categories, buckets
+
+
+def pair_counts(db):
+    db.expire_all()
+    return {(row.product_id, row.related_id, row.orders) for row in db.query(ProductPair) if row.orders}
+
+
+def sales_reports(client, admin):
+    def nonzero(rows):
+        return sorted((tuple(sorted(row.items())) for row in rows if row["orders"] or row["units"]))
+    return [
+        nonzero(client.get(path, headers=admin).json())
+        for path in ("/admin/analytics/sales?grain=hour", "/admin/analytics/categories", "/admin/analytics/products")
+    ]
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin():
+    return make_user("admin")
+
+
+@pytest.fixture
+def user():
+    return make_user("user")
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
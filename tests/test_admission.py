@@ -0,0 +1,59 @@
+# Admission control: a full group sheds load with 503 and Retry-After, queued requests are served in order
+import asyncio
+
+import pytest
+
+from app.middlewares import admission
+from app.middlewares.admission import GroupLimiter
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    # One slot and no queue, so a single request in flight fills the group
+    limiter = GroupLimiter("catalog", 1, 0)
+    monkeypatch.setitem(admission.limiters, "catalog", limiter)
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    return limiter
+
+
+def test_full_group_answers_503_with_retry_after(client, user, catalog):
+    catalog.in_flight = 1
+    response = client.get("/products", headers=user)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert catalog.stats()["rejected"] == 1
+
+    # Other groups are unaffected, and the slot admits again once released
+    assert client.get("/cart", headers=user).status_code != 503
+    catalog.release()
+    assert client.get("/products", headers=user).status_code == 200
+    assert (catalog.in_flight, catalog.admitted) == (0, 1)
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    async def scenario():
+        limiter = GroupLimiter("test", 1, 2)
+        assert await limiter.acquire(1)
+        first = asyncio.create_task(limiter.acquire(1))
+        second = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        assert not await limiter.acquire(1)  # queue full
+
+        limiter.release()
+        assert await first and not second.done()
+        limiter.release()
+        assert await second
+        limiter.release()
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["admitted"], stats["rejected"]) == (0, 3, 1)
+
+
+def test_requests_that_cannot_finish_in_time_are_not_queued():
+    async def scenario():
+        limiter = GroupLimiter("test", 1, 8)
+        await limiter.acquire(1)
+        return await limiter.acquire(0)
+
+    assert asyncio.run(scenario()) is False
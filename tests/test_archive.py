@@ -0,0 +1,37 @@
+# Closed orders moved to cold storage keep their history, detail and aggregates
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from app.core.database import utcnow
+from app.orders.models import ArchivedOrder, Order
+
+from conftest import checkout, create_product, pair_counts, sales_reports, set_status
+
+
+def test_archived_orders_keep_their_detail_and_history(client, admin, user, db):
+    pen = create_product(client, admin, "Pen", 2.5, 50, "Office")
+    paid = checkout(client, user, {pen: 2})
+    pending = checkout(client, user, {pen: 1})
+    set_status(client, admin, [paid], "paid")
+    db.execute(update(Order).where(Order.id.in_([paid, pending])).values(created_at=utcnow() - timedelta(days=3)))
+    db.commit()
+    # Back-dated under the rollups: put them in line with the orders again
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+
+    history = client.get("/orders", headers=user).json()
+    detail = client.get(f"/orders/{paid}", headers=user).json()
+    pairs, reports = pair_counts(db), sales_reports(client, admin)
+    assert client.post("/admin/orders/archive?older_than_days=1", headers=admin).status_code == 200
+
+    db.expire_all()
+    assert db.get(Order, paid) is None and db.query(ArchivedOrder).filter(ArchivedOrder.id == paid).count() == 1
+    assert db.get(Order, pending) is not None  # not closed, stays in the hot table
+    assert client.get("/orders", headers=user).json() == history
+    assert client.get(f"/orders/{paid}", headers=user).json() == detail
+
+    # The rebuilds read cold storage too
+    assert client.post("/admin/products/related/rebuild", headers=admin).status_code == 200
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+    assert pair_counts(db) == pairs
+    assert sales_reports(client, admin) == reports
@@ -0,0 +1,52 @@
+# Autocomplete: prefix ranges of the packed index, precomputed heavy prefixes, the change overlay
+from heapq import nlargest
+
+from app.products import autocomplete as autocomplete_module
+from app.products.autocomplete import Autocomplete, PrefixIndex, normalize
+
+from conftest import create_product
+
+NAMES = ["Tea cup", "Tea pot", "Teal mug", "Team shirt", "Tee", "Té vert", "Table", "tea  Cosy", "Zebra"]
+
+
+def brute_force(entries, prefix, limit):
+    matches = [entry for entry in sorted(entries) if entry[0].startswith(prefix)]
+    return [name for _, name, _, _ in nlargest(limit, matches, key=lambda entry: entry[3])]
+
+
+def test_index_ranks_like_a_scan_with_and_without_precomputed_prefixes(monkeypatch):
+    entries = [(normalize(name), name, number, (number * 7) % 5) for number, name in enumerate(NAMES, 1)]
+    for heavy_rows in (1000, 2):
+        monkeypatch.setattr(autocomplete_module, "HEAVY_PREFIX_ROWS", heavy_rows)
+        index = PrefixIndex(entries)
+        assert (b"" in index.top) == (heavy_rows == 2)
+        for prefix in ("", "t", "te", "tea", "team", "té", "tea cosy", "x"):
+            found = [index.name(i) for i in index.candidates(prefix.encode(), 3)][:3]
+            assert found == brute_force(entries, prefix, 3), prefix
+
+
+def test_changes_since_the_build_take_precedence():
+    suggestions = Autocomplete()
+    suggestions.swap(PrefixIndex([("lamp", "Lamp", 1, 9), ("lantern", "Lantern", 2, 5), ("ladder", "Ladder", 3, 1)]),
+                     {"lighting": ["Lighting", 14]}, started=0)
+    suggestions.apply({"id": 2, "name": "Torch", "category": "Lighting"})
+    suggestions.apply({"id": 3, "deleted": True})
+    suggestions.apply({"id": 4, "name": "Lantern XL", "category": "Lamps"})
+
+    assert suggestions.suggest(" LA ", 10) == {
+        "products": [{"id": 1, "name": "Lamp"}, {"id": 4, "name": "Lantern XL"}],
+        "categories": ["Lamps"],
+    }
+    assert suggestions.suggest("l", 10)["categories"] == ["Lighting", "Lamps"]
+    assert suggestions.suggest("to", 10)["products"] == [{"id": 2, "name": "Torch"}]
+
+
+def test_route_falls_back_to_sql_before_the_first_build(client, admin, user, monkeypatch):
+    monkeypatch.setattr(autocomplete_module.autocomplete, "ready", False)
+    create_product(client, admin, "Suggest 100% wool", 20.0, 1, "Suggest")
+    create_product(client, admin, "Suggest 100 pegs", 2.0, 1, "Suggest")
+
+    response = client.get("/products/autocomplete", params={"q": "suggest 100%"}, headers=user)
+    assert response.status_code == 200
+    assert [product["name"] for product in response.json()["products"]] == ["Suggest 100% wool"]
+    assert response.json()["categories"] == []
@@ -0,0 +1,87 @@
+# Batch stock and price updates: relative stock deltas, sharded stock, failures per item
+from sqlalchemy import func
+
+from app.products import batch as batch_module
+from app.products.models import Product, ProductStockShard
+
+from conftest import create_product, run_job
+
+
+def batch(client, admin, *items, **headers):
+    response = client.post("/admin/products/batch", headers={**admin, **headers}, json={"items": list(items)})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def shard_sum(db, product_id):
+    db.expire_all()
+    return db.query(func.sum(ProductStockShard.quantity)).filter(ProductStockShard.product_id == product_id).scalar()
+
+
+def test_batch_applies_deltas_and_reports_each_item(client, admin, db):
+    cup = create_product(client, admin, "Batch cup", 5.0, 10, "Batch")
+    plate = create_product(client, admin, "Batch plate", 7.0, 1, "Batch")
+
+    out = batch(
+        client, admin,
+        {"id": cup, "stock_delta": -3, "price": 6.0},
+        {"id": plate, "stock_delta": -2},
+        {"id": cup, "stock_delta": -1},
+        {"id": 10**9, "stock_delta": 1},
+    )
+    assert [result["status"] for result in out["results"]] == ["updated", "insufficient_stock", "duplicate", "not_found"]
+    assert out["results"][0] == {"id": cup, "status": "updated", "stock": 7, "price": 6.0}
+    assert (out["updated"], out["failed"]) == (1, 3)
+
+    db.expire_all()
+    assert (db.get(Product, cup).stock, db.get(Product, cup).price) == (7, 6.0)
+    assert db.get(Product, plate).stock == 1
+
+
+def test_sharded_stock_is_checked_against_the_shards(client, admin, db):
+    hot = create_product(client, admin, "Batch kettle", 20.0, 2, "Batch")
+    assert client.put(f"/admin/products/{hot}/shards", headers=admin, json={"shards": 2}).status_code == 200
+
+    # The shards hold 7 while products.stock still caches 2
+    assert batch(client, admin, {"id": hot, "stock_delta": 5})["results"][0]["stock"] == 7
+    db.expire_all()
+    assert (shard_sum(db, hot), db.get(Product, hot).stock) == (7, 2)
+
+    assert batch(client, admin, {"id": hot, "stock_delta": -4})["results"][0] == {
+        "id": hot, "status": "updated", "stock": 3, "price": 20.0,
+    }
+    assert batch(client, admin, {"id": hot, "stock_delta": -4})["results"][0] == {
+        "id": hot, "status": "insufficient_stock", "stock": 3, "price": None,
+    }
+    assert shard_sum(db, hot) == 3
+
+    # The delta was not added to the cached stock as well: the sync caches the shard sum
+    run_job("sync_stock_shards")
+    db.expire_all()
+    assert db.get(Product, hot).stock == shard_sum(db, hot) == 3
+
+
+def test_a_failed_batch_applies_nothing_and_its_key_applies_once(client, admin, db, monkeypatch):
+    first = create_product(client, admin, "Batch fork", 3.0, 10, "Batch")
+    second = create_product(client, admin, "Batch knife", 4.0, 10, "Batch")
+    items = [{"id": first, "stock_delta": -1}, {"id": second, "stock_delta": -1}]
+    key = {"Idempotency-Key": f"batch-{first}"}
+
+    # One product per chunk, and the second chunk fails
+    apply_chunk = batch_module._apply_chunk
+    def failing_chunk(db, chunk):
+        if chunk[0].id == second:
+            raise RuntimeError("chunk failed")
+        return apply_chunk(db, chunk)
+    monkeypatch.setattr(batch_module.apply_batch, "__defaults__", (1,))
+    monkeypatch.setattr(batch_module, "_apply_chunk", failing_chunk)
+    assert client.post("/admin/products/batch", headers={**admin, **key}, json={"items": items}).status_code == 500
+    db.expire_all()
+    assert (db.get(Product, first).stock, db.get(Product, second).stock) == (10, 10)
+
+    monkeypatch.setattr(batch_module, "_apply_chunk", apply_chunk)
+    applied = client.post("/admin/products/batch", headers={**admin, **key}, json={"items": items})
+    replayed = client.post("/admin/products/batch", headers={**admin, **key}, json={"items": items})
+    assert replayed.headers["Idempotent-Replayed"] == "true" and replayed.json() == applied.json()
+    db.expire_all()
+    assert (db.get(Product, first).stock, db.get(Product, second).stock) == (9, 9)
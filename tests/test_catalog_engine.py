@@ -0,0 +1,79 @@
+# Columnar catalog: in-place changes keep the sort orders, and pages match the SQL path of GET /products
+import random
+
+from app.products import public_routes
+from app.products.catalog_engine import SORT_KEYS, CatalogEngine, ColumnarCatalog
+from app.products.public_routes import catalog_reads
+
+from conftest import create_product
+
+
+def reference(products, category, min_price, max_price, sort_by, offset, limit):
+    rows = [
+        (product_id, *values) for product_id, values in products.items()
+        if (not category or values[3].lower() == category.lower())
+        and (not min_price or values[1] >= min_price) and (not max_price or values[1] <= max_price)
+    ]
+    column = {"name": 1, "price": 2, "stock": 3}[sort_by]
+    rows.sort(key=lambda row: (row[column].encode() if sort_by == "name" else row[column], row[0]))
+    return [row[0] for row in rows[offset:offset + limit]]
+
+
+def test_searches_match_a_scan_after_random_changes():
+    rng = random.Random(7)
+    categories = ["Tea", "tea", "Coffee", "Café"]
+
+    def values():
+        return (f"item {rng.randint(0, 30)} é", float(rng.randint(1, 20)), rng.randint(0, 5), rng.choice(categories))
+
+    products = {product_id: values() for product_id in range(1, 60, 2)}
+    catalog = ColumnarCatalog([(product_id, *row) for product_id, row in sorted(products.items())])
+    next_id = 61
+    for _ in range(300):
+        product_id = rng.choice(list(products)) if products else None
+        action = rng.random()
+        if action < 0.4 and product_id:
+            name, _, _, category = products[product_id]
+            products[product_id] = (name, float(rng.randint(1, 20)), rng.randint(0, 5), category)
+            catalog.update_stock_price(product_id, products[product_id][2], products[product_id][1])
+        elif action < 0.6 and product_id:
+            del products[product_id]
+            catalog.remove(product_id)
+        elif action < 0.8 and product_id:
+            products[product_id] = values()
+            assert catalog.upsert(product_id, *products[product_id])
+        else:
+            products[next_id] = values()
+            assert catalog.upsert(next_id, *products[next_id])
+            next_id += rng.randint(1, 3)
+
+        category = rng.choice([None, *categories, "Unknown"])
+        min_price, max_price = rng.choice([None, 5.0]), rng.choice([None, 12.0])
+        for sort_by in SORT_KEYS:
+            query = (category, min_price, max_price, sort_by, rng.randint(0, 5), rng.randint(1, 10))
+            assert catalog.search(*query) == reference(products, *query), query
+
+    assert len(catalog) == len(products)
+    # A new id below the highest slot cannot be placed: the engine rebuilds instead
+    assert not catalog.upsert(0, "Too old", 1.0, 1, "Tea")
+
+
+def test_route_pages_match_the_sql_path(client, admin, user, monkeypatch):
+    monkeypatch.setattr(catalog_reads, "fresh", 0)
+    monkeypatch.setattr(catalog_reads, "stale", 0)
+    for number in range(9):
+        create_product(client, admin, f"Engine item {number}", 3.0 + number, (number * 5) % 9, "Engine")
+
+    queries = [
+        "category=engine&sort_by=price&page_size=4&page=2",
+        "category=engine&sort_by=stock&min_price=4&max_price=9",
+        "category=engine&sort_by=name&page_size=5",
+        "category=nothing",
+    ]
+    by_sql = [client.get(f"/products?{query}", headers=user).json() for query in queries]
+
+    engine = CatalogEngine()
+    engine.catalog, engine.ready = CatalogEngine.read_catalog(), True
+    monkeypatch.setattr(public_routes, "catalog_engine", engine)
+    assert [client.get(f"/products?{query}", headers=user).json() for query in queries] == by_sql
+    assert by_sql[0] and by_sql[1] and by_sql[3] == []
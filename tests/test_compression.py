@@ -0,0 +1,73 @@
+# Response compression: negotiation, the middleware for plain and streamed bodies, pre-compressed catalog pages
+import gzip
+
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.core.compression import catalog_cache, negotiate_encoding
+from app.middlewares.compression import CompressionMiddleware
+from app.products.public_routes import catalog_reads
+
+from conftest import create_product
+
+TEXT = "compressible line\n" * 200
+
+
+def echo_app():
+    def chunks():
+        yield TEXT[:1000]
+        yield TEXT[1000:]
+
+    routes = [
+        Route("/plain", lambda request: PlainTextResponse(TEXT)),
+        Route("/small", lambda request: PlainTextResponse("tiny")),
+        Route("/stream", lambda request: StreamingResponse(chunks(), media_type="text/plain")),
+        Route("/events", lambda request: StreamingResponse(chunks(), media_type="text/event-stream")),
+    ]
+    app = Starlette(routes=routes)
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+def test_negotiation_picks_an_accepted_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("*;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip;q=0, *") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding(None) is None
+
+
+def test_middleware_compresses_whole_and_streamed_bodies():
+    client = echo_app()
+    gzip_only = {"Accept-Encoding": "gzip"}
+    for path in ("/plain", "/stream"):
+        response = client.get(path, headers=gzip_only)
+        assert (response.headers["Content-Encoding"], response.headers["Vary"]) == ("gzip", "Accept-Encoding")
+        assert response.text == TEXT
+
+    assert "Content-Encoding" not in client.get("/small", headers=gzip_only).headers
+    assert "Content-Encoding" not in client.get("/events", headers=gzip_only).headers
+    assert "Content-Encoding" not in client.get("/plain", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_catalog_page_is_compressed_once_per_etag(client, admin, user, monkeypatch):
+    monkeypatch.setattr(catalog_reads, "fresh", 0)
+    monkeypatch.setattr(catalog_reads, "stale", 0)
+    for number in range(12):
+        create_product(client, admin, f"Compressed teapot {number}", 10.0 + number, 5, "Compressed")
+    url = "/products?category=compressed&page_size=12"
+
+    plain = client.get(url, headers={**user, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers and len(plain.content) > 1024
+
+    hits = catalog_cache.hits
+    first = client.get(url, headers={**user, "Accept-Encoding": "gzip"})
+    second = client.get(url, headers={**user, "Accept-Encoding": "gzip"})
+    assert catalog_cache.hits == hits + 1
+    for response in (first, second):
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["ETag"] == plain.headers["ETag"]
+        assert response.content == plain.content
+    assert gzip.decompress(catalog_cache.entries[(plain.headers["ETag"], "gzip")]) == plain.content
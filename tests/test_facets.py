@@ -0,0 +1,20 @@
+# Category facets and the price histogram, kept up to date by product writes and checkouts
+from conftest import checkout, create_product, facet_counts
+
+
+def test_product_writes_and_checkouts_match_the_rebuild(client, admin, user, db):
+    desk = create_product(client, admin, "Facet desk", 120.0, 1, "Facet Office")
+    chair = create_product(client, admin, "Facet chair", 60.0, 5, "Facet Office")
+    lamp = create_product(client, admin, "Facet lamp", 15.0, 2, "Facet Lighting")
+
+    checkout(client, user, {desk: 1})
+    assert client.put(f"/admin/products/{lamp}", headers=admin, json={"category": "Facet Office", "price": 30.0}).status_code == 200
+    assert client.delete(f"/admin/products/{chair}", headers=admin).status_code == 200
+
+    office = client.get("/products/facets?category=facet office", headers=user).json()
+    assert office["categories"] == [{"category": "facet office", "product_count": 2, "in_stock_count": 1}]
+    assert sum(bucket["product_count"] for bucket in office["price_buckets"]) == 2
+
+    facets = facet_counts(db)
+    assert client.post("/admin/products/facets/rebuild", headers=admin).status_code == 200
+    assert facet_counts(db) == facets
@@ -0,0 +1,43 @@
+# Conditional catalog requests: ETag and Cache-Control on every read, 304 while the rows are unchanged
+from app.products.public_routes import catalog_reads
+
+from conftest import create_product
+
+
+def test_product_detail_revalidates_by_etag_and_date(client, admin, user):
+    product = create_product(client, admin, "Cached lamp", 30.0, 4, "Cached")
+    first = client.get(f"/products/{product}", headers=user)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    # Weak comparison, so the strong form of the tag matches too
+    for header in ({"If-None-Match": etag}, {"If-None-Match": etag.removeprefix("W/")},
+                   {"If-Modified-Since": first.headers["Last-Modified"]}):
+        response = client.get(f"/products/{product}", headers={**user, **header})
+        assert (response.status_code, response.content, response.headers["ETag"]) == (304, b"", etag)
+
+    assert client.put(f"/admin/products/{product}", headers=admin, json={"price": 31.0}).status_code == 200
+    changed = client.get(f"/products/{product}", headers={**user, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["price"] == 31.0 and changed.headers["ETag"] != etag
+
+
+def test_product_list_revalidates_by_etag_only(client, admin, user, monkeypatch):
+    # Every read goes to the database, so the tag follows the rows at once
+    monkeypatch.setattr(catalog_reads, "fresh", 0)
+    monkeypatch.setattr(catalog_reads, "stale", 0)
+    create_product(client, admin, "Cached shade", 8.0, 4, "Cachedlist")
+    url = "/products?category=cachedlist"
+    first = client.get(url, headers=user)
+    etag = first.headers["ETag"]
+    assert [row["name"] for row in first.json()] == ["Cached shade"]
+    assert "Last-Modified" not in first.headers
+
+    assert client.get(url, headers={**user, "If-None-Match": f'"other", {etag}'}).status_code == 304
+    assert client.get(url, headers={**user, "If-None-Match": '"other"'}).status_code == 200
+
+    # A second product on the page changes the tag
+    create_product(client, admin, "Cached stand", 9.0, 4, "Cachedlist")
+    response = client.get(url, headers={**user, "If-None-Match": etag})
+    assert response.status_code == 200 and len(response.json()) == 2
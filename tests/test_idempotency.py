@@ -0,0 +1,69 @@
+# Idempotency-Key on add-to-cart and checkout: a repeated request gets the stored response
+import hashlib
+import json
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from app.core import idempotency
+from app.core.database import utcnow
+from app.core.models import IdempotencyKey
+from app.orders.models import Order
+
+from conftest import create_product, run_job
+
+
+def add(client, user, key, product_id, quantity):
+    return client.post("/cart", headers={**user, "Idempotency-Key": key}, json={"product_id": product_id, "quantity": quantity})
+
+
+def test_a_repeated_request_is_replayed_not_applied_again(client, admin, user, db):
+    product_id = create_product(client, admin, "Idempotent mug", 9.0, 10, "Idempotency")
+
+    first = add(client, user, "add-1", product_id, 2)
+    user_id = first.json()["user_id"]
+    again = add(client, user, "add-1", product_id, 2)
+    assert first.status_code == again.status_code == 200
+    assert again.headers["Idempotent-Replayed"] == "true" and again.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert first.json()["quantity"] == 2
+
+    checkout = {**user, "Idempotency-Key": "checkout-1"}
+    order = client.post("/checkout", headers=checkout, json={"status": "pending"})
+    replayed = client.post("/checkout", headers=checkout, json={"status": "pending"})
+    assert order.status_code == replayed.status_code == 200
+    assert replayed.json() == order.json()
+    assert db.query(Order).filter(Order.user_id == user_id).count() == 1
+
+
+def test_a_key_reused_with_another_body_or_still_in_flight_is_refused(client, admin, user, db, monkeypatch):
+    product_id = create_product(client, admin, "Idempotent bowl", 6.0, 10, "Idempotency")
+    user_id = add(client, user, "bowl", product_id, 1).json()["user_id"]
+
+    assert add(client, user, "bowl", product_id, 3).status_code == 422
+
+    # The first request with this key has not finished yet: the same request waits, then gets a 409
+    body = json.dumps({"product_id": product_id, "quantity": 1}).encode()
+    db.add(IdempotencyKey(
+        user_id=user_id, scope="cart.add", key="in-flight", request_hash=hashlib.sha256(b"/cart\n" + body).hexdigest(),
+        locked_until=utcnow() + timedelta(minutes=1), expires_at=utcnow() + timedelta(hours=1),
+    ))
+    db.commit()
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.2)
+    busy = client.post("/cart", headers={**user, "Idempotency-Key": "in-flight", "Content-Type": "application/json"}, content=body)
+    assert busy.status_code == 409 and busy.headers["Retry-After"] == "1"
+
+
+def test_expired_keys_are_purged_and_can_be_used_again(client, admin, user, db):
+    product_id = create_product(client, admin, "Idempotent plate", 4.0, 10, "Idempotency")
+    user_id = add(client, user, "plate", product_id, 1).json()["user_id"]
+
+    db.execute(update(IdempotencyKey).where(IdempotencyKey.user_id == user_id).values(expires_at=utcnow() - timedelta(seconds=1)))
+    db.commit()
+    assert run_job("purge_idempotency_keys") >= 1
+    db.expire_all()
+    assert db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id).count() == 0
+
+    again = add(client, user, "plate", product_id, 1)
+    assert again.status_code == 200 and "Idempotent-Replayed" not in again.headers
+    assert again.json()["quantity"] == 2
@@ -0,0 +1,80 @@
+# Queued checkout: each order intent is claimed by one intake batch and placed once
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.auth.models import User
+from app.core.database import SessionLocal, utcnow
+from app.orders import checkout_routes, intake
+from app.orders.models import IntentStatus, Order, OrderIntent
+from app.products.models import Product
+
+from conftest import create_product
+
+
+def enqueue(client, admin, db, count):
+    # One intent for each of `count` new users (a user has one open intent at most)
+    product_id = create_product(client, admin, f"Queued widget {utcnow().timestamp()}", 4.0, 20, "Queue")
+    users = [
+        User(name="queued", email=f"queued{utcnow().timestamp()}-{n}@example.com", hashed_password="x", role="user")
+        for n in range(count)
+    ]
+    db.add_all(users)
+    db.flush()
+    intents = [intake.order_queue.enqueue(db, user.id, [(product_id, 1)], "pending") for user in users]
+    db.commit()
+    return [user.id for user in users], {intent.id for intent in intents}
+
+
+def test_claims_do_not_overlap_and_a_taken_over_claim_cannot_finish(client, admin, db):
+    _, intent_ids = enqueue(client, admin, db, 3)
+    first, second = SessionLocal(), SessionLocal()
+    try:
+        stalled = intake.order_queue.claim(first, 2)
+        claimed_first = {intent.id for intent in stalled}
+        claimed_second = {intent.id for intent in intake.order_queue.claim(second, 10)}
+        assert claimed_first and not claimed_first & claimed_second
+        assert claimed_first | claimed_second == intent_ids
+
+        # The first worker stalls past the claim timeout: its intents are claimed again
+        db.execute(
+            update(OrderIntent)
+            .where(OrderIntent.id.in_(claimed_first))
+            .values(claimed_at=utcnow() - timedelta(seconds=intake.CHECKOUT_QUEUE_CLAIM_SECONDS + 1))
+        )
+        db.commit()
+        assert claimed_first <= {intent.id for intent in intake.order_queue.claim(second, 10)}
+
+        with pytest.raises(intake.ClaimLost):
+            intake.order_queue.finish(first, stalled[0], error="too late")
+        first.rollback()
+    finally:
+        first.close()
+        second.close()
+
+
+def test_process_batch_places_each_intent_once(client, admin, db):
+    user_ids, intent_ids = enqueue(client, admin, db, 3)
+    assert intake.process_batch() == 3
+    assert intake.process_batch() == 0
+
+    db.expire_all()
+    intents = db.query(OrderIntent).filter(OrderIntent.id.in_(intent_ids)).all()
+    assert {intent.status for intent in intents} == {IntentStatus.completed}
+    assert db.query(Order).filter(Order.user_id.in_(user_ids)).count() == 3
+
+
+def test_a_queued_cart_cannot_be_queued_again_before_its_order_is_placed(client, admin, user, db, monkeypatch):
+    monkeypatch.setattr(checkout_routes, "CHECKOUT_QUEUE_ENABLED", True)
+    product_id = create_product(client, admin, "Queued lamp", 12.0, 5, "Queue")
+    assert client.post("/cart", headers=user, json={"product_id": product_id, "quantity": 2}).status_code == 200
+
+    assert client.post("/checkout/queued", headers=user, json={"status": "pending"}).status_code == 202
+    assert client.post("/checkout/queued", headers=user, json={"status": "pending"}).status_code == 409
+    assert intake.process_batch() == 1
+
+    # The placed order emptied the cart; nothing was ordered twice
+    assert client.post("/checkout/queued", headers=user, json={"status": "pending"}).status_code == 400
+    db.expire_all()
+    assert db.get(Product, product_id).stock == 3
@@ -0,0 +1,58 @@
+# Live product stream: a snapshot, then the latest committed stock and price per product
+import asyncio
+
+from app.core import pubsub
+from app.core.database import SessionLocal
+from app.products import live
+from app.products.models import Product
+
+from conftest import create_product
+
+
+def update_product(product_id, commit=True, **values):
+    db = SessionLocal()
+    try:
+        product = db.get(Product, product_id)
+        for name, value in values.items():
+            setattr(product, name, value)
+        db.flush()
+        if commit:
+            db.commit()
+        else:
+            db.rollback()
+    finally:
+        db.close()
+
+
+def test_stream_sends_a_snapshot_then_coalesced_committed_changes(client, admin, monkeypatch):
+    lamp = create_product(client, admin, "Live lamp", 40.0, 5, "Live")
+    monkeypatch.setattr(live, "LIVE_COALESCE_SECONDS", 0)
+    monkeypatch.setattr(live, "SSE_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(pubsub.hub, "loop", None)
+
+    async def scenario():
+        await pubsub.broker.start(pubsub.hub)  # delivers commits from worker threads to this loop
+        stream = live.stream_products([lamp])
+        try:
+            events = [await anext(stream)]
+            # Two commits before the client reads: one event with the latest values
+            await asyncio.to_thread(update_product, lamp, stock=4)
+            await asyncio.to_thread(update_product, lamp, stock=3, price=42.0)
+            events.append(await asyncio.wait_for(anext(stream), 5))
+            # A rolled back change is never published
+            await asyncio.to_thread(update_product, lamp, commit=False, stock=0)
+            events.append(await asyncio.wait_for(anext(stream), 5))
+            return events
+        finally:
+            await stream.aclose()
+
+    snapshot, change, idle = asyncio.run(scenario())
+    assert snapshot == live.sse_event("snapshot", [{"id": lamp, "stock": 5, "price": 40.0}])
+    assert change == live.sse_event("product", {"id": lamp, "stock": 3, "price": 42.0})
+    assert idle == b": keep-alive\n\n"
+    assert not pubsub.hub.subscribers
+
+
+def test_stream_size_is_capped(client, user):
+    ids = ",".join(str(number) for number in range(1, live.LIVE_MAX_PRODUCTS + 2))
+    assert client.get(f"/products/live?ids={ids}", headers=user).status_code == 400
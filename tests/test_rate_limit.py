@@ -0,0 +1,36 @@
+# Rate limits: a 429 with Retry-After once a per-IP or per-user policy runs out
+import pytest
+
+from app.core import rate_limit
+
+from conftest import make_user
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    # conftest turns rate limiting off; each test gets it back with empty counters
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "store", rate_limit.MemoryCounterStore())
+
+
+def test_ip_policy_answers_429_with_retry_after(client):
+    # auth.login: 10/minute per IP, sliding window
+    credentials = {"email": "nobody@example.com", "hashed_password": "wrong"}
+    for _ in range(10):
+        assert client.post("/auth/login", json=credentials).status_code == 400
+
+    response = client.post("/auth/login", json=credentials)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+    assert rate_limit.rate_limit_stats["auth.login"]["limited"] >= 1
+
+
+def test_user_policy_counts_each_user_separately(client, user):
+    # checkout: token bucket of 5 per user, refilled at 10/minute
+    for _ in range(5):
+        assert client.post("/checkout", headers=user, json={"status": "pending"}).status_code != 429
+
+    response = client.post("/checkout", headers=user, json={"status": "pending"})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 6
+    assert client.post("/checkout", headers=make_user("user"), json={"status": "pending"}).status_code != 429
@@ -0,0 +1,20 @@
+# Frequently-bought-together counts, kept up to date by checkout
+from conftest import checkout, create_product, pair_counts
+
+
+def test_checkouts_count_pairs_like_the_rebuild(client, admin, user, db):
+    tent = create_product(client, admin, "Pair tent", 90.0, 10, "Pairs")
+    pegs = create_product(client, admin, "Pair pegs", 4.0, 10, "Pairs")
+    stove = create_product(client, admin, "Pair stove", 35.0, 10, "Pairs")
+
+    checkout(client, user, {tent: 1, pegs: 2})
+    checkout(client, user, {tent: 1, pegs: 1, stove: 1})
+    checkout(client, user, {pegs: 1, stove: 1}, status="cancelled")  # never counted
+
+    related = client.get(f"/products/{tent}/related", headers=user).json()
+    assert [product["id"] for product in related] == [pegs, stove]
+    pairs = pair_counts(db)
+    assert {(tent, pegs, 2), (pegs, tent, 2), (pegs, stove, 1), (stove, pegs, 1)} <= pairs
+
+    assert client.post("/admin/products/related/rebuild", headers=admin).status_code == 200
+    assert pair_counts(db) == pairs
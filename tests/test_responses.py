@@ -0,0 +1,50 @@
+# List endpoints render column rows with FastJSONResponse: the bytes must match the
+# response_model path they replaced
+import enum
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.responses import render_json
+from app.orders.models import Order
+from app.orders.schemas import OrderSummary
+from app.products.models import Product
+from app.products.schemas import ProductOut
+
+from conftest import checkout, create_product
+
+
+def model_body(schema, objects) -> bytes:
+    return JSONResponse(jsonable_encoder([schema.model_validate(obj, from_attributes=True) for obj in objects])).body
+
+
+def test_render_json_matches_json_response():
+    class Color(enum.Enum):
+        red = "red"
+
+    content = [{"name": "Théière ☕", "price": 0.1 + 0.2, "big": 1e20, "at": datetime(2026, 1, 2, 3, 4, 5, 6),
+                "color": Color.red, "none": None, "nested": [1, True]}]
+    assert render_json(content) == JSONResponse(jsonable_encoder(content)).body
+
+
+def test_admin_product_list_is_byte_identical(client, admin, db):
+    create_product(client, admin, "Render mug é", 12.345, 3, "Render")
+    response = client.get("/admin/products?skip=0&limit=100", headers=admin)
+    assert response.status_code == 200
+
+    expected = model_body(ProductOut, db.query(Product).offset(0).limit(100).all())
+    assert response.content == expected
+
+
+def test_order_history_is_byte_identical(client, admin, user, db):
+    product = create_product(client, admin, "Render bowl", 9.99, 10, "Render")
+    checkout(client, user, {product: 2})
+    checkout(client, user, {product: 1})
+    response = client.get("/orders", headers=user)
+    assert response.status_code == 200
+
+    ids = [order["id"] for order in response.json()]
+    orders = {order.id: order for order in db.query(Order).filter(Order.id.in_(ids))}
+    assert len(ids) == 2
+    assert response.content == model_body(OrderSummary, [orders[order_id] for order_id in ids])
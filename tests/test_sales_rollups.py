@@ -0,0 +1,37 @@
+# Sales rollups: checkouts append changes, a job folds them, reports read both
+from conftest import checkout, create_product, run_job, sales_reports
+
+
+def test_reports_match_before_and_after_the_fold_and_the_rebuild(client, admin, user):
+    boots = create_product(client, admin, "Sales boots", 80.0, 10, "Sales Shoes")
+    socks = create_product(client, admin, "Sales socks", 5.0, 10, "Sales Shoes")
+
+    checkout(client, user, {boots: 1, socks: 3})
+    checkout(client, user, {socks: 2})
+    checkout(client, user, {boots: 2}, status="cancelled")  # never counted
+
+    products = {row["product_id"]: row for row in client.get("/admin/analytics/products?limit=500", headers=admin).json()}
+    assert (products[boots]["orders"], products[boots]["units"], products[boots]["revenue"]) == (1, 1, 80.0)
+    assert (products[socks]["orders"], products[socks]["units"], products[socks]["revenue"]) == (2, 5, 25.0)
+    shoes = [row for row in client.get("/admin/analytics/categories", headers=admin).json() if row["category"] == "sales shoes"]
+    assert [(row["orders"], row["units"], row["revenue"]) for row in shoes] == [(2, 6, 105.0)]
+
+    reports = sales_reports(client, admin)
+    assert run_job("fold_sales_changes") > 0
+    assert sales_reports(client, admin) == reports
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+    assert sales_reports(client, admin) == reports
+
+
+def test_orders_stay_under_the_category_they_were_placed_in(client, admin, user):
+    coat = create_product(client, admin, "Sales coat", 120.0, 10, "Sales Coats")
+    checkout(client, user, {coat: 1})
+    assert client.put(f"/admin/products/{coat}", headers=admin, json={"category": "Sales Jackets"}).status_code == 200
+
+    def categories():
+        return {row["category"]: row["revenue"] for row in client.get("/admin/analytics/categories", headers=admin).json()
+                if row["category"].startswith("sales ") and row["orders"]}
+
+    assert categories().get("sales coats") == 120.0 and "sales jackets" not in categories()
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+    assert categories().get("sales coats") == 120.0 and "sales jackets" not in categories()
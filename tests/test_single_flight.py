@@ -0,0 +1,98 @@
+# Catalog read cache: one load for concurrent callers, fresh and stale windows, stale-if-error
+import asyncio
+import threading
+
+from app.core.single_flight import SingleFlightCache, caches
+
+
+class Loader:
+    # Blocking loader (it runs in a worker thread) that counts calls and can be held or made to fail
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.calls
+
+
+def age(cache, key, seconds):
+    cache.entries[key].fetched_at -= seconds
+
+
+def test_concurrent_callers_share_one_load():
+    cache, load = SingleFlightCache("test_coalesce", 10, 10, 60, 10), Loader()
+
+    async def scenario():
+        load.release.clear()
+        waiting = [asyncio.create_task(cache.get("page", load)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        load.release.set()
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(scenario()) == [1] * 5
+    assert (load.calls, cache.counts["loads"], cache.counts["coalesced"]) == (1, 1, 4)
+    assert caches["test_coalesce"] is cache
+
+
+def test_stale_value_is_served_while_one_load_refreshes_it():
+    cache, load = SingleFlightCache("test_stale", 1, 10, 60, 10), Loader()
+
+    async def scenario():
+        assert await cache.get("page", load) == 1
+        assert await cache.get("page", load) == 1  # fresh
+        age(cache, "page", 2)
+        stale = [await cache.get("page", load) for _ in range(3)]
+        await asyncio.gather(*cache.in_flight.values())
+        return stale, await cache.get("page", load)
+
+    assert asyncio.run(scenario()) == ([1, 1, 1], 2)
+    assert (load.calls, cache.counts["fresh"], cache.counts["stale"]) == (2, 2, 3)
+
+
+def test_expired_and_too_old_entries_are_loaded_again():
+    cache, load = SingleFlightCache("test_expire", 10, 10, 60, 10), Loader()
+
+    async def scenario():
+        await cache.get("page", load)
+        cache.expire()
+        assert await cache.get("page", load) == 1  # stale: served, refreshed in the background
+        await asyncio.gather(*cache.in_flight.values())
+        age(cache, "page", 30)
+        return await cache.get("page", load)  # past the stale window: waits for the load
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_failed_load_serves_the_last_value_within_stale_if_error():
+    cache, load = SingleFlightCache("test_error", 0, 0, 60, 10), Loader()
+
+    async def scenario():
+        await cache.get("page", load)
+        load.error = RuntimeError("database is down")
+        served = await cache.get("page", load)
+        age(cache, "page", 120)
+        try:
+            await cache.get("page", load)
+        except RuntimeError:
+            return served, "raised"
+        return served, "served"
+
+    assert asyncio.run(scenario()) == (1, "raised")
+    assert (cache.counts["errors"], cache.counts["stale_on_error"]) == (2, 1)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SingleFlightCache("test_lru", 10, 10, 60, 2)
+
+    async def scenario():
+        for key in ("a", "b", "a", "c"):
+            await cache.get(key, lambda: key)
+
+    asyncio.run(scenario())
+    assert list(cache.entries) == ["a", "c"]
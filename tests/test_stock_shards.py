@@ -0,0 +1,35 @@
+# Sharded stock counters: checkouts take from the shards, the sync job caches their sum
+from app.products.models import Product, ProductStockShard
+
+from conftest import checkout, create_product, run_job
+
+
+def shards(db, product_id):
+    db.expire_all()
+    return db.query(ProductStockShard).filter(ProductStockShard.product_id == product_id).order_by(ProductStockShard.shard).all()
+
+
+def test_checkouts_take_from_the_shards_and_the_sync_caches_their_sum(client, admin, user, db):
+    kettle = create_product(client, admin, "Shard kettle", 30.0, 8, "Shards")
+    assert client.put(f"/admin/products/{kettle}/shards", headers=admin, json={"shards": 4}).status_code == 200
+    assert [shard.quantity for shard in shards(db, kettle)] == [2, 2, 2, 2]
+
+    # More than any one shard holds: drained from several
+    checkout(client, user, {kettle: 5})
+    assert sum(shard.quantity for shard in shards(db, kettle)) == 3
+    assert client.post("/cart", headers=user, json={"product_id": kettle, "quantity": 4}).status_code == 200
+    assert client.post("/checkout", headers=user, json={"status": "pending"}).status_code == 400
+    assert client.delete(f"/cart/{kettle}", headers=user).status_code in (200, 204)
+
+    # The sync evens the shards out and clears their dirty flags, so the next run skips them
+    assert client.get(f"/products/{kettle}", headers=user).json()["stock"] == 8
+    assert run_job("sync_stock_shards") >= 1
+    assert client.get(f"/products/{kettle}", headers=user).json()["stock"] == 3
+    quantities = [shard.quantity for shard in shards(db, kettle)]
+    assert sum(quantities) == 3 and max(quantities) - min(quantities) <= 1
+    assert not any(shard.dirty for shard in shards(db, kettle))
+
+    # Folding the shards back keeps the stock
+    assert client.put(f"/admin/products/{kettle}/shards", headers=admin, json={"shards": 0}).status_code == 200
+    db.expire_all()
+    assert db.get(Product, kettle).stock == 3 and not shards(db, kettle)
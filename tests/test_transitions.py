@@ -0,0 +1,67 @@
+# Bulk order status transitions: cancelling gives the stock back and takes the order out of
+# the aggregates, which must then match what their rebuilds compute from scratch
+from conftest import checkout, create_product, facet_counts, make_user, pair_counts, run_job, sales_reports, set_status
+
+
+def test_each_order_gets_its_own_result(client, admin, user):
+    cup = create_product(client, admin, "Transition cup", 6.0, 10, "Transitions")
+    pending = checkout(client, user, {cup: 1})
+    paid = checkout(client, user, {cup: 1})
+    cancelled = checkout(client, user, {cup: 1}, status="cancelled")
+    set_status(client, admin, [paid], "paid")
+
+    out = set_status(client, admin, [pending, paid, cancelled, pending, 10**9], "paid")
+    assert [(result["id"], result["status"]) for result in out["results"]] == [
+        (pending, "updated"), (paid, "unchanged"), (cancelled, "invalid_transition"),
+        (pending, "duplicate"), (10**9, "not_found"),
+    ]
+
+
+def test_checkout_and_cancel_match_the_rebuilds(client, admin, user, db):
+    hot = create_product(client, admin, "Hot kettle", 30.0, 10, "Kitchen")
+    mug = create_product(client, admin, "Mug", 8.0, 10, "Kitchen")
+    lamp = create_product(client, admin, "Lamp", 45.0, 10, "Lighting")
+    spare = create_product(client, admin, "Spare bulb", 3.0, 10, "Lighting")
+    assert client.put(f"/admin/products/{hot}/shards", headers=admin, json={"shards": 4}).status_code == 200
+
+    checkout(client, user, {hot: 2, mug: 1})
+    cancelled = checkout(client, user, {mug: 1, lamp: 3})
+    checkout(client, user, {hot: 1, lamp: 1})
+    checkout(client, make_user("user"), {spare: 2, lamp: 1}, status="cancelled")
+    set_status(client, admin, [cancelled], "cancelled")
+    run_job("sync_stock_shards")
+
+    stock = {product_id: client.get(f"/products/{product_id}", headers=user).json()["stock"] for product_id in (hot, mug, lamp)}
+    assert stock == {hot: 7, mug: 9, lamp: 8}
+
+    facets = facet_counts(db)
+    assert client.post("/admin/products/facets/rebuild", headers=admin).status_code == 200
+    assert facet_counts(db) == facets
+
+    pairs = pair_counts(db)
+    assert (hot, mug, 1) in pairs and (mug, lamp, 1) not in pairs and (spare, lamp, 1) not in pairs
+    assert client.post("/admin/products/related/rebuild", headers=admin).status_code == 200
+    assert pair_counts(db) == pairs
+
+    # Unfolded changes, folded rollups and a rebuild from the orders all report the same
+    reports = sales_reports(client, admin)
+    run_job("fold_sales_changes")
+    assert sales_reports(client, admin) == reports
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+    assert sales_reports(client, admin) == reports
+
+
+def test_a_cancellation_after_a_recategorization_takes_the_order_out_of_its_old_category(client, admin, user):
+    scarf = create_product(client, admin, "Transition scarf", 25.0, 10, "Transition Scarves")
+    order = checkout(client, user, {scarf: 2})
+    assert client.put(f"/admin/products/{scarf}", headers=admin, json={"category": "Transition Wraps"}).status_code == 200
+    set_status(client, admin, [order], "cancelled")
+
+    def categories():
+        return {row["category"]: (row["orders"], row["units"]) for row in client.get("/admin/analytics/categories", headers=admin).json()
+                if row["category"].startswith("transition ")}
+
+    assert categories() in ({}, {"transition scarves": (0, 0)})
+    reports = sales_reports(client, admin)
+    assert client.post("/admin/analytics/rebuild", headers=admin).status_code == 200
+    assert sales_reports(client, admin) == reports